@@ -0,0 +1,104 @@
+"""
+Small in-process caches shared by the services
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .metrics import metrics
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed time to live
+
+    Hits and misses are counted in the metrics registry under ``name``.
+    Each key has a generation that ``invalidate`` advances: a loader reads
+    it before loading and passes it to ``set``, so a value loaded before an
+    invalidation is not stored after it.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 128):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._stats = metrics.cache(name)
+
+        # Generations of keys invalidated one by one; every key is at least at the last full invalidation's
+        self._counter = 0
+        self._floor = 0
+        self._generations: Dict[Hashable, int] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self._stats.miss()
+            return None
+
+        self._entries.move_to_end(key)
+        self._stats.hit()
+        return entry[1]
+
+    def generation(self, key: Hashable) -> int:
+        """Current generation of ``key``; it changes whenever the key is invalidated"""
+        return max(self._generations.get(key, 0), self._floor)
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """Store ``value``, unless ``key`` was invalidated since ``generation`` was read"""
+        if generation is not None and generation != self.generation(key):
+            return False
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when no key is given, and advance their generation"""
+        self._counter += 1
+        if key is None:
+            self._entries.clear()
+            self._generations.clear()
+            self._floor = self._counter
+        else:
+            self._entries.pop(key, None)
+            self._generations[key] = self._counter
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one execution
+
+    The first caller for a key starts ``load`` as a task; callers arriving
+    while it runs await the same task and share its result or exception.
+    The key is released when the task finishes, so later calls run again.
+    A waiter being cancelled does not cancel the shared task. Executed and
+    coalesced calls are counted in the metrics registry under ``name``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._stats = metrics.singleflight(name)
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self._stats.executed += 1
+        else:
+            self._stats.coalesced += 1
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
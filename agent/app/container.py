@@ -0,0 +1,267 @@
+"""
+Application container owning the backend's long-lived resources
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+from typing import List, Optional
+
+from .cache import TTLCache
+from .followups import FollowUpWorkerPool, LogChannel, parse_rates
+from .health import HealthMonitor
+from .invalidation import CacheInvalidator, EventRelay, InMemoryBus, InvalidationBus, PostgresBus
+from .leader import FileLeaderLock, LeaderElection, PostgresLeaderLock
+from .notifications import NotificationDispatcher, build_sinks
+from .projections import HelpRequestProjection
+from .repositories.base_repository import BaseRepository
+from .repositories.call_session_repository import CallSessionRepository
+from .repositories.customer_repository import CustomerRepository
+from .repositories.followup_repository import FollowUpRepository
+from .repositories.help_request_repository import HelpRequestRepository
+from .repositories.knowledge_base_repository import KnowledgeBaseRepository
+from .repositories.tenant_repository import TenantRepository
+from .semantic import SemanticIndexer, SemanticIndexes, build_embedder
+from .services.ai_service import AIService
+from .services.supervisor_service import SupervisorService
+from .services.tenant_service import TenantService
+from .models.schemas import FollowUpType
+
+logger = logging.getLogger(__name__)
+
+
+class AppContainer:
+    """
+    Creates clients, caches, services and background tasks once per process
+
+    Started and stopped by the FastAPI lifespan. Controllers resolve their
+    services from ``app.state.container`` instead of building new services
+    and repositories on every request.
+    """
+
+    def __init__(self):
+        # Rendered contexts keyed by tenant ID, tenants keyed by slug; LRU bounded for many tenants
+        self.context_cache = TTLCache(
+            "salon_context",
+            ttl_seconds=float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "60")),
+            max_entries=int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "1024"))
+        )
+        self.tenant_cache = TTLCache(
+            "tenants",
+            ttl_seconds=float(os.getenv("TENANT_CACHE_TTL_SECONDS", "300")),
+            max_entries=int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "1024"))
+        )
+        self.timeout_sweep_interval = float(os.getenv("TIMEOUT_SWEEP_INTERVAL_SECONDS", "300"))
+        self.knowledge_changes_retention = float(os.getenv("KNOWLEDGE_CHANGES_RETENTION_DAYS", "7")) * 86400
+
+        self.knowledge_repo: Optional[KnowledgeBaseRepository] = None
+        self.help_request_repo: Optional[HelpRequestRepository] = None
+        self.customer_repo: Optional[CustomerRepository] = None
+        self.call_session_repo: Optional[CallSessionRepository] = None
+        self.tenant_repo: Optional[TenantRepository] = None
+        self.followup_repo: Optional[FollowUpRepository] = None
+        self.tenant_service: Optional[TenantService] = None
+        self.ai_service: Optional[AIService] = None
+        self.supervisor_service: Optional[SupervisorService] = None
+        self.notifier: Optional[NotificationDispatcher] = None
+        self.followup_pool: Optional[FollowUpWorkerPool] = None
+        self.projection: Optional[HelpRequestProjection] = None
+
+        # Direct Postgres connection for LISTEN; without one, only this process's own evictions apply
+        database_url = os.getenv("DATABASE_URL")
+        self.invalidation_bus: InvalidationBus = PostgresBus(database_url) if database_url else InMemoryBus()
+        self.event_relay = EventRelay()
+        self.cache_invalidator: Optional[CacheInvalidator] = None
+
+        # Jobs that must run once across all workers; Postgres elects across hosts, the file lock per host
+        leader_lock = PostgresLeaderLock(database_url) if database_url else FileLeaderLock(
+            os.getenv("LEADER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "frontdesk-backend.leader"))
+        )
+        self.leader = LeaderElection(leader_lock, retry_interval=float(os.getenv("LEADER_RETRY_SECONDS", "5")))
+
+        # Semantic index files are per host, so one worker per host keeps them current
+        self.semantic_indexes: Optional[SemanticIndexes] = None
+        self.semantic_root = os.getenv("SEMANTIC_INDEX_DIR", os.path.join(tempfile.gettempdir(), "frontdesk-semantic"))
+        self.semantic_leader = LeaderElection(
+            FileLeaderLock(self.semantic_root + ".leader"),
+            retry_interval=float(os.getenv("LEADER_RETRY_SECONDS", "5")),
+            report=False
+        )
+
+        self.health: Optional[HealthMonitor] = None
+
+        self.ready = False
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Build singletons, warm up the DB and caches, then start background work"""
+        BaseRepository.get_client()
+
+        self.knowledge_repo = KnowledgeBaseRepository()
+        self.help_request_repo = HelpRequestRepository()
+        self.customer_repo = CustomerRepository()
+        self.call_session_repo = CallSessionRepository()
+        self.tenant_repo = TenantRepository()
+        self.followup_repo = FollowUpRepository()
+
+        self.notifier = NotificationDispatcher(
+            sinks=build_sinks(
+                os.getenv("NOTIFICATION_SINKS", "log"),
+                file_path=os.getenv("NOTIFICATION_FILE", "notifications/supervisor.jsonl"),
+                webhook_url=os.getenv("WEBHOOK_URL") or None
+            ),
+            max_queue=int(os.getenv("NOTIFICATION_QUEUE_SIZE", "1000")),
+            coalesce_seconds=float(os.getenv("NOTIFICATION_COALESCE_SECONDS", "10")),
+            max_batch=int(os.getenv("NOTIFICATION_MAX_BATCH", "20")),
+            max_attempts=int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+        )
+
+        self.projection = HelpRequestProjection(
+            help_request_repo=self.help_request_repo,
+            knowledge_repo=self.knowledge_repo,
+            # Without the Postgres bus, other workers' writes only show up at reconciliation
+            reconcile_interval=float(os.getenv("PROJECTION_RECONCILE_SECONDS",
+                                               "60" if isinstance(self.invalidation_bus, PostgresBus) else "15"))
+        )
+
+        # Log channels stand in for SMS, call and email providers
+        rates = parse_rates(os.getenv("FOLLOWUP_RATE_LIMITS", "sms=1,call=0.2,email=5"))
+        self.followup_pool = FollowUpWorkerPool(
+            followup_repo=self.followup_repo,
+            channels=[LogChannel(t.value, rates.get(t.value, 1.0)) for t in FollowUpType],
+            workers=int(os.getenv("FOLLOWUP_WORKERS", "4")),
+            batch_size=int(os.getenv("FOLLOWUP_BATCH_SIZE", "20")),
+            lease_seconds=int(os.getenv("FOLLOWUP_LEASE_SECONDS", "120")),
+            poll_interval=float(os.getenv("FOLLOWUP_POLL_SECONDS", "5")),
+            max_attempts=int(os.getenv("FOLLOWUP_MAX_ATTEMPTS", "5")),
+            retry_delay=float(os.getenv("FOLLOWUP_RETRY_SECONDS", "30"))
+        )
+
+        self.tenant_service = TenantService(
+            tenant_repo=self.tenant_repo,
+            tenant_cache=self.tenant_cache
+        )
+        os.makedirs(self.semantic_root, exist_ok=True)
+        self.semantic_indexes = SemanticIndexes(
+            self.semantic_root,
+            build_embedder(),
+            nprobe=int(os.getenv("SEMANTIC_NPROBE", "4"))
+        )
+
+        self.ai_service = AIService(
+            knowledge_repo=self.knowledge_repo,
+            help_request_repo=self.help_request_repo,
+            customer_repo=self.customer_repo,
+            call_session_repo=self.call_session_repo,
+            tenant_service=self.tenant_service,
+            context_cache=self.context_cache,
+            notifier=self.notifier,
+            projection=self.projection,
+            semantic_indexes=self.semantic_indexes
+        )
+        self.supervisor_service = SupervisorService(
+            help_request_repo=self.help_request_repo,
+            knowledge_repo=self.knowledge_repo,
+            tenant_service=self.tenant_service,
+            context_cache=self.context_cache,
+            followup_repo=self.followup_repo,
+            followup_pool=self.followup_pool,
+            projection=self.projection
+        )
+
+        self.cache_invalidator = CacheInvalidator(
+            context_cache=self.context_cache,
+            tenant_cache=self.tenant_cache,
+            projection=self.projection,
+            help_request_repo=self.help_request_repo
+        )
+        self.invalidation_bus.subscribe(self.cache_invalidator)
+        self.invalidation_bus.subscribe(self.event_relay)
+        # Follow-ups are queued in any worker but delivered by the leader's pool
+        self.invalidation_bus.subscribe(self.followup_pool.on_change)
+
+        await self.warm_up()
+        await self.invalidation_bus.start()
+
+        self.health = HealthMonitor(
+            db_probe=self.customer_repo.ping,
+            context_probe=self.ai_service.get_salon_context,
+            context_cache_size=lambda: len(self.context_cache),
+            interval=float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "5")),
+            timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "2"))
+        )
+        await self.health.refresh()
+
+        # The follow-up pool runs once too, so its per-channel rate limits hold across workers
+        self.leader.add("timeout-sweeper", self._sweep_timeouts)
+        self.leader.add("followup-pool", self.followup_pool.run)
+        self.leader.add("knowledge-change-pruner", self._prune_knowledge_changes)
+
+        self.semantic_leader.add("semantic-indexer", SemanticIndexer(
+            self.knowledge_repo,
+            self.tenant_repo,
+            self.semantic_indexes,
+            interval=float(os.getenv("SEMANTIC_INDEX_INTERVAL_SECONDS", "5"))
+        ).run)
+
+        self._tasks.append(asyncio.create_task(self.leader.run(), name="leader-election"))
+        self._tasks.append(asyncio.create_task(self.semantic_leader.run(), name="semantic-leader-election"))
+        self._tasks.append(asyncio.create_task(self.health.run(), name="health-monitor"))
+        self._tasks.append(asyncio.create_task(self.notifier.run(), name="notification-dispatcher"))
+        self._tasks.append(asyncio.create_task(self.projection.run(), name="projection-reconciler"))
+        self.ready = True
+
+    async def warm_up(self) -> None:
+        """Run a real query and render the default tenant's context before serving traffic"""
+        await self.customer_repo.ping(timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "2")))
+        logger.info("✅ Database connection established")
+
+        await self.ai_service.get_salon_context()
+        logger.info("✅ Default tenant context cache prewarmed")
+
+        await self.projection.reconcile()
+        logger.info("✅ Dashboard and analytics projection loaded")
+
+    async def stop(self) -> None:
+        """Cancel background tasks and release clients"""
+        self.ready = False
+
+        # Let in-flight resolutions finish their knowledge base and follow-up writes
+        if self.supervisor_service is not None:
+            await self.supervisor_service.drain()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.invalidation_bus.stop()
+        if self.cache_invalidator is not None:
+            await self.cache_invalidator.close()
+
+        # Deliver what is still queued before the process exits
+        if self.notifier is not None:
+            await self.notifier.close()
+
+        self.context_cache.invalidate()
+        self.tenant_cache.invalidate()
+        BaseRepository.close_client()
+
+    async def _sweep_timeouts(self) -> None:
+        """Periodically mark expired pending help requests as timed out"""
+        while True:
+            await asyncio.sleep(self.timeout_sweep_interval)
+            try:
+                await self.supervisor_service.cleanup_timeout_requests()
+            except Exception as e:
+                logger.error(f"Timeout sweep failed: {e}")
+
+    async def _prune_knowledge_changes(self) -> None:
+        """Hourly drop knowledge base changes older than the retention window"""
+        while True:
+            try:
+                pruned_through = await self.knowledge_repo.prune_changes(int(self.knowledge_changes_retention))
+                logger.debug(f"Knowledge base changes pruned through version {pruned_through}")
+            except Exception as e:
+                logger.error(f"Knowledge base change pruning failed: {e}")
+            await asyncio.sleep(3600)
@@ -2,26 +2,31 @@
 AI Controller - Handles API requests for AI agent interactions
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from uuid import uuid4
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import List, Optional
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta
 
 from ..models.schemas import (
     AIQueryRequest,
     AIQueryResponse,
     BaseResponse,
-    ErrorResponse
+    ErrorResponse,
+    KnowledgeChangesResponse,
+    KnowledgeSearchResponse,
+    KnowledgeSnapshotResponse,
+    TranscriptUpdate
 )
+from ..semantic import SemanticIndexNotReady
 from ..services.ai_service import AIService
-from ..repositories.base_repository import BaseRepository
+from ..services.tenant_service import TenantNotFoundError
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
 
-def get_ai_service() -> AIService:
-    """Dependency injection for AI service"""
-    return AIService()
+def get_ai_service(request: Request) -> AIService:
+    """Dependency injection for AI service, owned by the application container"""
+    return request.app.state.container.ai_service
 
 
 @router.post("/query", response_model=AIQueryResponse)
@@ -41,29 +46,149 @@ async def process_query(
             question=request.question,
             customer_phone=request.customer_phone,
             call_session_id=request.call_session_id,
-            context=request.context
+            context=request.context,
+            tenant=request.tenant
         )
         return response
 
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
 @router.get("/context")
 async def get_salon_context(
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
+    knowledge: bool = Query(True, description="Include the knowledge base section"),
     ai_service: AIService = Depends(get_ai_service)
 ) -> dict:
     """
-    Get salon business context for AI agent prompting
+    Get a tenant's business context for AI agent prompting
+
+    Agents that keep the knowledge base current through ``/ai/knowledge/changes``
+    ask for the context without it.
     """
     try:
-        context = await ai_service.get_salon_context()
+        if knowledge:
+            context = await ai_service.get_salon_context(tenant)
+        else:
+            context = await ai_service.get_business_context(tenant)
         return {"context": context}
 
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting context: {str(e)}")
 
 
+@router.get("/knowledge/snapshot", response_model=KnowledgeSnapshotResponse)
+async def get_knowledge_snapshot(
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
+    ai_service: AIService = Depends(get_ai_service)
+) -> dict:
+    """
+    Get all of a tenant's knowledge base entries and the change version they are current to
+    """
+    try:
+        return await ai_service.get_knowledge_snapshot(tenant)
+
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting knowledge snapshot: {str(e)}")
+
+
+@router.get("/knowledge/search", response_model=KnowledgeSearchResponse)
+async def search_knowledge(
+    q: str = Query(..., min_length=1, max_length=500, description="Search terms; quotes, OR and -term are supported"),
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
+    limit: int = Query(10, ge=1, le=50, description="Most results to return"),
+    ai_service: AIService = Depends(get_ai_service)
+) -> dict:
+    """
+    Search a tenant's knowledge base, best matches first
+
+    Results are ranked full-text matches over questions and answers. When
+    there are none, questions similar to the query are returned instead,
+    so misspelled terms still find their entry.
+    """
+    try:
+        return await ai_service.search_knowledge(q, tenant, limit)
+
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching knowledge base: {str(e)}")
+
+
+@router.get("/knowledge/match", response_model=KnowledgeSearchResponse)
+async def match_knowledge(
+    q: str = Query(..., min_length=1, max_length=500, description="Caller's question"),
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
+    k: int = Query(5, ge=1, le=50, description="Most results to return"),
+    ai_service: AIService = Depends(get_ai_service)
+) -> dict:
+    """
+    Find a tenant's entries closest in meaning to a question, best first
+
+    Scores are cosine similarities, so paraphrases match without sharing
+    words. Answers 503 until the tenant's semantic index has been built.
+    """
+    try:
+        return await ai_service.match_knowledge(q, tenant, k)
+
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SemanticIndexNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error matching knowledge base: {str(e)}")
+
+
+@router.get("/knowledge/changes", response_model=KnowledgeChangesResponse)
+async def get_knowledge_changes(
+    since: int = Query(..., ge=0, description="Change version the caller is current to"),
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
+    limit: int = Query(500, ge=1, le=2000, description="Most change log rows to read"),
+    ai_service: AIService = Depends(get_ai_service)
+) -> dict:
+    """
+    Get the knowledge base entries added, updated or deleted after version ``since``
+
+    - ``reset``: changes after ``since`` were pruned; fetch ``/ai/knowledge/snapshot``
+    - ``has_more``: call again with the returned ``version``
+    """
+    try:
+        return await ai_service.get_knowledge_changes(since, tenant, limit)
+
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting knowledge changes: {str(e)}")
+
+
+@router.put("/sessions/{call_session_id}/transcript")
+async def save_transcript(
+    call_session_id: UUID,
+    update: TranscriptUpdate,
+    ai_service: AIService = Depends(get_ai_service)
+) -> BaseResponse:
+    """
+    Store the running transcript of a call session
+    """
+    try:
+        await ai_service.save_transcript(call_session_id, update.customer_phone, update.transcript)
+
+        return BaseResponse(
+            success=True,
+            message="Transcript saved"
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving transcript: {str(e)}")
+
+
 @router.post("/learn/{help_request_id}")
 async def learn_from_resolution(
     help_request_id: str,
@@ -90,14 +215,22 @@ async def learn_from_resolution(
 async def create_ticket_direct(
     question: str,
     customer_phone: str,
-    context: str = None
+    context: str = None,
+    tenant: Optional[str] = None,
+    ai_service: AIService = Depends(get_ai_service)
 ) -> dict:
     """
     Direct ticket creation bypassing complex queries
     """
     try:
-        # Create ticket directly using Supabase client
-        help_request_repo = BaseRepository("help_requests")
+        # Create ticket directly using the shared help request repository
+        help_request_repo = ai_service.help_request_repo
+
+        # An unknown tenant must not lose the ticket; it is filed without one
+        try:
+            tenant_id = str((await ai_service.tenant_service.resolve(tenant))["id"])
+        except TenantNotFoundError:
+            tenant_id = None
 
         ticket_id = str(uuid4())
         timeout_hours = 4
@@ -110,20 +243,18 @@ async def create_ticket_direct(
             "priority": "normal",
             "status": "pending",
             "timeout_at": (datetime.utcnow() + timedelta(hours=timeout_hours)).isoformat(),
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": datetime.utcnow().isoformat(),
+            "tenant_id": tenant_id
         }
 
-        # Insert directly using Supabase client
-        result = help_request_repo.client.table("help_requests").insert(data).execute()
+        # Insert through the repository so the query is timed and traced
+        ai_service.help_request_created(await help_request_repo.create(data))
 
-        if result.data:
-            return {
-                "success": True,
-                "help_request_id": ticket_id,
-                "message": "Ticket created successfully"
-            }
-        else:
-            raise Exception("Failed to insert ticket")
+        return {
+            "success": True,
+            "help_request_id": ticket_id,
+            "message": "Ticket created successfully"
+        }
 
     except Exception as e:
         # Even if DB fails, return success for agent to continue
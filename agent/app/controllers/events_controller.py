@@ -0,0 +1,64 @@
+"""
+Events Controller - Streams cache invalidation events to agent workers
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional, Set
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..invalidation import ChangeEvent, EventRelay, RESYNC
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+# Comment lines keep idle connections open through proxies
+KEEPALIVE_SECONDS = 15.0
+
+
+def get_event_relay(request: Request) -> EventRelay:
+    return request.app.state.container.event_relay
+
+
+def _sse(event: ChangeEvent) -> bytes:
+    return f"id: {event.version}\nevent: change\ndata: {event.to_json()}\n\n".encode("utf-8")
+
+
+async def _stream(request: Request, relay: EventRelay, tables: Optional[Set[str]]) -> AsyncIterator[bytes]:
+    queue = relay.open()
+    try:
+        yield b": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                # The relay closed the stream; subscribers reconnect, to another worker if this one is stopping
+                return
+            if tables is None or event.table in tables or event.op == RESYNC.op:
+                yield _sse(event)
+    finally:
+        relay.close(queue)
+
+
+@router.get("/invalidations")
+async def stream_invalidations(
+    request: Request,
+    tables: Optional[str] = Query(None, description="Comma-separated tables to receive, e.g. knowledge_base,tenants")
+) -> StreamingResponse:
+    """
+    Server-sent stream of committed changes to cached tables
+
+    Subscribers evict their own caches per event. A ``RESYNC`` event means
+    events may have been missed and everything cached should be dropped.
+    """
+    wanted = {table.strip() for table in tables.split(",") if table.strip()} if tables else None
+    return StreamingResponse(
+        _stream(request, get_event_relay(request), wanted),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
@@ -2,8 +2,9 @@
 Supervisor Controller - Handles API requests for supervisor operations
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional
 import logging
 
 from ..models.schemas import (
@@ -13,29 +14,40 @@ from ..models.schemas import (
     KnowledgeBaseResponse,
     KnowledgeBaseCreate,
     AnalyticsResponse,
-    BaseResponse
+    BaseResponse,
+    FollowUpResponse
 )
+from ..models.serialization import ListSerializer
 from ..services.supervisor_service import SupervisorService
+from ..services.tenant_service import TenantNotFoundError
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/supervisor", tags=["supervisor"])
 
+# List endpoints serialize raw rows once instead of through response_model
+dashboard_serializer = ListSerializer(SupervisorDashboardResponse)
+knowledge_base_serializer = ListSerializer(KnowledgeBaseResponse)
 
-def get_supervisor_service() -> SupervisorService:
-    """Dependency injection for supervisor service"""
-    return SupervisorService()
+
+def get_supervisor_service(request: Request) -> SupervisorService:
+    """Dependency injection for supervisor service, owned by the application container"""
+    return request.app.state.container.supervisor_service
 
 
 @router.get("/dashboard", response_model=List[SupervisorDashboardResponse])
 async def get_dashboard(
+    tenant: Optional[str] = Query(None, description="Only requests of this tenant"),
     supervisor_service: SupervisorService = Depends(get_supervisor_service)
-) -> List[SupervisorDashboardResponse]:
+) -> Response:
     """
     Get all pending help requests for supervisor dashboard
     """
     try:
-        return await supervisor_service.get_dashboard_data()
+        rows = await supervisor_service.get_dashboard_rows(tenant=tenant)
+        return dashboard_serializer.response(rows)
 
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting dashboard data: {str(e)}")
 
@@ -81,18 +93,41 @@ async def resolve_help_request(
         raise HTTPException(status_code=500, detail=f"Error resolving help request: {str(e)}")
 
 
+@router.get("/requests/{request_id}/followups", response_model=List[FollowUpResponse])
+async def get_request_followups(
+    request_id: str,
+    supervisor_service: SupervisorService = Depends(get_supervisor_service)
+) -> List[FollowUpResponse]:
+    """
+    Get the customer follow-ups of a help request and their delivery status
+    """
+    try:
+        from uuid import UUID
+
+        return await supervisor_service.get_followups(UUID(request_id))
+
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(ve)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting follow-ups: {str(e)}")
+
+
 @router.get("/knowledge-base", response_model=List[KnowledgeBaseResponse])
 async def get_knowledge_base(
     category: Optional[str] = Query(None, description="Filter by category"),
     limit: int = Query(100, ge=1, le=500, description="Number of entries to return"),
+    tenant: Optional[str] = Query(None, description="Only entries of this tenant"),
     supervisor_service: SupervisorService = Depends(get_supervisor_service)
-) -> List[KnowledgeBaseResponse]:
+) -> Response:
     """
-    Get knowledge base entries, optionally filtered by category
+    Get knowledge base entries, optionally filtered by category and tenant
     """
     try:
-        return await supervisor_service.get_knowledge_base(category=category, limit=limit)
+        rows = await supervisor_service.get_knowledge_base_rows(category=category, limit=limit, tenant=tenant)
+        return knowledge_base_serializer.response(rows)
 
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting knowledge base: {str(e)}")
 
@@ -100,22 +135,101 @@ async def get_knowledge_base(
 @router.post("/knowledge-base", response_model=KnowledgeBaseResponse)
 async def add_knowledge_entry(
     entry: KnowledgeBaseCreate,
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
     supervisor_service: SupervisorService = Depends(get_supervisor_service)
 ) -> KnowledgeBaseResponse:
     """
-    Manually add entry to knowledge base
+    Manually add entry to a tenant's knowledge base
     """
     try:
         return await supervisor_service.add_knowledge_entry(
             question=entry.question,
             answer=entry.answer,
-            category=entry.category
+            category=entry.category,
+            tenant=tenant
         )
 
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding knowledge entry: {str(e)}")
 
 
+@router.get("/knowledge-base/export")
+async def export_knowledge_base(
+    category: Optional[str] = Query(None, description="Filter by category"),
+    tenant: Optional[str] = Query(None, description="Only entries of this tenant"),
+    supervisor_service: SupervisorService = Depends(get_supervisor_service)
+) -> StreamingResponse:
+    """
+    Stream all knowledge base entries as NDJSON, one entry per line
+    """
+    if tenant:
+        # Resolve before streaming starts, so an unknown tenant is a 404 rather than a broken stream
+        try:
+            await supervisor_service.tenant_service.resolve(tenant)
+        except TenantNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    return StreamingResponse(
+        supervisor_service.export_knowledge_base(category=category, tenant=tenant),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="knowledge_base.ndjson"'}
+    )
+
+
+async def _iter_ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Split a streamed request body into lines without buffering it whole"""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+@router.post("/knowledge-base/import")
+async def import_knowledge_base(
+    request: Request,
+    dedupe: bool = Query(True, description="Skip questions already in the knowledge base"),
+    tenant: Optional[str] = Query(None, description="Tenant slug; the default tenant if omitted"),
+    supervisor_service: SupervisorService = Depends(get_supervisor_service)
+) -> BaseResponse:
+    """
+    Import knowledge base entries from an NDJSON body into a tenant's knowledge base
+
+    - Validates each line against the knowledge base entry schema
+    - Optionally skips duplicate questions
+    - Inserts in batches and bumps the knowledge base version once
+    """
+    try:
+        summary = await supervisor_service.import_knowledge_base(
+            _iter_ndjson_lines(request),
+            dedupe=dedupe,
+            tenant=tenant
+        )
+    except TenantNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing knowledge base: {str(e)}")
+
+    if summary["failure"] is not None:
+        # Entries before the failing line were imported; say how many so the rest can be retried
+        raise HTTPException(status_code=500, detail={
+            "message": f"Import stopped at line {summary['failed_at_line']} after "
+                       f"{summary['imported']} knowledge entries: {summary['failure']}",
+            **summary
+        })
+
+    return BaseResponse(
+        success=True,
+        message=f"Imported {summary['imported']} knowledge entries",
+        data=summary
+    )
+
+
 @router.get("/analytics", response_model=AnalyticsResponse)
 async def get_analytics(
     supervisor_service: SupervisorService = Depends(get_supervisor_service)
@@ -0,0 +1,223 @@
+"""
+Background delivery of customer follow-ups queued in ``request_followups``
+
+Resolving a help request only inserts a pending follow-up row. A worker pool
+claims due rows in batches under a lease, sends each through the channel for
+its ``follow_up_type`` at no more than that channel's rate, and marks it sent,
+schedules a retry with exponential backoff, or marks it failed.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .invalidation import ChangeEvent
+from .metrics import metrics
+from .repositories.followup_repository import FollowUpRepository
+
+logger = logging.getLogger(__name__)
+
+# Rows held at once are capped so the slowest channel sends them all within this share of the lease
+LEASE_HEADROOM = 0.5
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` sends per second with bursts of ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class FollowUpChannel(ABC):
+    """Delivers follow-ups of one type; ``send`` raises to have the row retried"""
+
+    def __init__(self, follow_up_type: str, rate: float):
+        self.name = follow_up_type
+        self.limiter = RateLimiter(rate)
+
+    @abstractmethod
+    async def send(self, recipient: str, message: str) -> None:
+        """Send one follow-up message to the customer"""
+
+
+class LogChannel(FollowUpChannel):
+    """Writes the follow-up to the backend log, standing in for an SMS, call or email provider"""
+
+    async def send(self, recipient: str, message: str) -> None:
+        logger.info(f"📱 CUSTOMER FOLLOW-UP via {self.name} to {recipient}: {message}")
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """Per-channel sends per second from ``"sms=1,call=0.2,email=5"``"""
+    rates = {}
+    for part in spec.split(","):
+        name, _, rate = part.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class FollowUpWorkerPool:
+    """
+    Claims due follow-ups in batches and delivers them with a fixed number of workers
+
+    One claimer task leases batches into a queue for the workers; ``wake``
+    lets a new follow-up skip the rest of the poll interval. The pool runs in
+    the leader process, which ``on_change`` wakes for follow-ups queued in
+    other workers when change events arrive over Postgres (migration 009);
+    without it they wait for the next poll. The claimer
+    holds no more rows than the slowest channel can send well within the
+    lease, and each row's lease is re-taken just before it is sent, so a row
+    whose lease ran out and was claimed elsewhere is dropped here instead of
+    being sent twice. Delivery is still at least once: a row whose outcome
+    is not recorded, e.g. on shutdown, is claimed again after its lease.
+    """
+
+    def __init__(self,
+                 followup_repo: FollowUpRepository,
+                 channels: List[FollowUpChannel],
+                 workers: int = 4,
+                 batch_size: int = 20,
+                 lease_seconds: int = 120,
+                 poll_interval: float = 5.0,
+                 max_attempts: int = 5,
+                 retry_delay: float = 30.0):
+        self.followup_repo = followup_repo
+        self.channels = {channel.name: channel for channel in channels}
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stats = metrics.followups
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._wake = asyncio.Event()
+        # Claimed rows not yet finished, and a signal when one finishes
+        self._held = 0
+        self._released = asyncio.Event()
+
+    def wake(self) -> None:
+        """Claim now instead of at the next poll, e.g. right after a follow-up was queued"""
+        self._wake.set()
+
+    async def on_change(self, event: ChangeEvent) -> None:
+        """Invalidation bus handler: wake on a follow-up queued by any worker"""
+        if event.table == "request_followups" and event.op == "INSERT":
+            self.wake()
+
+    @property
+    def max_held(self) -> int:
+        """Rows the slowest channel can send in ``LEASE_HEADROOM`` of the lease, at most a batch"""
+        slowest = min((channel.limiter.rate for channel in self.channels.values()), default=0)
+        if not slowest:
+            return self.batch_size
+        return max(1, min(self.batch_size, int(self.lease_seconds * slowest * LEASE_HEADROOM)))
+
+    async def run(self) -> None:
+        """Claim and deliver follow-ups until cancelled"""
+        workers = [asyncio.create_task(self._work(), name=f"followup-worker-{i}") for i in range(self.workers)]
+        try:
+            while True:
+                budget = self.max_held - self._held
+                if budget <= 0:
+                    # Holding all we can send within the lease: claim again once a row finishes
+                    self._released.clear()
+                    await self._released.wait()
+                    continue
+
+                claimed = await self._claim(budget)
+                if claimed < budget:
+                    # Drained the due rows: sleep until woken or the next poll
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wake.clear()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _claim(self, limit: int) -> int:
+        try:
+            rows = await self.followup_repo.claim_due(limit, self.lease_seconds)
+        except Exception as e:
+            logger.error(f"Claiming follow-ups failed: {e}")
+            return 0
+
+        self.stats.claimed += len(rows)
+        self._held += len(rows)
+        for row in rows:
+            self._queue.put_nowait(row)
+        return len(rows)
+
+    async def _work(self) -> None:
+        while True:
+            row = await self._queue.get()
+            self.stats.in_flight += 1
+            try:
+                await self._deliver(row)
+            except Exception as e:
+                # Leave the row leased; it is claimed again once the lease expires
+                logger.error(f"Recording follow-up {row['id']} outcome failed: {e}")
+            finally:
+                self.stats.in_flight -= 1
+                self._held -= 1
+                self._released.set()
+
+    async def _deliver(self, row: Dict[str, Any]) -> None:
+        channel = self.channels.get(row["follow_up_type"])
+        if channel is None:
+            await self.followup_repo.mark_failed(row["id"], f"No channel for {row['follow_up_type']}")
+            self.stats.failed(row["follow_up_type"])
+            return
+
+        await channel.limiter.acquire()
+        if not await self.followup_repo.renew_lease(row["id"], row["attempts"], self.lease_seconds):
+            # The lease ran out while the row waited and another claim owns it now
+            logger.warning(f"Follow-up {row['id']} was claimed again before it was sent; leaving it to that claim")
+            self.stats.lost_leases += 1
+            return
+
+        try:
+            await channel.send(row["recipient"], row["message"])
+        except Exception as e:
+            await self._retry_or_fail(row, channel.name, repr(e))
+            return
+
+        await self.followup_repo.mark_sent(row["id"])
+        self.stats.sent(channel.name)
+
+    async def _retry_or_fail(self, row: Dict[str, Any], channel: str, error: str) -> None:
+        attempts = row.get("attempts") or 1
+        if attempts >= self.max_attempts:
+            logger.error(f"Follow-up {row['id']} via {channel} failed after {attempts} attempts: {error}")
+            await self.followup_repo.mark_failed(row["id"], error)
+            self.stats.failed(channel)
+            return
+
+        delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(0.5, 1.0)
+        await self.followup_repo.mark_retry(row["id"], error, datetime.utcnow() + timedelta(seconds=delay))
+        self.stats.retries += 1
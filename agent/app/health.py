@@ -0,0 +1,101 @@
+"""
+Background dependency probes backing the health and readiness endpoints
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .repositories.base_repository import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Probes the database and the salon context cache on a fixed interval
+
+    Each probe is bounded by a timeout. Health endpoints only read the last
+    cached result, so a burst of load balancer checks never adds DB load.
+    Readiness also fails while the queries running or queued on the DB
+    executor reach ``max_saturation`` of its threads.
+    """
+
+    def __init__(self,
+                 db_probe: Callable[[Optional[float]], Awaitable[None]],
+                 context_probe: Callable[[], Awaitable[str]],
+                 context_cache_size: Callable[[], int],
+                 interval: float = 5.0,
+                 timeout: float = 2.0,
+                 max_saturation: float = 0.9):
+        self._db_probe = db_probe
+        self._context_probe = context_probe
+        self._context_cache_size = context_cache_size
+        self.interval = interval
+        self.timeout = timeout
+        self.max_saturation = max_saturation
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+
+    async def run(self) -> None:
+        """Refresh the cached result until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Run all probes once and cache the result"""
+        # Sampled before the probes, whose own queries would wait behind a backlog and drain it
+        pool = BaseRepository.executor()
+        active, waiting, saturation = pool.active, pool.waiting, pool.saturation
+
+        database = await self._timed("database", self._db_probe(self.timeout))
+        context = await self._timed("context_cache", self._context_probe())
+        context["entries"] = self._context_cache_size()
+
+        ready = database["ok"] and context["ok"] and saturation < self.max_saturation
+
+        self._result = {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "checks": {"database": database, "context_cache": context},
+            "db_pool": {
+                "active": active,
+                "waiting": waiting,
+                "size": pool.size,
+                "saturation": round(saturation, 4)
+            }
+        }
+        self._checked_at = time.monotonic()
+        return self._result
+
+    async def _timed(self, name: str, probe: Awaitable[Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe, self.timeout)
+            return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+        except Exception as e:
+            logger.warning(f"Health probe {name} failed: {e!r}")
+            return {
+                "ok": False,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+                "error": repr(e)
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Last probe result; reported as not ready if probes have stalled"""
+        if self._result is None:
+            return {"status": "not_ready", "checked_at": None, "checks": {}}
+
+        age = time.monotonic() - self._checked_at
+        result = dict(self._result, age_seconds=round(age, 3))
+        if age > 3 * self.interval + self.timeout:
+            result["status"] = "not_ready"
+            result["error"] = "health probes are stale"
+        return result
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot()["status"] == "ready"
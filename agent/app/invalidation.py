@@ -0,0 +1,307 @@
+"""
+Cross-process cache invalidation driven by Postgres LISTEN/NOTIFY
+
+Triggers from migrations/006_change_notifications.sql send a NOTIFY with the
+table, operation, row ID, tenant ID and a version for every committed write
+to a cached table. Each backend process listens on one connection, evicts
+the affected entries from its own caches and relays the events to agents
+subscribed to ``/events/invalidations``.
+
+``InMemoryBus`` is a stand-in with the same interface for a single process
+without a direct database connection, and for tests.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from .cache import TTLCache
+from .metrics import metrics
+from .projections import HelpRequestProjection
+from .repositories.help_request_repository import HelpRequestRepository
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "frontdesk_changes"
+
+# Events buffered per relay subscriber before it is told to resync instead
+RELAY_QUEUE_SIZE = 1000
+
+# Help request events are collected for this long, or up to this many rows, and refreshed in one query;
+# the triggers fire per row, so a timeout sweep of many requests arrives as a burst
+HELP_REQUEST_BATCH_SECONDS = 0.05
+HELP_REQUEST_BATCH_SIZE = 500
+
+
+class ChangeEvent(NamedTuple):
+    table: str
+    op: str
+    id: Optional[str]
+    tenant_id: Optional[str]
+    version: int
+
+    @classmethod
+    def from_json(cls, payload: str) -> "ChangeEvent":
+        data = json.loads(payload)
+        return cls(data["table"], data["op"], data.get("id"), data.get("tenant_id"), int(data.get("version") or 0))
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict())
+
+
+# Sent when events may have been missed (listener reconnected, subscriber overflowed): evict everything
+RESYNC = ChangeEvent("*", "RESYNC", None, None, 0)
+
+ChangeHandler = Callable[[ChangeEvent], Awaitable[None]]
+
+
+class InvalidationBus:
+    """Delivers change events to subscribed handlers in order; one failing handler does not stop the rest"""
+
+    def __init__(self):
+        self._handlers: List[ChangeHandler] = []
+
+    def subscribe(self, handler: ChangeHandler) -> None:
+        self._handlers.append(handler)
+
+    async def dispatch(self, event: ChangeEvent) -> None:
+        metrics.invalidation_event(event.table)
+        for handler in self._handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                logger.error(f"Invalidation handler failed for {event.table} {event.id}: {e!r}")
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class InMemoryBus(InvalidationBus):
+    """Single-process stand-in: published events go straight to the handlers"""
+
+    async def publish(self, event: ChangeEvent) -> None:
+        await self.dispatch(event)
+
+
+class PostgresBus(InvalidationBus):
+    """
+    LISTENs on ``channel`` over a dedicated asyncpg connection
+
+    Notifications are queued by the connection callback and dispatched by one
+    task, so handlers see them in commit order. NOTIFYs sent while the
+    connection is down are lost, so every reconnect dispatches ``RESYNC``.
+    """
+
+    def __init__(self,
+                 dsn: str,
+                 channel: str = CHANGES_CHANNEL,
+                 max_pending: int = 10000,
+                 reconnect_delay: float = 1.0,
+                 max_reconnect_delay: float = 30.0):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connected = False
+        self._pending: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks.append(asyncio.create_task(self._listen(), name="invalidation-listener"))
+        self._tasks.append(asyncio.create_task(self._dispatch_pending(), name="invalidation-dispatcher"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        delay = self.reconnect_delay
+        first = True
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                self.connected = True
+                logger.info(f"✅ Listening for cache invalidations on {self.channel}")
+
+                if not first:
+                    self._enqueue(RESYNC)
+                first = False
+                delay = self.reconnect_delay
+                await lost.wait()
+                logger.warning("Invalidation listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Invalidation listener failed to connect: {e}")
+            finally:
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = ChangeEvent.from_json(payload)
+        except (ValueError, KeyError) as e:
+            logger.error(f"Ignoring malformed change notification {payload!r}: {e}")
+            return
+        self._enqueue(event)
+
+    def _enqueue(self, event: ChangeEvent) -> None:
+        try:
+            self._pending.put_nowait(event)
+        except asyncio.QueueFull:
+            # Handlers fell behind: replace the backlog with one full eviction
+            while not self._pending.empty():
+                self._pending.get_nowait()
+            self._pending.put_nowait(RESYNC)
+
+    async def _dispatch_pending(self) -> None:
+        while True:
+            await self.dispatch(await self._pending.get())
+
+
+class CacheInvalidator:
+    """
+    Evicts exactly what a change event affects from one backend process's caches
+
+    Changed help requests are re-read into the projection in batches: events
+    arriving within ``batch_window`` of each other are fetched with one query.
+    """
+
+    def __init__(self,
+                 context_cache: TTLCache,
+                 tenant_cache: TTLCache,
+                 projection: Optional[HelpRequestProjection] = None,
+                 help_request_repo: Optional[HelpRequestRepository] = None,
+                 batch_window: float = HELP_REQUEST_BATCH_SECONDS,
+                 max_batch: int = HELP_REQUEST_BATCH_SIZE):
+        self.context_cache = context_cache
+        self.tenant_cache = tenant_cache
+        self.projection = projection
+        self.help_request_repo = help_request_repo
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        # Changed help request IDs not yet refreshed, with INSERT kept over later updates
+        self._pending: Dict[str, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def __call__(self, event: ChangeEvent) -> None:
+        if event.op == RESYNC.op:
+            self.context_cache.invalidate()
+            self.tenant_cache.invalidate()
+            if self.projection is not None:
+                await self.projection.reconcile()
+        elif event.table == "knowledge_base":
+            # Contexts are keyed by tenant ID; an entry without one could be in any of them
+            self.context_cache.invalidate(event.tenant_id)
+            if self.projection is not None:
+                self.projection.knowledge_changed()
+        elif event.table == "tenants":
+            # The tenant cache is keyed by slug, which the event does not carry
+            self.tenant_cache.invalidate()
+            self.context_cache.invalidate(event.id)
+        elif event.table == "help_requests":
+            await self._refresh_help_request(event)
+        # customers: nothing cached in the backend; the event is only relayed
+
+    async def _refresh_help_request(self, event: ChangeEvent) -> None:
+        """Queue the request for the next batch refresh of the projection"""
+        if self.projection is None or self.help_request_repo is None or event.id is None:
+            return
+        if event.op == "DELETE":
+            # Rare enough to leave to the periodic reconciliation
+            return
+
+        if self._pending.get(event.id) != "INSERT":
+            self._pending[event.id] = event.op
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(), name="help-request-refresh")
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Refreshing changed help requests failed; left to reconciliation: {e!r}")
+
+    async def flush(self) -> None:
+        """Apply the current rows of the queued help requests; repeats of this process's own writes are no-ops"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        rows = await self.help_request_repo.get_by_ids(list(pending))
+        # The table row has no customer name; the dashboard shows the one its view joins on
+        names = await self.help_request_repo.get_customer_names(
+            [request_id for request_id, op in pending.items() if op == "INSERT"]
+        )
+        for row in rows:
+            request_id = str(row["id"])
+            if pending.get(request_id) == "INSERT":
+                self.projection.request_created({**row, "customer_name": names.get(request_id)})
+            else:
+                self.projection.request_updated(row)
+
+    async def close(self) -> None:
+        """Stop the scheduled batch refresh; reconciliation covers what it would have applied"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+
+
+class EventRelay:
+    """Fans change events out to streaming subscribers, e.g. agent workers"""
+
+    def __init__(self, queue_size: int = RELAY_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def open(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def close(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def close_all(self) -> None:
+        """End every open stream, e.g. so a draining worker is not held open by idle subscribers"""
+        for queue in self._subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    async def __call__(self, event: ChangeEvent) -> None:
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow subscriber gets one resync instead of an unbounded backlog
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
@@ -0,0 +1,46 @@
+"""
+Knowledge base entries as agents see them
+
+The backend renders the knowledge section of ``/ai/context`` with
+``render_knowledge_section``. Agents that keep a local copy of the
+knowledge base, patched from ``/ai/knowledge/changes``, render the same
+text from it once they are synced to the same version. Entries are ordered
+by ``usage_rank``, which the feed carries, rather than by the live usage
+count, which it does not (migration 010).
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+# Columns of an entry served by the snapshot and change feed
+FEED_COLUMNS = "id, question, answer, category, confidence_score, usage_count, usage_rank"
+
+# Most used entries included in a prompt
+CONTEXT_KNOWLEDGE_LIMIT = 50
+MIN_CONTEXT_CONFIDENCE = 0.7
+
+
+def usage_rank(usage_count: Optional[int]) -> int:
+    """Binary digits of the usage count, as the generated column of migration 010 computes it"""
+    return (usage_count or 0).bit_length()
+
+
+def most_used(entries: Iterable[Dict[str, Any]], limit: int = CONTEXT_KNOWLEDGE_LIMIT) -> List[Dict[str, Any]]:
+    """The ``limit`` entries with the highest usage rank, as ``get_most_used`` orders them"""
+    return sorted(entries, key=lambda entry: (-(entry.get("usage_rank") or 0), str(entry["id"])))[:limit]
+
+
+def render_knowledge_section(entries: List[Dict[str, Any]]) -> str:
+    """Prompt section listing pre-approved answers; empty when there are no entries"""
+    if not entries:
+        return ""
+
+    parts = [
+        "\n\nKNOWLEDGE BASE ANSWERS:\n",
+        "Use these pre-approved answers when customers ask related questions:\n\n",
+    ]
+    for entry in entries:
+        if entry.get("confidence_score", 1.0) >= MIN_CONTEXT_CONFIDENCE:
+            parts.append(f"Q: {entry.get('question', '')}\n")
+            parts.append(f"A: {entry.get('answer', '')}\n")
+            parts.append(f"Category: {entry.get('category', 'general')}\n\n")
+    return "".join(parts)
@@ -0,0 +1,176 @@
+"""
+Leader election for background work that must run in one process only
+
+With several backend workers, possibly on several hosts, every process
+builds the same container. Jobs such as the timeout sweeper would then run
+once per worker. ``LeaderElection`` runs them only in the process holding a
+lock and hands them over when that process exits or loses the lock.
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Key of the Postgres advisory lock; any constant shared by all workers will do
+ADVISORY_LOCK_KEY = 0x66726F6E74  # "front"
+
+
+class LeaderLock(ABC):
+    """A lock at most one process holds; it is released when the holder dies"""
+
+    @abstractmethod
+    async def try_acquire(self) -> bool:
+        """Take the lock without waiting; False if another process holds it"""
+
+    async def held(self) -> bool:
+        """Whether the lock is still ours; checked periodically while leading"""
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+class FileLeaderLock(LeaderLock):
+    """``flock`` on a local file: elects one leader among the workers of one host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    async def try_acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    async def release(self) -> None:
+        if self._fd is not None:
+            # Closing the descriptor drops the flock
+            os.close(self._fd)
+            self._fd = None
+
+
+class PostgresLeaderLock(LeaderLock):
+    """
+    Session advisory lock on a dedicated asyncpg connection, across hosts
+
+    Postgres releases the lock when the session ends, so a crashed leader
+    frees it as soon as its connection is gone. Needs a direct or session
+    mode connection: a transaction mode pooler would not keep the session.
+    """
+
+    def __init__(self, dsn: str, key: int = ADVISORY_LOCK_KEY):
+        self.dsn = dsn
+        self.key = key
+        self._connection = None
+
+    async def try_acquire(self) -> bool:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            acquired = await connection.fetchval("SELECT pg_try_advisory_lock($1)", self.key)
+        except Exception:
+            await connection.close()
+            raise
+        if not acquired:
+            await connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    async def held(self) -> bool:
+        if self._connection is None or self._connection.is_closed():
+            return False
+        try:
+            await self._connection.fetchval("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def release(self) -> None:
+        if self._connection is not None:
+            if not self._connection.is_closed():
+                # Closing the session releases the advisory lock with it
+                await self._connection.close()
+            self._connection = None
+
+
+JobFactory = Callable[[], Awaitable[None]]
+
+
+class LeaderElection:
+    """
+    Runs registered jobs while this process holds ``lock``
+
+    Followers retry the lock every ``retry_interval`` seconds. The leader
+    checks that it still holds the lock at the same interval; when it no
+    longer does, or a job exits, the jobs are cancelled and the process goes
+    back to competing for the lock.
+    """
+
+    def __init__(self, lock: LeaderLock, retry_interval: float = 5.0, report: bool = True):
+        self.lock = lock
+        self.retry_interval = retry_interval
+        # Only the main election sets the leader gauge
+        self.report = report
+        self.is_leader = False
+        self._jobs: Dict[str, JobFactory] = {}
+
+    def add(self, name: str, job: JobFactory) -> None:
+        self._jobs[name] = job
+
+    async def run(self) -> None:
+        """Compete for the lock and lead until cancelled"""
+        while True:
+            try:
+                acquired = await self.lock.try_acquire()
+            except Exception as e:
+                logger.error(f"Leader election failed: {e}")
+                acquired = False
+
+            if acquired:
+                try:
+                    await self._lead()
+                finally:
+                    self.is_leader = False
+                    if self.report:
+                        metrics.leader = 0
+                    await self.lock.release()
+            await asyncio.sleep(self.retry_interval)
+
+    async def _lead(self) -> None:
+        self.is_leader = True
+        if self.report:
+            metrics.leader = 1
+        logger.info(f"👑 Worker {os.getpid()} is the leader; running {', '.join(self._jobs)}")
+        tasks = [asyncio.create_task(job(), name=name) for name, job in self._jobs.items()]
+        try:
+            while True:
+                done, _ = await asyncio.wait(tasks, timeout=self.retry_interval,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if done:
+                    for task in done:
+                        if not task.cancelled() and task.exception() is not None:
+                            logger.error(f"Leader job {task.get_name()} failed: {task.exception()!r}")
+                    return
+                if not await self.lock.held():
+                    logger.warning(f"Worker {os.getpid()} lost the leader lock")
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
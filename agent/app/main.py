@@ -7,13 +7,18 @@ import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(dotenv_path=".env.local")
 
-from .controllers import ai_controller, supervisor_controller
-from .middleware.logging_middleware import LoggingMiddleware, ErrorHandlingMiddleware
+from .controllers import ai_controller, supervisor_controller, events_controller
+from .middleware.logging_middleware import LoggingMiddleware
+from .middleware.rate_limit_middleware import RateLimitMiddleware
+from .metrics import metrics
+from .container import AppContainer
+from .tracing import tracer
 
 # Configure logging
 logging.basicConfig(
@@ -30,23 +35,25 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Frontdesk AI Supervisor Backend starting up...")
 
     # Startup tasks
+    tracer.configure("backend")
+    container = AppContainer()
     try:
-        # Test database connection
-        from .repositories.base_repository import BaseRepository
-        repo = BaseRepository("customers")  # Test table
-        logger.info("✅ Database connection established")
-
-        # Any other startup tasks
+        # Build shared services, warm up the database and caches
+        await container.start()
+        app.state.container = container
         logger.info("✅ Backend startup completed successfully")
 
     except Exception as e:
         logger.error(f"❌ Startup failed: {e}")
+        await container.stop()
         raise
 
     yield
 
     # Shutdown tasks
     logger.info("🛑 Frontdesk AI Supervisor Backend shutting down...")
+    await container.stop()
+    tracer.flush()
 
 
 # Create FastAPI application
@@ -74,8 +81,8 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Add middleware
-app.add_middleware(ErrorHandlingMiddleware)
+# Add middleware; the rate limiter sits inside logging so rejections are logged and counted
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(
     CORSMiddleware,
@@ -88,6 +95,7 @@ app.add_middleware(
 # Include routers
 app.include_router(ai_controller.router)
 app.include_router(supervisor_controller.router)
+app.include_router(events_controller.router)
 
 
 @app.get("/")
@@ -102,26 +110,46 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
-    """Detailed health check"""
-    try:
-        # Test database connection
-        from .repositories.base_repository import BaseRepository
-        repo = BaseRepository("customers")
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "timestamp": "2024-01-01T00:00:00Z"  # Would be actual timestamp
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e)
-        }
+async def health_check() -> JSONResponse:
+    """Detailed health check served from the last background probe"""
+    container = getattr(app.state, "container", None)
+    if container is None or container.health is None:
+        return JSONResponse({"status": "unhealthy", "database": "disconnected"})
+
+    result = container.health.snapshot()
+    database = result.get("checks", {}).get("database", {})
+    return JSONResponse({
+        "status": "healthy" if result["status"] == "ready" else "unhealthy",
+        "database": "connected" if database.get("ok") else "disconnected",
+        "timestamp": result["checked_at"],
+        **result
+    })
+
+
+@app.get("/health/live")
+async def liveness_check() -> dict:
+    """Liveness probe: the process is up and its event loop is responsive"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check() -> JSONResponse:
+    """Readiness probe: 503 until startup finished and dependency probes pass"""
+    container = getattr(app.state, "container", None)
+    if container is None or not container.ready or container.health is None:
+        return JSONResponse({"status": "not_ready", "checks": {}}, status_code=503)
+
+    result = container.health.snapshot()
+    return JSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint with request, DB and cache metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
+# Single-process development server with autoreload; production runs `python -m app.serve`
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,341 @@
+"""
+In-process Prometheus-style metrics
+
+All updates happen on the event loop thread, so counters and histograms are
+plain Python ints and lists with no locking. Metric objects are created the
+first time a label set is seen; after that recording a value is a bisect and
+a couple of integer bumps.
+"""
+
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+# Latency buckets in seconds, tuned for API and DB round trips
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Notification delivery latency buckets in seconds; coalescing adds up to its window
+NOTIFICATION_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+# Quantiles estimated from the histograms and exported alongside them
+EXPORTED_QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket histogram; the last slot counts values above every bound"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class RouteStats:
+    """Latency histogram and status code counts for one method and route"""
+
+    __slots__ = ("latency", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses: Dict[int, int] = {}
+
+    def record(self, status_code: int, duration: float) -> None:
+        self.latency.observe(duration)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+
+class CacheStats:
+    """Hit and miss counters for one named cache"""
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self) -> None:
+        self.hits += 1
+
+    def miss(self) -> None:
+        self.misses += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SingleFlightStats:
+    """Calls that ran versus calls that joined one already in flight"""
+
+    __slots__ = ("executed", "coalesced")
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+
+
+class NotificationStats:
+    """Queue depth, drop and delivery counters for supervisor notifications"""
+
+    def __init__(self):
+        self.queue_depth = 0
+        self.queue_capacity = 0
+        self.in_flight = 0
+        self.enqueued = 0
+        self.dropped = 0
+        self.digests = 0
+        self.retries = 0
+        self.sent: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.latency = Histogram(NOTIFICATION_BUCKETS)
+
+    def delivered(self, sink: str, count: int) -> None:
+        self.sent[sink] = self.sent.get(sink, 0) + count
+
+    def failed(self, sink: str, count: int) -> None:
+        self.failures[sink] = self.failures.get(sink, 0) + count
+
+
+class FollowUpStats:
+    """Claim, retry and per-channel outcome counters for customer follow-ups"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.claimed = 0
+        self.retries = 0
+        # Rows dropped before sending because another claim took them over after our lease ran out
+        self.lost_leases = 0
+        self.sent_by_channel: Dict[str, int] = {}
+        self.failed_by_channel: Dict[str, int] = {}
+
+    def sent(self, channel: str) -> None:
+        self.sent_by_channel[channel] = self.sent_by_channel.get(channel, 0) + 1
+
+    def failed(self, channel: str) -> None:
+        self.failed_by_channel[channel] = self.failed_by_channel.get(channel, 0) + 1
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "frontdesk"):
+        self.prefix = prefix
+        self.in_flight = 0
+        self.db_in_flight = 0
+        # 1 while this worker holds the leader lock and runs the singleton jobs
+        self.leader = 0
+        self._routes: Dict[str, Dict[str, RouteStats]] = {}
+        self._db_calls: Dict[str, Dict[str, Histogram]] = {}
+        self._caches: Dict[str, CacheStats] = {}
+        self._singleflights: Dict[str, SingleFlightStats] = {}
+        self.notifications = NotificationStats()
+        self.followups = FollowUpStats()
+        self._invalidations: Dict[str, int] = {}
+        self._rate_limited: Dict[Tuple[str, str], int] = {}
+        # Token buckets currently tracked by the rate limiter
+        self.rate_limit_keys = 0
+
+    def route_stats(self, method: str, route: str) -> RouteStats:
+        """Get or create the stats object for a method and route template"""
+        by_route = self._routes.get(method)
+        if by_route is None:
+            by_route = self._routes[method] = {}
+        stats = by_route.get(route)
+        if stats is None:
+            stats = by_route[route] = RouteStats()
+        return stats
+
+    def db_histogram(self, table: str, method: str) -> Histogram:
+        """Get or create the latency histogram for a repository method on a table"""
+        by_method = self._db_calls.get(table)
+        if by_method is None:
+            by_method = self._db_calls[table] = {}
+        histogram = by_method.get(method)
+        if histogram is None:
+            histogram = by_method[method] = Histogram()
+        return histogram
+
+    def cache(self, name: str) -> CacheStats:
+        """Get or create hit/miss counters for a named cache"""
+        stats = self._caches.get(name)
+        if stats is None:
+            stats = self._caches[name] = CacheStats()
+        return stats
+
+    def singleflight(self, name: str) -> SingleFlightStats:
+        """Get or create executed/coalesced counters for a named single-flight group"""
+        stats = self._singleflights.get(name)
+        if stats is None:
+            stats = self._singleflights[name] = SingleFlightStats()
+        return stats
+
+    def invalidation_event(self, table: str) -> None:
+        """Count a cache invalidation event received for a table"""
+        self._invalidations[table] = self._invalidations.get(table, 0) + 1
+
+    def rate_limited(self, limit: str, route: str) -> None:
+        """Count a request rejected by the rate limit on ``limit``, e.g. customer_phone"""
+        key = (limit, route)
+        self._rate_limited[key] = self._rate_limited.get(key, 0) + 1
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        p = self.prefix
+        lines: List[str] = []
+
+        lines.append(f"# TYPE {p}_http_requests_in_flight gauge")
+        lines.append(f"{p}_http_requests_in_flight {self.in_flight}")
+
+        lines.append(f"# TYPE {p}_http_requests_total counter")
+        for method, by_route in self._routes.items():
+            for route, stats in by_route.items():
+                for status_code, count in stats.statuses.items():
+                    lines.append(
+                        f'{p}_http_requests_total{{method="{method}",route="{route}",'
+                        f'status="{status_code}"}} {count}'
+                    )
+
+        lines.append(f"# TYPE {p}_http_request_duration_seconds histogram")
+        for method, by_route in self._routes.items():
+            for route, stats in by_route.items():
+                labels = f'method="{method}",route="{route}"'
+                _render_histogram(lines, f"{p}_http_request_duration_seconds", labels, stats.latency)
+
+        lines.append(f"# TYPE {p}_http_request_duration_quantile_seconds gauge")
+        for method, by_route in self._routes.items():
+            for route, stats in by_route.items():
+                for q in EXPORTED_QUANTILES:
+                    lines.append(
+                        f'{p}_http_request_duration_quantile_seconds{{method="{method}",'
+                        f'route="{route}",quantile="{q}"}} {stats.latency.quantile(q):.6f}'
+                    )
+
+        lines.append(f"# TYPE {p}_db_calls_in_flight gauge")
+        lines.append(f"{p}_db_calls_in_flight {self.db_in_flight}")
+
+        lines.append(f"# TYPE {p}_db_call_duration_seconds histogram")
+        for table, by_method in self._db_calls.items():
+            for method, histogram in by_method.items():
+                labels = f'table="{table}",method="{method}"'
+                _render_histogram(lines, f"{p}_db_call_duration_seconds", labels, histogram)
+
+        lines.append(f"# TYPE {p}_cache_hits_total counter")
+        lines.append(f"# TYPE {p}_cache_misses_total counter")
+        lines.append(f"# TYPE {p}_cache_hit_ratio gauge")
+        for name, stats in self._caches.items():
+            lines.append(f'{p}_cache_hits_total{{cache="{name}"}} {stats.hits}')
+            lines.append(f'{p}_cache_misses_total{{cache="{name}"}} {stats.misses}')
+            lines.append(f'{p}_cache_hit_ratio{{cache="{name}"}} {stats.hit_ratio:.4f}')
+
+        lines.append(f"# TYPE {p}_singleflight_calls_total counter")
+        for name, flight in self._singleflights.items():
+            lines.append(f'{p}_singleflight_calls_total{{group="{name}",result="executed"}} {flight.executed}')
+            lines.append(f'{p}_singleflight_calls_total{{group="{name}",result="coalesced"}} {flight.coalesced}')
+
+        n = self.notifications
+        lines.append(f"# TYPE {p}_notification_queue_depth gauge")
+        lines.append(f"{p}_notification_queue_depth {n.queue_depth}")
+        lines.append(f"# TYPE {p}_notification_queue_capacity gauge")
+        lines.append(f"{p}_notification_queue_capacity {n.queue_capacity}")
+        lines.append(f"# TYPE {p}_notification_deliveries_in_flight gauge")
+        lines.append(f"{p}_notification_deliveries_in_flight {n.in_flight}")
+        for name, value in (("enqueued", n.enqueued), ("dropped", n.dropped),
+                            ("digests", n.digests), ("retries", n.retries)):
+            lines.append(f"# TYPE {p}_notifications_{name}_total counter")
+            lines.append(f"{p}_notifications_{name}_total {value}")
+        lines.append(f"# TYPE {p}_notifications_sent_total counter")
+        for sink, count in n.sent.items():
+            lines.append(f'{p}_notifications_sent_total{{sink="{sink}"}} {count}')
+        lines.append(f"# TYPE {p}_notifications_failed_total counter")
+        for sink, count in n.failures.items():
+            lines.append(f'{p}_notifications_failed_total{{sink="{sink}"}} {count}')
+        lines.append(f"# TYPE {p}_notification_delivery_seconds histogram")
+        _render_histogram(lines, f"{p}_notification_delivery_seconds", 'queue="supervisor"', n.latency)
+
+        f = self.followups
+        lines.append(f"# TYPE {p}_followups_in_flight gauge")
+        lines.append(f"{p}_followups_in_flight {f.in_flight}")
+        lines.append(f"# TYPE {p}_followups_claimed_total counter")
+        lines.append(f"{p}_followups_claimed_total {f.claimed}")
+        lines.append(f"# TYPE {p}_followups_retries_total counter")
+        lines.append(f"{p}_followups_retries_total {f.retries}")
+        lines.append(f"# TYPE {p}_followups_lost_leases_total counter")
+        lines.append(f"{p}_followups_lost_leases_total {f.lost_leases}")
+        lines.append(f"# TYPE {p}_followups_sent_total counter")
+        for channel, count in f.sent_by_channel.items():
+            lines.append(f'{p}_followups_sent_total{{channel="{channel}"}} {count}')
+        lines.append(f"# TYPE {p}_followups_failed_total counter")
+        for channel, count in f.failed_by_channel.items():
+            lines.append(f'{p}_followups_failed_total{{channel="{channel}"}} {count}')
+
+        lines.append(f"# TYPE {p}_leader gauge")
+        lines.append(f"{p}_leader {self.leader}")
+
+        lines.append(f"# TYPE {p}_invalidation_events_total counter")
+        for table, count in self._invalidations.items():
+            lines.append(f'{p}_invalidation_events_total{{table="{table}"}} {count}')
+
+        lines.append(f"# TYPE {p}_rate_limit_keys gauge")
+        lines.append(f"{p}_rate_limit_keys {self.rate_limit_keys}")
+        lines.append(f"# TYPE {p}_rate_limited_total counter")
+        for (limit, route), count in self._rate_limited.items():
+            lines.append(f'{p}_rate_limited_total{{limit="{limit}",route="{route}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines: List[str], name: str, labels: str, histogram: Histogram) -> None:
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def timed_db_call(method: str, func: Callable) -> Callable:
+    """Wrap a repository coroutine so each call lands in its table's latency histogram"""
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        metrics.db_in_flight += 1
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            metrics.db_in_flight -= 1
+            metrics.db_histogram(self.table_name, method).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+# Global registry shared by the middleware, repositories and caches
+metrics = MetricsRegistry()
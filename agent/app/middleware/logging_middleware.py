@@ -4,81 +4,137 @@ Logging and monitoring middleware
 
 import time
 import logging
+from typing import Optional
 from uuid import uuid4
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-
-logger = logging.getLogger(__name__)
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from ..metrics import metrics
+from ..tracing import Span, parse_traceparent, tracer
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for request/response logging and monitoring"""
-
-    async def dispatch(self, request: Request, call_next):
-        # Generate request ID
-        request_id = str(uuid4())
+logger = logging.getLogger(__name__)
 
-        # Add request ID to request state
-        request.state.request_id = request_id
+# Longest caller-supplied X-Request-ID that is reused instead of replaced
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class LoggingMiddleware:
+    """
+    Pure ASGI middleware for request logging, monitoring, tracing and global error handling
+
+    - Assigns a request ID, exposed as ``request.state.request_id``. A
+      caller-supplied ``X-Request-ID`` is reused, so agent and backend logs
+      line up
+    - Continues the caller's W3C ``traceparent`` in a server span that
+      repository query spans nest under
+    - Adds ``X-Request-ID`` and ``X-Process-Time`` response headers
+    - Records route latency and status metrics
+    - Turns unhandled exceptions into a JSON 500 response
+
+    Unlike ``BaseHTTPMiddleware`` it does not run the app in a separate task or
+    buffer the body through memory streams, so streaming responses pass through
+    untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming_request_id: Optional[str] = None
+        traceparent: Optional[str] = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                incoming_request_id = value.decode("latin-1")
+            elif name == b"traceparent":
+                traceparent = value.decode("latin-1")
+
+        # Reuse the caller's request ID when it is sane, otherwise generate one
+        if incoming_request_id and len(incoming_request_id) <= MAX_REQUEST_ID_LENGTH:
+            request_id = incoming_request_id
+        else:
+            request_id = str(uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        method = scope["method"]
+        path = scope["path"]
+        status_code = 500
+        response_started = False
 
         # Log request
-        start_time = time.time()
-        logger.info(f"[{request_id}] {request.method} {request.url.path} - Request started")
-
-        try:
-            # Process request
-            response = await call_next(request)
-
-            # Calculate processing time
-            process_time = time.time() - start_time
-
-            # Add headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(process_time)
-
-            # Log response
-            logger.info(f"[{request_id}] {request.method} {request.url.path} - "
-                       f"Status: {response.status_code}, Time: {process_time:.3f}s")
-
-            return response
-
-        except Exception as e:
-            # Calculate processing time
-            process_time = time.time() - start_time
-
-            # Log error
-            logger.error(f"[{request_id}] {request.method} {request.url.path} - "
-                        f"Error: {str(e)}, Time: {process_time:.3f}s")
-
-            # Return error response
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "success": False,
-                    "message": "Internal server error",
-                    "request_id": request_id
-                },
-                headers={"X-Request-ID": request_id}
-            )
-
-
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    """Middleware for global error handling"""
-
-    async def dispatch(self, request: Request, call_next):
-        try:
-            return await call_next(request)
-        except Exception as e:
-            request_id = getattr(request.state, 'request_id', 'unknown')
-
-            logger.error(f"[{request_id}] Unhandled exception: {str(e)}", exc_info=True)
-
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "success": False,
-                    "message": "An unexpected error occurred",
-                    "request_id": request_id
-                }
-            )
\ No newline at end of file
+        start_time = time.perf_counter()
+        logger.info(f"[{request_id}] {method} {path} - Request started")
+        metrics.in_flight += 1
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+
+                # Add headers
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = str(time.perf_counter() - start_time)
+
+            await send(message)
+
+        with tracer.start_span(f"{method} {path}", kind="server", parent=parse_traceparent(traceparent)) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+
+            except Exception as e:
+                logger.error(f"[{request_id}] Unhandled exception: {str(e)}", exc_info=True)
+
+                # Nothing sensible can be sent once the response has begun
+                if response_started:
+                    raise
+
+                # Return error response
+                status_code = 500
+                response = JSONResponse(
+                    status_code=500,
+                    content={
+                        "success": False,
+                        "message": "An unexpected error occurred",
+                        "request_id": request_id
+                    }
+                )
+                await response(scope, receive, send_wrapper)
+
+            finally:
+                metrics.in_flight -= 1
+
+                # Calculate processing time
+                process_time = time.perf_counter() - start_time
+                _record_request(scope, method, status_code, process_time)
+                if span.sampled:
+                    _annotate_span(span, scope, method, status_code, request_id)
+
+                # Log response
+                logger.info(f"[{request_id}] {method} {path} - "
+                            f"Status: {status_code}, Time: {process_time:.3f}s")
+
+
+def _record_request(scope: Scope, method: str, status_code: int, process_time: float) -> None:
+    """Record request latency and status against the matched route template"""
+    route = scope.get("route")
+    route_path = route.path if route is not None else "<unmatched>"
+    metrics.route_stats(method, route_path).record(status_code, process_time)
+
+
+def _annotate_span(span: Span, scope: Scope, method: str, status_code: int, request_id: str) -> None:
+    """Name the server span after the matched route and attach HTTP attributes"""
+    route = scope.get("route")
+    if route is not None:
+        span.name = f"{method} {route.path}"
+    span.set_attribute("http.method", method)
+    span.set_attribute("http.target", scope["path"])
+    span.set_attribute("http.status_code", status_code)
+    span.set_attribute("request_id", request_id)
+    if status_code >= 500:
+        span.set_error()
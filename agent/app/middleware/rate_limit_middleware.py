@@ -0,0 +1,237 @@
+"""
+Per-caller admission control for ticket creation
+"""
+
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Agents send the call session with every request made on a call's behalf
+CALL_SESSION_HEADER = b"x-call-session-id"
+
+# Requests that write help requests and notify supervisors
+LIMITED_ROUTES: FrozenSet[Tuple[str, str]] = frozenset({
+    ("POST", "/ai/create-ticket"),
+    ("POST", "/ai/query"),
+})
+
+# JSON bodies above this size are not inspected for keys; /ai/query bodies are a few KB
+MAX_INSPECTED_BODY = 64 * 1024
+
+# Only real numbers get a phone bucket; placeholders such as "unknown" are shared by many calls
+_PHONE = re.compile(r"^\+?[1-9]\d{1,14}$")
+
+
+class TokenBuckets:
+    """
+    Token buckets for many keys, each refilling at ``rate`` per second up to ``burst``
+
+    A bucket is two floats, created on first use. Buckets idle for
+    ``idle_seconds`` are full again, so they are evicted rather than kept:
+    entries are ordered by last use and expired ones are popped from the
+    front on each call. Beyond ``max_keys`` the least recently used bucket
+    is evicted early, which can only let its caller in sooner.
+    """
+
+    def __init__(self, rate: float, burst: float, idle_seconds: float = 600.0, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        # No sooner than a bucket would have refilled, so evicting never forgives debt
+        self.idle_seconds = max(idle_seconds, burst / rate)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Spend one token for ``key``; 0.0 if admitted, else seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def refund(self, key: str) -> None:
+        """Give back a token taken for a request that another limit then rejected"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + 1)
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.idle_seconds and len(buckets) < self.max_keys:
+                return
+            del buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware limiting ticket-creating requests per caller
+
+    Each limited request takes a token from the bucket of its customer phone
+    and of its call session. The keys come from the query string, the
+    ``X-Call-Session-ID`` header or the JSON body, which is buffered and
+    replayed to the app. A request is admitted only when every bucket it
+    maps to has a token, so a looping agent or an abusive caller is stopped
+    without affecting other callers. Rejections are a structured 429 with
+    ``Retry-After`` and are counted per key kind.
+
+    Buckets are kept per backend worker, so with N workers a caller whose
+    requests are spread over all of them gets up to N times the rate.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Optional[Dict[str, TokenBuckets]] = None):
+        self.app = app
+        if limits is None:
+            idle = float(os.getenv("RATE_LIMIT_IDLE_SECONDS", "600"))
+            max_keys = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+            limits = {
+                "customer_phone": TokenBuckets(
+                    rate=float(os.getenv("RATE_LIMIT_PHONE_PER_MINUTE", "6")) / 60,
+                    burst=float(os.getenv("RATE_LIMIT_PHONE_BURST", "5")),
+                    idle_seconds=idle, max_keys=max_keys),
+                "call_session_id": TokenBuckets(
+                    rate=float(os.getenv("RATE_LIMIT_SESSION_PER_MINUTE", "12")) / 60,
+                    burst=float(os.getenv("RATE_LIMIT_SESSION_BURST", "10")),
+                    idle_seconds=idle, max_keys=max_keys),
+            }
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in LIMITED_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        keys = _keys_from_query(scope)
+        for name, value in scope["headers"]:
+            if name == CALL_SESSION_HEADER:
+                keys.setdefault("call_session_id", value.decode("latin-1"))
+
+        if any(kind not in keys for kind in self.limits) and _is_json(scope):
+            body, receive = await _buffer_body(receive)
+            for kind, value in _keys_from_body(body).items():
+                keys.setdefault(kind, value)
+
+        now = time.monotonic()
+        taken: List[Tuple[TokenBuckets, str]] = []
+        for kind, buckets in self.limits.items():
+            key = keys.get(kind)
+            if not key:
+                continue
+            retry_after = buckets.take(key, now)
+            if retry_after:
+                for bucket, taken_key in taken:
+                    bucket.refund(taken_key)
+                await self._reject(scope, receive, send, kind, key, retry_after)
+                return
+            taken.append((buckets, key))
+
+        metrics.rate_limit_keys = sum(len(buckets) for buckets in self.limits.values())
+        await self.app(scope, receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send,
+                      kind: str, key: str, retry_after: float) -> None:
+        metrics.rate_limited(kind, scope["path"])
+        request_id = scope.get("state", {}).get("request_id")
+        logger.warning(f"[{request_id}] Rate limited {scope['method']} {scope['path']} for {kind} {key}")
+
+        seconds = max(1, math.ceil(retry_after))
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "success": False,
+                "message": f"Too many requests for this {kind.replace('_', ' ')}; retry in {seconds}s",
+                "error_code": "rate_limited",
+                "limit": kind,
+                "retry_after": seconds,
+                "request_id": request_id
+            },
+            headers={"Retry-After": str(seconds)}
+        )
+        await response(scope, receive, send)
+
+
+def _keys_from_query(scope: Scope) -> Dict[str, str]:
+    keys: Dict[str, str] = {}
+    if not scope["query_string"]:
+        return keys
+    params = parse_qs(scope["query_string"].decode("latin-1"))
+    for kind in ("customer_phone", "call_session_id"):
+        if params.get(kind):
+            keys[kind] = params[kind][0]
+    return _valid(keys)
+
+
+def _keys_from_body(body: bytes) -> Dict[str, str]:
+    if not body or len(body) > MAX_INSPECTED_BODY:
+        return {}
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return _valid({kind: str(data[kind]) for kind in ("customer_phone", "call_session_id") if data.get(kind)})
+
+
+def _valid(keys: Dict[str, str]) -> Dict[str, str]:
+    phone = keys.get("customer_phone")
+    if phone is not None and not _PHONE.match(phone):
+        del keys["customer_phone"]
+    return keys
+
+
+def _is_json(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"content-type":
+            return value.startswith(b"application/json")
+    return False
+
+
+async def _buffer_body(receive: Receive) -> Tuple[bytes, Receive]:
+    """Read the whole request body and return it with a ``receive`` that replays it"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            # Disconnected before the body arrived; the app sees the same message
+            replayed: List[Message] = [message]
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            body = b"".join(chunks)
+            replayed = [{"type": "http.request", "body": body, "more_body": False}]
+            break
+
+    async def replay() -> Message:
+        if replayed:
+            return replayed.pop()
+        return await receive()
+
+    return b"".join(chunks), replay
@@ -70,6 +70,11 @@ class CallSessionCreate(BaseModel):
     customer_name: Optional[str] = None
 
 
+class TranscriptUpdate(BaseModel):
+    customer_phone: str = Field(..., max_length=20)
+    transcript: str = Field(..., max_length=100000)
+
+
 class CallSessionResponse(BaseModel):
     id: UUID
     customer_id: Optional[UUID]
@@ -105,6 +110,7 @@ class KnowledgeBaseResponse(BaseModel):
     source: str
     confidence_score: float
     usage_count: int
+    tenant_id: Optional[UUID]
     created_at: datetime
     updated_at: datetime
 
@@ -112,6 +118,43 @@ class KnowledgeBaseResponse(BaseModel):
         from_attributes = True
 
 
+class KnowledgeFeedEntry(BaseModel):
+    """An entry as agents keep it locally; only the fields their prompts use"""
+    id: UUID
+    question: str
+    answer: str
+    category: Optional[str] = None
+    confidence_score: float
+    usage_count: int
+    # The order of the prompt's most used entries; see migrations/010_knowledge_base_usage_rank.sql
+    usage_rank: int = 0
+
+
+class KnowledgeSnapshotResponse(BaseModel):
+    version: int
+    entries: List[KnowledgeFeedEntry]
+
+
+class KnowledgeSearchResult(KnowledgeFeedEntry):
+    score: float
+    match: str  # fulltext, trigram or semantic
+
+
+class KnowledgeSearchResponse(BaseModel):
+    query: str
+    results: List[KnowledgeSearchResult]
+
+
+class KnowledgeChangesResponse(BaseModel):
+    since: int
+    version: int
+    reset: bool = False
+    has_more: bool = False
+    added: List[KnowledgeFeedEntry] = []
+    updated: List[KnowledgeFeedEntry] = []
+    deleted: List[UUID] = []
+
+
 # Help Request models
 class HelpRequestCreate(BaseModel):
     customer_phone: str = Field(..., pattern=r'^\+?[1-9]\d{1,14}$')
@@ -139,6 +182,7 @@ class HelpRequestResponse(BaseModel):
     supervisor_id: Optional[str]
     resolved_at: Optional[datetime]
     timeout_at: Optional[datetime]
+    tenant_id: Optional[UUID] = None
     created_at: datetime
     updated_at: datetime
 
@@ -158,6 +202,7 @@ class SupervisorDashboardResponse(BaseModel):
     created_at: datetime
     timeout_at: Optional[datetime]
     hours_waiting: float
+    tenant_id: Optional[UUID] = None
 
     class Config:
         from_attributes = True
@@ -169,6 +214,7 @@ class AIQueryRequest(BaseModel):
     customer_phone: str = Field(..., pattern=r'^\+?[1-9]\d{1,14}$')
     call_session_id: Optional[UUID] = None
     context: Optional[str] = Field(None, max_length=5000)
+    tenant: Optional[str] = Field(None, max_length=64)
 
 
 class AIQueryResponse(BaseModel):
@@ -192,6 +238,9 @@ class FollowUpResponse(BaseModel):
     message: str
     follow_up_type: FollowUpType
     status: str
+    recipient: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
     sent_at: Optional[datetime]
     created_at: datetime
 
@@ -0,0 +1,74 @@
+"""
+Fast JSON serialization for large list responses
+
+Returning Pydantic models from an endpoint with ``response_model`` validates
+each row when the service builds the model, validates it again against the
+response model and then re-encodes it. ``ListSerializer`` validates raw DB
+rows once and dumps them straight to JSON bytes. Returning a ``Response``
+makes FastAPI skip its own response model pass, while ``response_model`` on
+the route still documents the schema.
+
+Rows are validated against a ``TypedDict`` mirror of the model, so
+pydantic-core checks and coerces every field without building model
+instances, and the result is encoded with orjson when it is installed.
+Fields with a default may be missing from a row, as for the model, and are
+filled in with the default so the bytes match ``model_dump_json``.
+"""
+
+from typing import Any, Callable, Dict, Generic, List, Type, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import NotRequired, TypedDict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _row_type(model: Type[BaseModel]) -> type:
+    """Build a TypedDict with the same fields and annotations as the model"""
+    fields = {
+        name: field.annotation if field.is_required() else NotRequired[field.annotation]
+        for name, field in model.model_fields.items()
+    }
+    return TypedDict(f"{model.__name__}Row", fields)
+
+
+def _defaults(model: Type[BaseModel]) -> Dict[str, Callable[[], Any]]:
+    """Factories for the defaults of the model's optional fields, called once per row that needs them"""
+    return {
+        name: (lambda field=field: field.get_default(call_default_factory=True))
+        for name, field in model.model_fields.items() if not field.is_required()
+    }
+
+
+class ListSerializer(Generic[ModelT]):
+    def __init__(self, model: Type[ModelT]):
+        self.model = model
+        self._adapter = TypeAdapter(List[_row_type(model)])
+        self._fields = list(model.model_fields)
+        self._defaults = _defaults(model)
+
+    def _complete(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """The row with missing optional fields set to their defaults, in model field order"""
+        if len(row) == len(self._fields):
+            return row
+        return {name: row[name] if name in row else self._defaults[name]() for name in self._fields}
+
+    def dump_json(self, rows: List[Dict[str, Any]]) -> bytes:
+        """Validate rows against the model fields and encode them as a JSON array"""
+        validated = self._adapter.validate_python(rows)
+        if self._defaults:
+            validated = [self._complete(row) for row in validated]
+        if orjson is not None:
+            # OPT_UTC_Z keeps UTC datetimes as "...Z", matching pydantic's output
+            return orjson.dumps(validated, option=orjson.OPT_UTC_Z)
+        return self._adapter.dump_json(validated)
+
+    def response(self, rows: List[Dict[str, Any]]) -> Response:
+        """Build a JSON response for rows without a second validation pass"""
+        return Response(content=self.dump_json(rows), media_type="application/json")
@@ -0,0 +1,271 @@
+"""
+Background supervisor notifications with per-supervisor coalescing
+
+Ticket creation only enqueues a notification; a dispatcher task delivers it
+to the configured sinks (log, file, webhook) off the request path. A burst
+of tickets for the same supervisor within the coalescing window goes out as
+one digest. Urgent tickets flush their supervisor's batch straight away.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Context is trimmed so a digest of many tickets stays a readable size
+NOTIFICATION_CONTEXT_CHARS = 200
+
+
+class NotificationSink(ABC):
+    """A delivery channel; ``send`` raises to have the batch retried"""
+
+    name = "sink"
+
+    @abstractmethod
+    async def send(self, supervisor: str, notifications: List[Dict[str, Any]]) -> None:
+        """Deliver one supervisor's notifications, a single one or a digest"""
+
+    async def close(self) -> None:
+        pass
+
+
+def render_digest(notifications: List[Dict[str, Any]]) -> str:
+    """Human readable text for one notification or a digest of several"""
+    if len(notifications) == 1:
+        n = notifications[0]
+        lines = [
+            f"Customer {n['customer_phone']} needs help!",
+            f"Priority: {n['priority'].upper()}",
+            f"Question: {n['question']}",
+        ]
+        if n.get("context"):
+            lines.append(f"Context: {n['context']}")
+        lines.append(f"Request ID: {n['id']}")
+        return "\n".join(lines)
+
+    lines = [f"{len(notifications)} customers need help:"]
+    for n in notifications:
+        lines.append(f"- [{n['priority'].upper()}] {n['customer_phone']}: {n['question']} ({n['id']})")
+    return "\n".join(lines)
+
+
+class LogSink(NotificationSink):
+    """Writes notifications to the backend log, standing in for SMS or push"""
+
+    name = "log"
+
+    async def send(self, supervisor: str, notifications: List[Dict[str, Any]]) -> None:
+        logger.info(f"📱 SUPERVISOR NOTIFICATION ({supervisor})\n{render_digest(notifications)}")
+
+
+class FileSink(NotificationSink):
+    """Appends one JSON line per delivered batch to a local file"""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def send(self, supervisor: str, notifications: List[Dict[str, Any]]) -> None:
+        line = json.dumps(_payload(supervisor, notifications)) + "\n"
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(line)
+
+
+class WebhookSink(NotificationSink):
+    """POSTs each batch as JSON; a non-2xx response is retried"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, supervisor: str, notifications: List[Dict[str, Any]]) -> None:
+        response = await self._client.post(self.url, json=_payload(supervisor, notifications))
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def _payload(supervisor: str, notifications: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "supervisor": supervisor,
+        "sent_at": datetime.now(timezone.utc).isoformat(),
+        "count": len(notifications),
+        "text": render_digest(notifications),
+        "notifications": [{k: v for k, v in n.items() if k != "enqueued_at"} for n in notifications],
+    }
+
+
+class NotificationDispatcher:
+    """
+    Bounded queue of supervisor notifications drained by a background task
+
+    ``enqueue`` never waits: when the queue is full the notification is
+    dropped and counted, so a stalled sink cannot slow ticket creation.
+    Supervisors are per tenant, so batches are keyed by the ticket's tenant.
+    Each sink retries a failed batch with exponential backoff on its own.
+    """
+
+    def __init__(self,
+                 sinks: List[NotificationSink],
+                 max_queue: int = 1000,
+                 coalesce_seconds: float = 10.0,
+                 max_batch: int = 20,
+                 max_attempts: int = 5,
+                 retry_delay: float = 1.0):
+        self.sinks = sinks
+        self.coalesce_seconds = coalesce_seconds
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.stats = metrics.notifications
+        self.stats.queue_capacity = max_queue
+
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._deliveries: Set[asyncio.Task] = set()
+
+    def enqueue(self, help_request: Dict[str, Any]) -> bool:
+        """Queue a notification for a new help request; False if it was dropped"""
+        priority = help_request.get("priority") or "normal"
+        context = help_request.get("context") or ""
+        notification = {
+            "id": str(help_request["id"]),
+            "supervisor": str(help_request.get("tenant_id") or "default"),
+            "customer_phone": help_request.get("customer_phone"),
+            "priority": str(getattr(priority, "value", priority)),
+            "question": help_request.get("question"),
+            "context": context[-NOTIFICATION_CONTEXT_CHARS:],
+            "enqueued_at": time.monotonic(),
+        }
+        try:
+            self.queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            logger.warning(f"Notification queue full, dropped notification for request {notification['id']}")
+            return False
+
+        self.stats.enqueued += 1
+        self.stats.queue_depth = self.queue.qsize()
+        return True
+
+    async def run(self) -> None:
+        """Move queued notifications into per-supervisor batches until cancelled"""
+        while True:
+            notification = await self.queue.get()
+            self.stats.queue_depth = self.queue.qsize()
+            self._add(notification)
+
+    def _add(self, notification: Dict[str, Any]) -> None:
+        supervisor = notification["supervisor"]
+        batch = self._pending.setdefault(supervisor, [])
+        batch.append(notification)
+
+        if notification["priority"] == "urgent" or len(batch) >= self.max_batch:
+            self._flush(supervisor)
+        elif supervisor not in self._timers:
+            self._timers[supervisor] = asyncio.create_task(self._flush_later(supervisor))
+
+    async def _flush_later(self, supervisor: str) -> None:
+        await asyncio.sleep(self.coalesce_seconds)
+        self._timers.pop(supervisor, None)
+        self._flush(supervisor)
+
+    def _flush(self, supervisor: str) -> None:
+        timer = self._timers.pop(supervisor, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(supervisor, None)
+        if not batch:
+            return
+        if len(batch) > 1:
+            self.stats.digests += 1
+
+        task = asyncio.create_task(self._deliver(supervisor, batch))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, supervisor: str, batch: List[Dict[str, Any]]) -> None:
+        self.stats.in_flight += 1
+        try:
+            await asyncio.gather(*(self._send_with_retry(sink, supervisor, batch) for sink in self.sinks))
+        finally:
+            self.stats.in_flight -= 1
+
+        now = time.monotonic()
+        for notification in batch:
+            self.stats.latency.observe(now - notification["enqueued_at"])
+
+    async def _send_with_retry(self, sink: NotificationSink, supervisor: str,
+                               batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await sink.send(supervisor, batch)
+                self.stats.delivered(sink.name, len(batch))
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.stats.failed(sink.name, len(batch))
+                    logger.error(f"Notification sink {sink.name} gave up after {attempt} attempts: {e!r}")
+                    return
+                self.stats.retries += 1
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Flush everything still queued or batched, wait for delivery, close sinks"""
+        while not self.queue.empty():
+            self._add(self.queue.get_nowait())
+        self.stats.queue_depth = 0
+        for supervisor in list(self._pending):
+            self._flush(supervisor)
+
+        if self._deliveries:
+            done, pending = await asyncio.wait(set(self._deliveries), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Abandoned {len(pending)} notification deliveries on shutdown")
+
+        for sink in self.sinks:
+            await sink.close()
+
+
+def build_sinks(names: str, file_path: str, webhook_url: Optional[str]) -> List[NotificationSink]:
+    """Sinks for a comma-separated list of names: log, file, webhook"""
+    sinks: List[NotificationSink] = []
+    for name in (part.strip() for part in names.split(",")):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "file":
+            sinks.append(FileSink(file_path))
+        elif name == "webhook":
+            if webhook_url:
+                sinks.append(WebhookSink(webhook_url))
+            else:
+                logger.warning("Webhook notification sink configured without WEBHOOK_URL; skipping it")
+        elif name:
+            logger.warning(f"Unknown notification sink: {name}")
+    return sinks or [LogSink()]
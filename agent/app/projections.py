@@ -0,0 +1,235 @@
+"""
+In-process read model for the supervisor dashboard and analytics
+
+Every help request write goes through the services, which apply the
+written row here. Dashboard and analytics reads are then answered from
+memory instead of querying the database on every hit. A periodic
+reconciliation reloads the state from the database to correct drift,
+e.g. from writes made by another backend process.
+"""
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models.schemas import RequestStatus
+from .repositories.help_request_repository import HelpRequestRepository
+from .repositories.knowledge_base_repository import KnowledgeBaseRepository
+
+logger = logging.getLogger(__name__)
+
+# Columns of the supervisor_dashboard view kept per open request; hours_waiting is computed on read
+DASHBOARD_FIELDS = (
+    "id", "question", "context", "status", "priority", "customer_phone",
+    "customer_name", "created_at", "timeout_at", "tenant_id"
+)
+
+CLOSED_STATUSES = tuple(status.value for status in RequestStatus if status != RequestStatus.PENDING)
+
+
+def _epoch(value: Any) -> Optional[float]:
+    """Seconds since the epoch for an ISO timestamp or datetime; naive values are UTC"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _project(row: Dict[str, Any]) -> Dict[str, Any]:
+    projected = {field: row.get(field) for field in DASHBOARD_FIELDS}
+    projected["id"] = str(row["id"])
+    if projected["tenant_id"] is not None:
+        projected["tenant_id"] = str(projected["tenant_id"])
+    return projected
+
+
+class HelpRequestProjection:
+    """
+    Open help requests ordered by creation, plus running status counts
+
+    Applying a write is O(log n) for the ordering plus a list insert. Reads
+    walk a cached ordered list and only fill in ``hours_waiting``, so the
+    rows returned are the projection's own and must not be modified. A
+    request that moves from pending to another status updates the counts;
+    changes to requests that were not open (e.g. re-resolving) are left
+    for the next reconciliation. Writes applied while a reconciliation is
+    loading are replayed on top of the reloaded state.
+    """
+
+    def __init__(self,
+                 help_request_repo: HelpRequestRepository,
+                 knowledge_repo: KnowledgeBaseRepository,
+                 reconcile_interval: float = 60.0):
+        self.help_request_repo = help_request_repo
+        self.knowledge_repo = knowledge_repo
+        self.reconcile_interval = reconcile_interval
+        self.loaded = False
+
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._order: List[Tuple[float, str]] = []
+        self._ordered: Optional[List[Tuple[float, Dict[str, Any]]]] = None
+        self._counts: Dict[str, int] = dict.fromkeys(CLOSED_STATUSES, 0)
+        self._resolution_hours = 0.0
+        self._resolutions = 0
+
+        self._knowledge_entries = 0
+        self._top_categories: List[Dict[str, Any]] = []
+        self._knowledge_stale = True
+
+        self._reconciling = False
+        self._replay: List[Tuple[Dict[str, Any], bool]] = []
+
+    # Write path
+
+    def request_created(self, row: Dict[str, Any]) -> None:
+        """Apply a newly inserted help request row"""
+        self._record(row, created=True)
+
+    def request_updated(self, row: Dict[str, Any]) -> None:
+        """Apply a help request row returned by an update"""
+        self._record(row, created=False)
+
+    def knowledge_changed(self) -> None:
+        """Reload knowledge base totals on the next analytics read"""
+        self._knowledge_stale = True
+
+    def _record(self, row: Dict[str, Any], created: bool) -> None:
+        if self._reconciling:
+            self._replay.append((row, created))
+        self._apply(row, created)
+
+    def _apply(self, row: Dict[str, Any], created: bool) -> None:
+        request_id = str(row["id"])
+        status = row.get("status") or RequestStatus.PENDING.value
+        previous = self._open.get(request_id)
+        self._ordered = None
+
+        if status == RequestStatus.PENDING.value:
+            projected = _project(row)
+            if previous is not None:
+                # Writes to help_requests do not carry the view's joined customer name
+                projected["customer_name"] = row.get("customer_name") or previous["customer_name"]
+                self._open[request_id] = projected
+                return
+            self._open[request_id] = projected
+            insort(self._order, (_epoch(row["created_at"]) or time.time(), request_id))
+            return
+
+        if previous is not None:
+            self._remove_open(request_id, previous)
+        elif not created:
+            return
+
+        self._counts[status] = self._counts.get(status, 0) + 1
+        if status == RequestStatus.RESOLVED.value:
+            self._add_resolution(row)
+
+    def _remove_open(self, request_id: str, row: Dict[str, Any]) -> None:
+        del self._open[request_id]
+        key = (_epoch(row["created_at"]) or 0.0, request_id)
+        index = bisect_left(self._order, key)
+        if index < len(self._order) and self._order[index] == key:
+            del self._order[index]
+        else:
+            self._order = [entry for entry in self._order if entry[1] != request_id]
+
+    def _add_resolution(self, row: Dict[str, Any]) -> None:
+        created, resolved = _epoch(row.get("created_at")), _epoch(row.get("resolved_at"))
+        if created is not None and resolved is not None:
+            self._resolution_hours += (resolved - created) / 3600
+            self._resolutions += 1
+
+    # Read path
+
+    def dashboard(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Pending requests oldest first, in the supervisor_dashboard view's shape"""
+        ordered = self._ordered
+        if ordered is None:
+            ordered = self._ordered = [(created, self._open[request_id]) for created, request_id in self._order]
+
+        now = time.time()
+        rows = []
+        for created, row in ordered:
+            if tenant_id and row["tenant_id"] != tenant_id:
+                continue
+            row["hours_waiting"] = (now - created) / 3600
+            rows.append(row)
+        return rows
+
+    async def analytics(self) -> Dict[str, Any]:
+        """Fields of AnalyticsResponse; reloads knowledge base totals only after they changed"""
+        if self._knowledge_stale:
+            await self._refresh_knowledge_stats()
+
+        return {
+            "total_requests": len(self._open) + sum(self._counts.values()),
+            "pending_requests": len(self._open),
+            "resolved_requests": self._counts[RequestStatus.RESOLVED.value],
+            "timeout_requests": self._counts[RequestStatus.TIMEOUT.value],
+            "avg_resolution_time_hours": round(self._resolution_hours / self._resolutions, 2) if self._resolutions else 0.0,
+            "knowledge_base_entries": self._knowledge_entries,
+            "top_categories": self._top_categories,
+        }
+
+    async def _refresh_knowledge_stats(self) -> None:
+        self._knowledge_stale = False
+        try:
+            self._knowledge_entries = await self.knowledge_repo.count()
+            self._top_categories = await self.knowledge_repo.get_categories_stats()
+        except Exception:
+            self._knowledge_stale = True
+            raise
+
+    # Reconciliation
+
+    async def run(self) -> None:
+        """Reconcile against the database every interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Help request projection reconciliation failed: {e}")
+
+    async def reconcile(self) -> None:
+        """Reload open requests and counts from the database, replacing the in-memory state"""
+        self._reconciling = True
+        self._replay = []
+        try:
+            pending = await self.help_request_repo.get_pending_requests()
+            counts = {status: await self.help_request_repo.count({"status": status}) for status in CLOSED_STATUSES}
+
+            resolution_hours, resolutions = 0.0, 0
+            async for row in self.help_request_repo.iter_all(columns="id, created_at, resolved_at",
+                                                             filters={"status": RequestStatus.RESOLVED.value}):
+                created, resolved = _epoch(row.get("created_at")), _epoch(row.get("resolved_at"))
+                if created is not None and resolved is not None:
+                    resolution_hours += (resolved - created) / 3600
+                    resolutions += 1
+
+            await self._refresh_knowledge_stats()
+        finally:
+            self._reconciling = False
+            replay, self._replay = self._replay, []
+
+        open_rows = {str(row["id"]): _project(row) for row in pending}
+
+        if self.loaded and (set(open_rows) != set(self._open) or counts != self._counts):
+            logger.warning(f"Help request projection drifted: {len(self._open)} open in memory, "
+                           f"{len(open_rows)} in the database; counts {self._counts} vs {counts}")
+
+        self._open = open_rows
+        self._order = sorted((_epoch(row["created_at"]) or 0.0, request_id) for request_id, row in open_rows.items())
+        self._ordered = None
+        self._counts = counts
+        self._resolution_hours, self._resolutions = resolution_hours, resolutions
+        self.loaded = True
+
+        for row, created in replay:
+            self._apply(row, created)
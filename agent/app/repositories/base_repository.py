@@ -2,15 +2,87 @@
 Base repository class with common database operations
 """
 
+import asyncio
+import inspect
 import os
-from typing import Optional, List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, AsyncIterator
 from uuid import UUID
 
 from supabase import create_client, Client
 
+from ..metrics import timed_db_call
+from ..tracing import traced_db_call
+
+
+# Queries one process runs at once; the client's HTTP pool (100 connections by default) is larger
+DEFAULT_POOL_SIZE = 20
+
+
+def _instrument_repository(cls: type) -> None:
+    """Record latency of, and trace, every public coroutine method defined on a repository class"""
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+            setattr(cls, name, timed_db_call(name, traced_db_call(name, attr)))
+
+
+class QueryExecutor:
+    """
+    Runs the blocking ``execute()`` of postgrest queries on a bounded thread pool
+
+    The pool size caps the queries in flight like a connection pool, and
+    queries beyond it wait for a free thread. ``active`` and ``waiting``
+    count both, so readiness can see an exhausted pool.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.active = 0
+        self.waiting = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix="db")
+
+    @property
+    def saturation(self) -> float:
+        """Queries running or waiting per thread; above 1.0 queries are queueing"""
+        return (self.active + self.waiting) / self.size
+
+    async def run(self, query: Any) -> Any:
+        with self._lock:
+            self.waiting += 1
+        future = self._pool.submit(self._execute, query)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            if future.cancelled():
+                # Cancelled before a thread picked it up
+                with self._lock:
+                    self.waiting -= 1
+
+    def _execute(self, query: Any) -> Any:
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+        try:
+            return query.execute()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
 
 class BaseRepository:
     _client: Optional[Client] = None
+    _executor: Optional[QueryExecutor] = None
+    # Columns the generic getters read; tables with columns only the database uses narrow it
+    columns = "*"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _instrument_repository(cls)
 
     @classmethod
     def get_client(cls) -> Client:
@@ -23,40 +95,102 @@ class BaseRepository:
             cls._client = create_client(url, key)
         return cls._client
 
+    @classmethod
+    def close_client(cls) -> None:
+        """Close the shared Supabase client's HTTP session"""
+        if cls._client is None:
+            return
+        postgrest = getattr(cls._client, "postgrest", None)
+        session = getattr(postgrest, "session", None)
+        if session is not None:
+            session.close()
+        cls._client = None
+        if BaseRepository._executor is not None:
+            BaseRepository._executor.shutdown()
+            BaseRepository._executor = None
+
     def __init__(self, table_name: str):
         self.table_name = table_name
         self.client = self.get_client()
 
+    @classmethod
+    def executor(cls) -> QueryExecutor:
+        """The process-wide executor every repository's queries run on"""
+        if BaseRepository._executor is None:
+            BaseRepository._executor = QueryExecutor(int(os.getenv("DB_POOL_SIZE", str(DEFAULT_POOL_SIZE))))
+        return BaseRepository._executor
+
+    async def _execute(self, query: Any) -> Any:
+        """Run a built query off the event loop, waiting for a free slot when the pool is busy"""
+        return await self.executor().run(query)
+
+    async def ping(self, timeout: Optional[float] = None) -> None:
+        """Run a minimal query to check the table is reachable; it queues like any other query"""
+        query = self.client.table(self.table_name).select("id").limit(1)
+        await asyncio.wait_for(self._execute(query), timeout)
+
     async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new record"""
-        result = self.client.table(self.table_name).insert(data).execute()
+        result = await self._execute(self.client.table(self.table_name).insert(data))
         if not result.data:
             raise Exception(f"Failed to create record in {self.table_name}")
         return result.data[0]
 
+    async def create_many(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create several records in a single insert"""
+        if not rows:
+            return []
+        result = await self._execute(self.client.table(self.table_name).insert(rows))
+        if not result.data:
+            raise Exception(f"Failed to create records in {self.table_name}")
+        return result.data
+
     async def get_by_id(self, record_id: UUID) -> Optional[Dict[str, Any]]:
         """Get record by ID"""
-        result = self.client.table(self.table_name).select("*").eq("id", str(record_id)).execute()
+        result = await self._execute(self.client.table(self.table_name).select(self.columns).eq("id", str(record_id)))
         return result.data[0] if result.data else None
 
     async def get_all(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """Get all records with pagination"""
-        result = self.client.table(self.table_name).select("*").range(offset, offset + limit - 1).execute()
+        result = await self._execute(self.client.table(self.table_name).select(self.columns).range(offset, offset + limit - 1))
         return result.data
 
+    async def iter_all(self, columns: str = "*", page_size: int = 500,
+                       filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over all records page by page, keyed on id so memory stays flat
+
+        ``columns`` must include ``id`` since pages are fetched by keyset on it.
+        """
+        last_id: Optional[str] = None
+        while True:
+            query = self.client.table(self.table_name).select(columns).order("id")
+            if filters:
+                for field, value in filters.items():
+                    query = query.eq(field, value)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            result = await self._execute(query.limit(page_size))
+
+            for row in result.data:
+                yield row
+
+            if len(result.data) < page_size:
+                return
+            last_id = result.data[-1]["id"]
+
     async def update(self, record_id: UUID, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Update record by ID"""
-        result = self.client.table(self.table_name).update(data).eq("id", str(record_id)).execute()
+        result = await self._execute(self.client.table(self.table_name).update(data).eq("id", str(record_id)))
         return result.data[0] if result.data else None
 
     async def delete(self, record_id: UUID) -> bool:
         """Delete record by ID"""
-        result = self.client.table(self.table_name).delete().eq("id", str(record_id)).execute()
+        result = await self._execute(self.client.table(self.table_name).delete().eq("id", str(record_id)))
         return len(result.data) > 0
 
     async def find_by_field(self, field: str, value: Any, limit: int = 10) -> List[Dict[str, Any]]:
         """Find records by field value"""
-        result = self.client.table(self.table_name).select("*").eq(field, value).range(0, limit - 1).execute()
+        result = await self._execute(self.client.table(self.table_name).select(self.columns).eq(field, value).range(0, limit - 1))
         return result.data
 
     async def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
@@ -65,5 +199,11 @@ class BaseRepository:
         if filters:
             for field, value in filters.items():
                 query = query.eq(field, value)
-        result = query.execute()
-        return result.count if result.count is not None else 0
\ No newline at end of file
+        result = await self._execute(query)
+        return result.count if result.count is not None else 0
+
+
+_instrument_repository(BaseRepository)
+
+# Executor threads do not survive a fork; workers forked from a preloaded app start their own
+os.register_at_fork(after_in_child=lambda: setattr(BaseRepository, "_executor", None))
@@ -43,4 +43,17 @@ class CallSessionRepository(BaseRepository):
 
     async def update_transcript(self, session_id: UUID, transcript: str) -> Optional[Dict[str, Any]]:
         """Update session transcript"""
-        return await self.update(session_id, {"transcript": transcript})
\ No newline at end of file
+        return await self.update(session_id, {"transcript": transcript})
+
+    async def upsert_transcript(self, session_id: UUID, phone_number: str, transcript: str) -> Dict[str, Any]:
+        """Store a session transcript, creating the session row if the agent has not yet"""
+        data = {
+            "id": str(session_id),
+            "phone_number": phone_number,
+            "transcript": transcript
+        }
+
+        result = await self._execute(self.client.table(self.table_name).upsert(data))
+        if not result.data:
+            raise Exception(f"Failed to store transcript for session {session_id}")
+        return result.data[0]
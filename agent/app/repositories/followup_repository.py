@@ -0,0 +1,86 @@
+"""
+Request follow-up repository for database operations
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any
+from uuid import UUID
+
+from .base_repository import BaseRepository
+from ..models.schemas import FollowUpType
+
+
+class FollowUpRepository(BaseRepository):
+    def __init__(self):
+        super().__init__("request_followups")
+
+    async def create_followup(self,
+                              help_request_id: UUID,
+                              message: str,
+                              follow_up_type: FollowUpType,
+                              recipient: str) -> Dict[str, Any]:
+        """Queue a follow-up for delivery by the worker pool"""
+        data = {
+            "help_request_id": str(help_request_id),
+            "message": message,
+            "follow_up_type": follow_up_type.value,
+            "recipient": recipient,
+            "status": "pending",
+            "next_attempt_at": datetime.utcnow().isoformat()
+        }
+
+        return await self.create(data)
+
+    async def claim_due(self, batch_size: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Lease up to ``batch_size`` due pending follow-ups, bumping their attempt count"""
+        result = await self._execute(self.client.rpc("claim_request_followups", {
+            "batch_size": batch_size,
+            "lease_seconds": lease_seconds
+        }))
+        return result.data or []
+
+    async def renew_lease(self, followup_id: UUID, attempts: int, lease_seconds: int) -> bool:
+        """
+        Extend the lease of a claimed follow-up, just before sending it
+
+        ``attempts`` is the count our claim returned. Every claim bumps it,
+        so the update matches nothing once another worker has claimed the
+        row after our lease ran out, and False says not to send it.
+        """
+        query = self.client.table(self.table_name).update({
+            "locked_until": (datetime.utcnow() + timedelta(seconds=lease_seconds)).isoformat()
+        }).eq("id", str(followup_id)).eq("status", "pending").eq("attempts", attempts)
+        result = await self._execute(query)
+        return bool(result.data)
+
+    async def mark_sent(self, followup_id: UUID) -> Optional[Dict[str, Any]]:
+        """Mark a follow-up as delivered"""
+        return await self.update(followup_id, {
+            "status": "sent",
+            "sent_at": datetime.utcnow().isoformat(),
+            "locked_until": None,
+            "last_error": None
+        })
+
+    async def mark_retry(self, followup_id: UUID, error: str, next_attempt_at: datetime) -> Optional[Dict[str, Any]]:
+        """Release a failed follow-up to be claimed again after ``next_attempt_at``"""
+        return await self.update(followup_id, {
+            "next_attempt_at": next_attempt_at.isoformat(),
+            "locked_until": None,
+            "last_error": error
+        })
+
+    async def mark_failed(self, followup_id: UUID, error: str) -> Optional[Dict[str, Any]]:
+        """Give up on a follow-up"""
+        return await self.update(followup_id, {
+            "status": "failed",
+            "locked_until": None,
+            "last_error": error
+        })
+
+    async def get_for_request(self, help_request_id: UUID) -> List[Dict[str, Any]]:
+        """Get all follow-ups of a help request, oldest first"""
+        result = await self._execute(self.client.table(self.table_name).select("*").eq(
+            "help_request_id", str(help_request_id)
+        ).order("created_at"))
+        return result.data
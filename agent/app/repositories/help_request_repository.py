@@ -19,7 +19,8 @@ class HelpRequestRepository(BaseRepository):
                                 question: str,
                                 context: Optional[str] = None,
                                 priority: Priority = Priority.NORMAL,
-                                call_session_id: Optional[UUID] = None) -> Dict[str, Any]:
+                                call_session_id: Optional[UUID] = None,
+                                tenant_id: Optional[str] = None) -> Dict[str, Any]:
         """Create a new help request"""
         timeout_hours = 1 if priority == Priority.URGENT else 4
 
@@ -29,21 +30,40 @@ class HelpRequestRepository(BaseRepository):
             "context": context,
             "priority": priority.value,
             "timeout_at": (datetime.utcnow() + timedelta(hours=timeout_hours)).isoformat(),
-            "call_session_id": str(call_session_id) if call_session_id else None
+            "call_session_id": str(call_session_id) if call_session_id else None,
+            "tenant_id": tenant_id
         }
 
         return await self.create(data)
 
-    async def get_pending_requests(self) -> List[Dict[str, Any]]:
-        """Get all pending help requests"""
-        result = self.client.from_("supervisor_dashboard").select("*").eq("status", "pending").order("created_at", desc=False).execute()
+    async def get_pending_requests(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get all pending help requests, optionally of one tenant"""
+        query = self.client.from_("supervisor_dashboard").select("*").eq("status", "pending")
+        if tenant_id:
+            query = query.eq("tenant_id", tenant_id)
+        result = await self._execute(query.order("created_at", desc=False))
         return result.data
 
+    async def get_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Help requests with the given IDs; missing ones are left out"""
+        if not ids:
+            return []
+        result = await self._execute(self.client.table(self.table_name).select("*").in_("id", ids))
+        return result.data
+
+    async def get_customer_names(self, request_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Customer names the supervisor_dashboard view joins onto the given requests, by request ID"""
+        if not request_ids:
+            return {}
+        query = self.client.from_("supervisor_dashboard").select("id, customer_name").in_("id", request_ids)
+        result = await self._execute(query)
+        return {str(row["id"]): row.get("customer_name") for row in result.data}
+
     async def resolve_request(self,
                             request_id: UUID,
                             supervisor_response: str,
                             supervisor_id: str) -> Optional[Dict[str, Any]]:
-        """Resolve a help request"""
+        """Resolve a help request, returning the full updated row from the same round trip"""
         data = {
             "status": RequestStatus.RESOLVED.value,
             "supervisor_response": supervisor_response,
@@ -53,13 +73,13 @@ class HelpRequestRepository(BaseRepository):
 
         return await self.update(request_id, data)
 
-    async def timeout_old_requests(self) -> int:
-        """Mark old pending requests as timeout"""
-        result = self.client.table(self.table_name).update({
+    async def timeout_old_requests(self) -> List[Dict[str, Any]]:
+        """Mark old pending requests as timeout, returning the updated rows"""
+        result = await self._execute(self.client.table(self.table_name).update({
             "status": RequestStatus.TIMEOUT.value
-        }).lt("timeout_at", datetime.utcnow().isoformat()).eq("status", "pending").execute()
+        }).lt("timeout_at", datetime.utcnow().isoformat()).eq("status", "pending"))
 
-        return len(result.data) if result.data else 0
+        return result.data or []
 
     async def get_requests_by_phone(self, phone_number: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get help requests for a specific phone number"""
@@ -80,7 +100,8 @@ class HelpRequestRepository(BaseRepository):
         timeout = await self.count({"status": RequestStatus.TIMEOUT.value})
 
         # Average resolution time for resolved requests
-        resolved_requests = self.client.table(self.table_name).select("created_at, resolved_at").eq("status", "resolved").execute()
+        query = self.client.table(self.table_name).select("created_at, resolved_at").eq("status", "resolved")
+        resolved_requests = await self._execute(query)
 
         avg_resolution_hours = 0.0
         if resolved_requests.data:
@@ -2,13 +2,18 @@
 Knowledge Base repository for database operations
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set
 from uuid import UUID
 
 from .base_repository import BaseRepository
+from ..knowledge_feed import FEED_COLUMNS
 
 
 class KnowledgeBaseRepository(BaseRepository):
+    # Every column but search_vector, which only search_knowledge_base reads
+    columns = ("id, question, answer, category, source, confidence_score, usage_count, usage_rank, "
+               "created_at, updated_at, tenant_id")
+
     def __init__(self):
         super().__init__("knowledge_base")
 
@@ -16,28 +21,169 @@ class KnowledgeBaseRepository(BaseRepository):
                                    question: str,
                                    answer: str,
                                    category: Optional[str] = None,
-                                   source: str = "supervisor") -> Dict[str, Any]:
-        """Create a new knowledge base entry"""
+                                   source: str = "supervisor",
+                                   tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Create a new knowledge base entry in a tenant's partition"""
         data = {
             "question": question,
             "answer": answer,
             "category": category,
             "source": source,
             "confidence_score": 1.0,
-            "usage_count": 0
+            "usage_count": 0,
+            "tenant_id": tenant_id
         }
 
-        return await self.create(data)
+        entry = await self.create(data)
+        await self.bump_version()
+        return entry
+
+    async def create_knowledge_entries(self,
+                                     entries: List[Dict[str, Any]],
+                                     source: str = "manual",
+                                     tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Create several knowledge base entries in one insert without bumping the version"""
+        rows = [
+            {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "category": entry.get("category"),
+                "source": source,
+                "confidence_score": 1.0,
+                "usage_count": 0,
+                "tenant_id": tenant_id
+            }
+            for entry in entries
+        ]
+
+        return await self.create_many(rows)
+
+    async def get_version(self) -> int:
+        """Get the current knowledge base version"""
+        result = await self._execute(self.client.table("knowledge_base_version").select("version").eq("id", 1))
+        return result.data[0]["version"] if result.data else 0
 
-    async def search_by_question(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search knowledge base by question text"""
-        # Simplified search using ILIKE for now
-        result = self.client.table(self.table_name).select("*").ilike("question", f"%{query}%").range(0, limit - 1).execute()
+    async def bump_version(self) -> int:
+        """Bump the knowledge base version after its content changed"""
+        result = await self._execute(self.client.rpc("bump_knowledge_base_version", {}))
+        return result.data if isinstance(result.data, int) else 0
+
+    async def get_changes(self, since: int, tenant_id: str, limit: int = 500) -> List[Dict[str, Any]]:
+        """Change log rows of a tenant after version ``since``, oldest first"""
+        result = await self._execute(self.client.table("knowledge_base_changes")
+                                     .select("version, knowledge_id, op")
+                                     .eq("tenant_id", tenant_id)
+                                     .gt("version", since)
+                                     .order("version")
+                                     .range(0, limit - 1))
         return result.data
 
-    async def get_best_match(self, question: str, confidence_threshold: float = 0.7) -> Optional[Dict[str, Any]]:
-        """Get the best matching answer for a question"""
-        results = await self.search_by_question(question, limit=1)
+    async def get_delta(self,
+                        since: int,
+                        tenant_id: str,
+                        limit: int = 500,
+                        columns: str = FEED_COLUMNS) -> Dict[str, Any]:
+        """
+        A tenant's entries added, updated or deleted after version ``since``
+
+        Several changes to one entry collapse into its current state. ``reset``
+        means changes after ``since`` were pruned and a snapshot is needed;
+        ``has_more`` means another page follows from the returned version.
+        """
+        delta: Dict[str, Any] = {"since": since, "version": since, "reset": False, "has_more": False,
+                                 "added": [], "updated": [], "deleted": []}
+
+        if since < await self.get_changes_pruned_through():
+            delta["reset"] = True
+            return delta
+
+        changes = await self.get_changes(since, tenant_id, limit + 1)
+        if len(changes) > limit:
+            delta["has_more"] = True
+            changes = changes[:limit]
+        if not changes:
+            return delta
+
+        inserted = set()
+        last_op: Dict[str, str] = {}
+        for change in changes:
+            knowledge_id = str(change["knowledge_id"])
+            if change["op"] == "INSERT":
+                inserted.add(knowledge_id)
+            last_op[knowledge_id] = change["op"]
+
+        live = [knowledge_id for knowledge_id, op in last_op.items() if op != "DELETE"]
+        rows = {str(row["id"]): row for row in await self.get_by_ids(live, columns=columns + ", tenant_id")}
+
+        for knowledge_id in last_op:
+            row = rows.get(knowledge_id)
+            # Deleted, or moved to another tenant, after the change was recorded
+            if row is None or str(row.pop("tenant_id")) != tenant_id:
+                delta["deleted"].append(knowledge_id)
+            else:
+                delta["added" if knowledge_id in inserted else "updated"].append(row)
+
+        delta["version"] = changes[-1]["version"]
+        return delta
+
+    async def get_latest_change_version(self) -> int:
+        """Version of the newest change log row, or the prune watermark if the log is empty"""
+        query = self.client.table("knowledge_base_changes").select("version").order("version", desc=True).limit(1)
+        result = await self._execute(query)
+        if result.data:
+            return result.data[0]["version"]
+        return await self.get_changes_pruned_through()
+
+    async def get_changes_pruned_through(self) -> int:
+        """Highest change version removed from the log; readers behind it need a snapshot"""
+        result = await self._execute(self.client.table("knowledge_base_version").select("changes_pruned_through").eq("id", 1))
+        return (result.data[0].get("changes_pruned_through") or 0) if result.data else 0
+
+    async def prune_changes(self, retain_seconds: int) -> int:
+        """Drop change log rows older than ``retain_seconds`` and return the new watermark"""
+        result = await self._execute(self.client.rpc("prune_knowledge_base_changes", {"retain_seconds": retain_seconds}))
+        return result.data if isinstance(result.data, int) else 0
+
+    async def get_by_ids(self, ids: List[str], columns: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Entries with the given IDs; missing ones are left out"""
+        if not ids:
+            return []
+        columns = columns or self.columns
+        result = await self._execute(self.client.table(self.table_name).select(columns).in_("id", ids))
+        return result.data
+
+    async def get_question_keys(self, tenant_id: Optional[str] = None) -> Set[str]:
+        """Get normalized questions of all entries, or of one tenant's, used to dedupe imports"""
+        keys = set()
+        filters = {"tenant_id": tenant_id} if tenant_id else None
+        async for row in self.iter_all(columns="id, question", filters=filters):
+            keys.add(self.normalize_question(row["question"]))
+        return keys
+
+    async def search(self, query: str, tenant_id: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Entries matching ``query`` best first, optionally of one tenant
+
+        Ranked full-text search over questions and answers, falling back to
+        trigram similarity with questions when nothing matches. Each row has
+        a ``score`` and a ``match`` of ``fulltext`` or ``trigram``.
+        """
+        params: Dict[str, Any] = {"search_query": query, "match_limit": limit}
+        if tenant_id:
+            params["tenant"] = tenant_id
+        result = await self._execute(self.client.rpc("search_knowledge_base", params))
+        return result.data or []
+
+    async def search_by_question(self, query: str, tenant_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Search a tenant's knowledge base by question text"""
+        return await self.search(query, tenant_id=tenant_id, limit=limit)
+
+    async def get_best_match(self,
+                             question: str,
+                             tenant_id: str,
+                             confidence_threshold: float = 0.7) -> Optional[Dict[str, Any]]:
+        """Get the best matching answer for a question from a tenant's knowledge base"""
+        results = await self.search_by_question(question, tenant_id, limit=1)
 
         if results and len(results) > 0:
             best_match = results[0]
@@ -64,16 +210,48 @@ class KnowledgeBaseRepository(BaseRepository):
         """Get knowledge base entries by category"""
         return await self.find_by_field("category", category, limit)
 
-    async def get_most_used(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get most frequently used knowledge base entries"""
-        result = self.client.table(self.table_name).select("*").order("usage_count", desc=True).range(0, limit - 1).execute()
+    async def get_most_used(self, limit: int = 10, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get most frequently used knowledge base entries, optionally of one tenant"""
+        query = self.client.table(self.table_name).select(self.columns)
+        if tenant_id:
+            query = query.eq("tenant_id", tenant_id)
+        # By the usage rank the change feed carries and then ID, so agents rendering their own copy list
+        # the same entries; the live usage_count changes on every match without reaching the feed
+        result = await self._execute(query.order("usage_rank", desc=True).order("id").range(0, limit - 1))
         return result.data
 
-    async def get_categories_stats(self) -> List[Dict[str, Any]]:
-        """Get statistics by category"""
-        result = self.client.table(self.table_name).select("category, count(*), sum(usage_count)").group_by("category").execute()
+    async def get_for_tenant(self,
+                             tenant_id: str,
+                             category: Optional[str] = None,
+                             limit: int = 100) -> List[Dict[str, Any]]:
+        """Get a tenant's knowledge base entries, optionally filtered by category"""
+        query = self.client.table(self.table_name).select(self.columns).eq("tenant_id", tenant_id)
+        if category:
+            query = query.eq("category", category)
+        result = await self._execute(query.range(0, limit - 1))
         return result.data
 
+    async def get_categories_stats(self) -> List[Dict[str, Any]]:
+        """Get entry count and total usage by category, most entries first
+
+        The query builder has no GROUP BY, so entries are paged through and
+        aggregated here; callers cache the result.
+        """
+        stats: Dict[str, Dict[str, Any]] = {}
+        async for row in self.iter_all(columns="id, category, usage_count"):
+            category = row.get("category") or "general"
+            entry = stats.get(category)
+            if entry is None:
+                entry = stats[category] = {"category": category, "count": 0, "sum": 0}
+            entry["count"] += 1
+            entry["sum"] += row.get("usage_count") or 0
+        return sorted(stats.values(), key=lambda entry: entry["count"], reverse=True)
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Normalize question text for duplicate detection"""
+        return " ".join(question.lower().split())
+
     def _calculate_confidence(self, question1: str, question2: str) -> float:
         """Simple confidence calculation based on word overlap"""
         words1 = set(question1.lower().split())
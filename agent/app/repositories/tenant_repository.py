@@ -0,0 +1,23 @@
+"""
+Tenant repository for database operations
+"""
+
+from typing import Optional, List, Dict, Any
+
+from .base_repository import BaseRepository
+
+
+class TenantRepository(BaseRepository):
+    def __init__(self):
+        super().__init__("tenants")
+
+    async def get_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        """Get an active tenant by its slug"""
+        result = await self._execute(self.client.table(self.table_name).select("*").eq("slug", slug).eq("active", True).limit(1))
+        return result.data[0] if result.data else None
+
+    async def get_active(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get all active tenants"""
+        query = self.client.table(self.table_name).select("*").eq("active", True).order("slug")
+        result = await self._execute(query.range(0, limit - 1))
+        return result.data
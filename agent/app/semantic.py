@@ -0,0 +1,459 @@
+"""
+Semantic matching of caller questions against a tenant's knowledge base
+
+Questions are embedded as fixed-size unit vectors and matched by cosine
+similarity, so paraphrases such as "when do you close" and "business hours"
+meet even when they share no words. ``HashingEmbedder`` needs nothing but
+numpy. With ``SEMANTIC_MODEL`` set and ``sentence-transformers`` installed,
+a small local model is used instead.
+
+Each tenant's vectors live in ``.npy`` files that every worker memory-maps
+read-only, so a host holds one copy in the page cache however many workers
+query it. The index is an inverted file: spherical k-means splits the rows
+into lists stored contiguously, and a query scans only the lists nearest to
+it. Entries inserted later are appended to a tail that is scanned exactly,
+and removed entries are cleared in a live mask, until the tail is full and
+the lists are rebuilt. One ``SemanticIndexer`` per host writes the files and
+follows the knowledge base change feed; readers pick up its writes through
+the shared mapping and a state file replaced atomically.
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "state.json"
+
+# Below this many rows an exact scan is as fast as probing lists
+IVF_MIN_ROWS = 4096
+# Rows appended after a build before the lists are rebuilt
+TAIL_ROWS = 4096
+DEFAULT_NPROBE = 4
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are at be can could do does for i in is it me my of on or our "
+                       "the to we what would you your".split())
+
+# Words that ask about the same thing, so questions about it match without sharing words
+CONCEPTS: Dict[str, Tuple[str, ...]] = {
+    "hours": ("hour", "open", "close", "clos", "closed", "time", "when", "late", "early", "today",
+              "tomorrow", "weekend", "saturday", "sunday", "holiday"),
+    "pricing": ("price", "cost", "much", "fee", "charge", "expensive", "cheap", "rate", "pay", "dollar"),
+    "location": ("where", "address", "located", "locat", "parking", "park", "direction", "find", "street"),
+    "appointments": ("appointment", "book", "schedule", "reserve", "reservation", "availability",
+                     "available", "slot", "walk"),
+    "policies": ("cancel", "cancellation", "refund", "policy", "deposit", "reschedule"),
+}
+_CONCEPT_OF = {word: concept for concept, words in CONCEPTS.items() for word in words}
+
+
+class SemanticIndexNotReady(Exception):
+    """The tenant's index has not been built yet, or was built by another embedder"""
+
+
+def _stem(word: str) -> str:
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class HashingEmbedder:
+    """
+    Feature hashing of words, word pairs, character n-grams and concepts
+
+    Character n-grams tolerate typos and inflections, concepts cover the
+    paraphrases callers use most. Each feature is hashed to one of ``dim``
+    buckets with a hashed sign, and the vector is scaled to unit length.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def features(self, text: str) -> Dict[str, float]:
+        words = [_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+        features: Dict[str, float] = {}
+
+        def add(feature: str, weight: float) -> None:
+            features[feature] = features.get(feature, 0.0) + weight
+
+        for i, word in enumerate(words):
+            add("w:" + word, 1.0)
+            concept = _CONCEPT_OF.get(word)
+            if concept is not None:
+                add("c:" + concept, 1.0)
+            if i:
+                add(f"b:{words[i - 1]} {word}", 0.5)
+            padded = f"<{word}>"
+            for n in (3, 4):
+                for start in range(len(padded) - n + 1):
+                    add("g:" + padded[start:start + n], 0.25)
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self.features(text).items():
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += weight if h & 0x80000000 else -weight
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """A local ``sentence-transformers`` model, run on the CPU"""
+
+    def __init__(self, model: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{model}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self._model.encode(list(texts), batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(vectors.astype(np.float32))
+
+
+def build_embedder():
+    """``SEMANTIC_MODEL`` if it is set and sentence-transformers is installed, else feature hashing"""
+    model = os.getenv("SEMANTIC_MODEL")
+    if model:
+        if importlib.util.find_spec("sentence_transformers") is not None:
+            return SentenceTransformerEmbedder(model)
+        logger.warning(f"SEMANTIC_MODEL={model} needs sentence-transformers; using feature hashing")
+    return HashingEmbedder(int(os.getenv("SEMANTIC_DIM", "256")))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10,
+                     sample: int = 64, seed: int = 0) -> np.ndarray:
+    """``nlist`` unit centroids trained on at most ``sample`` rows per list"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > nlist * sample:
+        vectors = vectors[rng.choice(len(vectors), nlist * sample, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[np.argsort(assignment, kind="stable")], starts[filled], axis=0)
+        # Restart empty lists from random rows rather than losing them
+        sums[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    return np.concatenate([np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+                           for start in range(0, len(vectors), chunk)] or [np.zeros(0, dtype=np.int64)])
+
+
+class SemanticIndex:
+    """
+    One tenant's vectors and list layout on disk
+
+    Readers call ``refresh`` and ``query``; the files are mapped read-only
+    and remapped only when a rebuild starts a new generation. The writer
+    uses ``build``, ``upsert`` and ``remove``, which only append rows and
+    clear live flags, and publishes each batch with ``commit``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state: Optional[Dict[str, Any]] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._rows: Optional[Dict[str, int]] = None
+
+    def _file(self, generation: int, name: str) -> str:
+        return os.path.join(self.path, f"{generation}.{name}.npy")
+
+    # Reading
+
+    def refresh(self) -> bool:
+        """Pick up the writer's latest commit; False while there is no index"""
+        try:
+            stat = os.stat(os.path.join(self.path, STATE_FILE))
+            key = (stat.st_ino, stat.st_mtime_ns)
+            if key != self._stat:
+                state = self._read_state()
+                if self.state is None or state["generation"] != self.state["generation"]:
+                    self._map(state, "r")
+                self.state, self._stat = state, key
+        except FileNotFoundError:
+            # No index yet, or a rebuild replaced the generation just read; keep what is mapped
+            return self.state is not None
+        return True
+
+    def _read_state(self) -> Dict[str, Any]:
+        with open(os.path.join(self.path, STATE_FILE)) as f:
+            return json.load(f)
+
+    def _map(self, state: Dict[str, Any], mode: str) -> None:
+        generation = state["generation"]
+        self._arrays = {name: np.load(self._file(generation, name), mmap_mode=mode)
+                        for name in ("vectors", "ids", "live", "centroids", "offsets")}
+        self._rows = None
+
+    def query(self, vector: np.ndarray, k: int = 5, nprobe: int = DEFAULT_NPROBE) -> List[Tuple[str, float]]:
+        """Up to ``k`` entry IDs with their cosine similarity to the unit ``vector``, best first"""
+        state, arrays = self.state, self._arrays
+        count, base = state["count"], state["base_count"]
+        vectors, centroids, offsets = arrays["vectors"], arrays["centroids"], arrays["offsets"]
+
+        if len(centroids):
+            similarity = centroids @ vector
+            nearest = np.argpartition(-similarity, nprobe - 1)[:nprobe] if len(centroids) > nprobe else range(len(centroids))
+            spans = [(int(offsets[c]), int(offsets[c + 1])) for c in nearest]
+        else:
+            spans = [(0, base)]
+        spans.append((base, count))
+        spans = [(start, stop) for start, stop in spans if stop > start]
+        if not spans:
+            return []
+
+        scores = np.concatenate([vectors[start:stop] @ vector for start, stop in spans])
+        live = np.concatenate([arrays["live"][start:stop] for start, stop in spans])
+        scores[live == 0] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Positions in the concatenated scores back to rows
+        ends = np.cumsum([stop - start for start, stop in spans])
+        ids = arrays["ids"]
+        matches = []
+        for i in top:
+            if scores[i] == -np.inf:
+                break
+            span = int(np.searchsorted(ends, i, side="right"))
+            row = spans[span][1] - (int(ends[span]) - i)
+            matches.append((ids[row].decode(), float(scores[i])))
+        return matches
+
+    # Writing
+
+    @classmethod
+    def build(cls, path: str, embedder_name: str, ids: Sequence[str], vectors: np.ndarray,
+              version: int) -> "SemanticIndex":
+        """Write a new generation holding ``vectors`` and make it current"""
+        os.makedirs(path, exist_ok=True)
+        index = cls(path)
+        try:
+            generation = index._read_state()["generation"] + 1
+        except FileNotFoundError:
+            generation = 1
+
+        count = len(ids)
+        if count >= IVF_MIN_ROWS:
+            nlist = int(min(1024, max(16, np.sqrt(count))))
+            centroids = spherical_kmeans(vectors, nlist)
+            assignment = _assign(vectors, centroids)
+            order = np.argsort(assignment, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+        else:
+            centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            order = np.arange(count)
+            offsets = np.zeros(1, dtype=np.int64)
+
+        dim = vectors.shape[1]
+        capacity = count + TAIL_ROWS
+        stored = np.lib.format.open_memmap(index._file(generation, "vectors"), mode="w+",
+                                           dtype=np.float32, shape=(capacity, dim))
+        stored[:count] = vectors[order]
+        stored_ids = np.lib.format.open_memmap(index._file(generation, "ids"), mode="w+",
+                                               dtype="S36", shape=(capacity,))
+        stored_ids[:count] = np.array(ids, dtype="S36")[order]
+        live = np.lib.format.open_memmap(index._file(generation, "live"), mode="w+",
+                                         dtype=np.uint8, shape=(capacity,))
+        live[:count] = 1
+        for array in (stored, stored_ids, live):
+            array.flush()
+        np.save(index._file(generation, "centroids"), centroids.astype(np.float32))
+        np.save(index._file(generation, "offsets"), offsets.astype(np.int64))
+
+        index.state = {"generation": generation, "embedder": embedder_name, "dim": dim, "version": version,
+                       "count": count, "base_count": count, "capacity": capacity}
+        index._map(index.state, "r+")
+        index.commit()
+        index._remove_generations_before(generation)
+        return index
+
+    @classmethod
+    def open_writer(cls, path: str) -> Optional["SemanticIndex"]:
+        """The current generation for appending, or None if there is none or it predates the last boot"""
+        index = cls(path)
+        if not index.refresh():
+            return None
+        booted_at = time.time() - time.monotonic()
+        if os.stat(os.path.join(path, STATE_FILE)).st_mtime < booted_at:
+            return None
+        index._map(index.state, "r+")
+        return index
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        if self._rows is None:
+            ids, live = self._arrays["ids"], self._arrays["live"]
+            self._rows = {ids[row].decode(): row for row in range(self.state["count"]) if live[row]}
+        return self._rows
+
+    @property
+    def tail_free(self) -> int:
+        return self.state["capacity"] - self.state["count"]
+
+    def live_vectors(self) -> Tuple[List[str], np.ndarray]:
+        rows = sorted(self.rows.values())
+        return [self._arrays["ids"][row].decode() for row in rows], np.array(self._arrays["vectors"][rows])
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Append ``vectors``, replacing earlier rows of the same IDs; the tail must have room"""
+        self.remove(ids)
+        start = self.state["count"]
+        stop = start + len(ids)
+        self._arrays["vectors"][start:stop] = vectors
+        self._arrays["ids"][start:stop] = np.array(ids, dtype="S36")
+        self._arrays["live"][start:stop] = 1
+        for knowledge_id, row in zip(ids, range(start, stop)):
+            self.rows[knowledge_id] = row
+        self.state["count"] = stop
+
+    def remove(self, ids: Iterable[str]) -> None:
+        for knowledge_id in ids:
+            row = self.rows.pop(knowledge_id, None)
+            if row is not None:
+                self._arrays["live"][row] = 0
+
+    def commit(self, version: Optional[int] = None) -> None:
+        """Publish appended rows to readers with a new state file"""
+        if version is not None:
+            self.state["version"] = version
+        # Readers share the writer's pages, so rows are visible without syncing them to disk;
+        # after a reboot open_writer discards the index instead of trusting a partial write
+        temporary = os.path.join(self.path, STATE_FILE + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temporary, os.path.join(self.path, STATE_FILE))
+
+    def _remove_generations_before(self, generation: int) -> None:
+        # Readers still mapping them keep the data until they remap
+        for name in os.listdir(self.path):
+            prefix = name.split(".", 1)[0]
+            if prefix.isdigit() and int(prefix) < generation:
+                os.remove(os.path.join(self.path, name))
+
+
+class SemanticIndexes:
+    """Read side: every tenant's index under ``root``, mapped on first use"""
+
+    def __init__(self, root: str, embedder, nprobe: int = DEFAULT_NPROBE):
+        self.root = root
+        self.embedder = embedder
+        self.nprobe = nprobe
+        self._indexes: Dict[str, SemanticIndex] = {}
+
+    def path(self, tenant_id: str) -> str:
+        return os.path.join(self.root, tenant_id)
+
+    def query(self, tenant_id: str, text: str, k: int = 5) -> List[Tuple[str, float]]:
+        """The tenant's ``k`` entries closest to ``text`` as (ID, cosine similarity), best first"""
+        index = self._indexes.get(tenant_id)
+        if index is None:
+            index = self._indexes[tenant_id] = SemanticIndex(self.path(tenant_id))
+        if not index.refresh() or index.state["embedder"] != self.embedder.name:
+            raise SemanticIndexNotReady(f"No semantic index for tenant {tenant_id} yet")
+        return index.query(self.embedder.embed([text])[0], k, self.nprobe)
+
+
+class SemanticIndexer:
+    """
+    Write side: builds each tenant's index and keeps it current
+
+    Polls the knowledge base change feed every ``interval`` seconds from the
+    version each index was built at. A tenant is rebuilt from the database
+    when it has no index, its changes were pruned or the embedder changed,
+    and from its own live vectors when the tail fills up. Runs in one
+    process per host; embedding and clustering run in a thread.
+    """
+
+    def __init__(self, knowledge_repo, tenant_repo, indexes: SemanticIndexes, interval: float = 5.0):
+        self.knowledge_repo = knowledge_repo
+        self.tenant_repo = tenant_repo
+        self.indexes = indexes
+        self.interval = interval
+        self._writers: Dict[str, SemanticIndex] = {}
+
+    async def run(self) -> None:
+        while True:
+            try:
+                for tenant in await self.tenant_repo.get_active():
+                    await self.sync(str(tenant["id"]))
+            except Exception as e:
+                logger.error(f"Semantic index update failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sync(self, tenant_id: str) -> None:
+        writer = self._writers.get(tenant_id)
+        if writer is None:
+            writer = SemanticIndex.open_writer(self.indexes.path(tenant_id))
+        if writer is None or writer.state["embedder"] != self.indexes.embedder.name:
+            writer = await self._build(tenant_id)
+
+        while True:
+            delta = await self.knowledge_repo.get_delta(writer.state["version"], tenant_id, limit=1000,
+                                                        columns="id, question")
+            if delta["reset"]:
+                writer = await self._build(tenant_id)
+                continue
+
+            entries = delta["added"] + delta["updated"]
+            ids = [str(entry["id"]) for entry in entries]
+            vectors = np.zeros((0, writer.state["dim"]), dtype=np.float32)
+            if entries:
+                vectors = await asyncio.to_thread(self.indexes.embedder.embed, [entry["question"] for entry in entries])
+            writer.remove(ids + delta["deleted"])
+            if len(entries) > writer.tail_free:
+                # Tail full: rebuild the lists from the live rows and the new ones, without re-embedding
+                live_ids, live_vectors = writer.live_vectors()
+                writer = await asyncio.to_thread(SemanticIndex.build, writer.path, writer.state["embedder"],
+                                                 live_ids + ids, np.concatenate([live_vectors, vectors]),
+                                                 delta["version"])
+            else:
+                if entries:
+                    writer.upsert(ids, vectors)
+                if delta["version"] != writer.state["version"]:
+                    writer.commit(delta["version"])
+            if not delta["has_more"]:
+                break
+        self._writers[tenant_id] = writer
+
+    async def _build(self, tenant_id: str) -> SemanticIndex:
+        version = await self.knowledge_repo.get_latest_change_version()
+        entries = [entry async for entry in self.knowledge_repo.iter_all(columns="id, question",
+                                                                         filters={"tenant_id": tenant_id})]
+        embedder = self.indexes.embedder
+        vectors = await asyncio.to_thread(
+            lambda: embedder.embed([entry["question"] for entry in entries]).reshape(len(entries), embedder.dim))
+        index = await asyncio.to_thread(SemanticIndex.build, self.indexes.path(tenant_id), embedder.name,
+                                        [str(entry["id"]) for entry in entries], vectors, version)
+        logger.info(f"Built semantic index of tenant {tenant_id}: {len(entries)} entries at version {version}")
+        return index
@@ -0,0 +1,251 @@
+"""
+Production entrypoint: a pre-fork supervisor running several uvicorn workers
+
+The supervisor binds the listening socket, imports the app once and forks
+the workers, which share the socket. Importing ``app.main`` only defines
+routes and middleware. Clients, caches, queues and background tasks belong
+to ``AppContainer``, which each worker starts from the lifespan after the
+fork, so nothing that holds a connection, thread or event loop is shared.
+Singleton jobs are coordinated between workers by ``app.leader``.
+
+On SIGTERM or SIGINT the workers stop accepting connections, finish
+in-flight requests within the grace period and run the lifespan shutdown.
+A worker that dies is replaced; one that fails to start stops the server.
+
+Usage (from the ``agent`` directory)::
+
+    python -m app.serve
+    FASTAPI_WORKERS=4 python -m app.serve
+"""
+
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import uvicorn
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Exit code of a worker whose lifespan startup failed, as with uvicorn.run
+STARTUP_FAILURE = 3
+
+# Time on top of the request grace period for the lifespan shutdown to drain queues
+SHUTDOWN_DRAIN_SECONDS = 15.0
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server for one forked worker"""
+
+    def __init__(self, config: uvicorn.Config, on_drain: Optional[Callable[[], None]] = None):
+        super().__init__(config)
+        self.on_drain = on_drain
+        self.parent_pid = os.getppid()
+
+    async def on_tick(self, counter: int) -> bool:
+        # Do not outlive a supervisor that was killed without forwarding a signal
+        if counter % 10 == 0 and os.getppid() != self.parent_pid:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+    async def shutdown(self, sockets=None) -> None:
+        if self.on_drain is not None:
+            self.on_drain()
+        await super().shutdown(sockets=sockets)
+
+
+def _close_streams(app) -> None:
+    """End open event streams, which would otherwise hold the worker for the whole grace period"""
+    container = getattr(app.state, "container", None)
+    if container is not None:
+        container.event_relay.close_all()
+
+
+def _load_app():
+    from .main import app
+
+    return app
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+class WorkerSupervisor:
+    """
+    Forks ``workers`` processes serving ``sock`` and keeps that many running
+
+    With ``preload`` the app is imported before forking, so the workers share
+    its memory and start faster. Without it each worker imports the app
+    itself, which is needed if importing it ever starts threads or opens
+    connections.
+    """
+
+    def __init__(self,
+                 sock: socket.socket,
+                 workers: int,
+                 preload: bool = True,
+                 grace_seconds: float = 30.0,
+                 log_level: str = "info",
+                 loop: str = "auto",
+                 http: str = "auto"):
+        self.sock = sock
+        self.workers = workers
+        self.preload = preload
+        self.grace_seconds = grace_seconds
+        self.log_level = log_level
+        self.loop = loop
+        self.http = http
+
+        self._app = None
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+        self._exit_code = 0
+
+    def run(self) -> int:
+        """Serve until signalled; returns the process exit code"""
+        if self.preload:
+            self._app = _load_app()
+            if threading.active_count() > 1:
+                logger.warning("Importing the app started threads, which do not survive fork; "
+                               "set PRELOAD_APP=false")
+
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        deadline = None
+        while self._children:
+            self._reap()
+            if self._stopping and deadline is None:
+                deadline = time.monotonic() + self.grace_seconds + SHUTDOWN_DRAIN_SECONDS
+            if deadline is not None and time.monotonic() > deadline:
+                logger.error(f"Killing {len(self._children)} workers that did not stop in time")
+                for pid in self._children:
+                    os.kill(pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(0.1)
+
+        self.sock.close()
+        logger.info("All workers stopped")
+        return self._exit_code
+
+    def _handle_signal(self, signum: int, frame) -> None:
+        if not self._stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, draining {len(self._children)} workers")
+        self._stop()
+
+    def _stop(self) -> None:
+        self._stopping = True
+        # SIGTERM even for Ctrl+C: the workers already got SIGINT from the terminal, and a second
+        # SIGINT would make uvicorn skip the graceful shutdown
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.monotonic()
+            return
+
+        code = 1
+        try:
+            code = self._serve_worker()
+        except SystemExit as e:
+            # uvicorn exits this way when the lifespan startup fails
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} crashed")
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _serve_worker(self) -> int:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        app = self._app or _load_app()
+        config = uvicorn.Config(
+            app,
+            loop=self.loop,
+            http=self.http,
+            lifespan="on",
+            log_level=self.log_level,
+            timeout_graceful_shutdown=int(self.grace_seconds)
+        )
+        server = WorkerServer(config, on_drain=lambda: _close_streams(app))
+        server.run(sockets=[self.sock])
+        return 0 if server.started else STARTUP_FAILURE
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                return
+
+            started = self._children.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                # Restarting would fail the same way; let the orchestrator restart the whole server
+                logger.error(f"Worker {pid} failed to start; shutting down")
+                self._exit_code = STARTUP_FAILURE
+                self._stop()
+                continue
+
+            logger.warning(f"Worker {pid} exited with {code} after {time.monotonic() - started:.0f}s; replacing it")
+            self._spawn()
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> int:
+    load_dotenv(dotenv_path=".env.local")
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    host = os.getenv("FASTAPI_HOST", "0.0.0.0")
+    port = int(os.getenv("FASTAPI_PORT", 8001))
+    workers = int(os.getenv("FASTAPI_WORKERS") or os.cpu_count() or 1)
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+
+    logger.info(f"Starting {workers} workers on {host}:{port} (loop={loop}, http={http})")
+    supervisor = WorkerSupervisor(
+        bind_socket(host, port),
+        workers=workers,
+        preload=os.getenv("PRELOAD_APP", "true").lower() != "false",
+        grace_seconds=float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30")),
+        loop=loop,
+        http=http
+    )
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,7 +3,7 @@ AI Service - Core business logic for AI agent interactions
 """
 
 import logging
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 from uuid import UUID
 
 from ..repositories.knowledge_base_repository import KnowledgeBaseRepository
@@ -11,23 +11,68 @@ from ..repositories.help_request_repository import HelpRequestRepository
 from ..repositories.customer_repository import CustomerRepository
 from ..repositories.call_session_repository import CallSessionRepository
 from ..models.schemas import Priority, AIQueryResponse
+from ..cache import SingleFlight, TTLCache
+from ..knowledge_feed import CONTEXT_KNOWLEDGE_LIMIT, FEED_COLUMNS, render_knowledge_section
+from ..notifications import NotificationDispatcher
+from ..projections import HelpRequestProjection
+from ..semantic import SemanticIndexes, SemanticIndexNotReady
+from .tenant_service import TenantService
 
 logger = logging.getLogger(__name__)
 
+# Shared by every tenant; business facts come from the tenant's profile
+RECEPTIONIST_GUIDELINES = """
+IMPORTANT INSTRUCTIONS:
+- Always be friendly, professional, and helpful
+- Answer questions about our basic services, hours, location, and general pricing confidently
+- For specific availability, detailed pricing, or special requests, offer to check or schedule an appointment
+- ONLY escalate to supervisor for: complex complaints, special accommodations, pricing disputes, or truly unknown questions
+- Never make up specific information you don't have
+- Always offer to schedule appointments when appropriate
+"""
+
+
+def render_business_context(tenant: dict) -> str:
+    """Render a tenant's identity, profile facts and instructions into the base prompt context"""
+    description = f", {tenant['description']}" if tenant.get("description") else ""
+    lines = [f"You are an AI receptionist for {tenant['name']}{description}.", "", "BUSINESS INFORMATION:"]
+    lines.extend(f"- {fact['label']}: {fact['value']}" for fact in tenant.get("profile") or [])
+
+    context = "\n".join(lines) + "\n" + RECEPTIONIST_GUIDELINES
+    if tenant.get("instructions"):
+        context += "\n" + tenant["instructions"].strip() + "\n"
+    return context
+
 
 class AIService:
-    def __init__(self):
-        self.knowledge_repo = KnowledgeBaseRepository()
-        self.help_request_repo = HelpRequestRepository()
-        self.customer_repo = CustomerRepository()
-        self.call_session_repo = CallSessionRepository()
+    def __init__(self,
+                 knowledge_repo: Optional[KnowledgeBaseRepository] = None,
+                 help_request_repo: Optional[HelpRequestRepository] = None,
+                 customer_repo: Optional[CustomerRepository] = None,
+                 call_session_repo: Optional[CallSessionRepository] = None,
+                 tenant_service: Optional[TenantService] = None,
+                 context_cache: Optional[TTLCache] = None,
+                 notifier: Optional[NotificationDispatcher] = None,
+                 projection: Optional[HelpRequestProjection] = None,
+                 semantic_indexes: Optional[SemanticIndexes] = None):
+        self.knowledge_repo = knowledge_repo or KnowledgeBaseRepository()
+        self.help_request_repo = help_request_repo or HelpRequestRepository()
+        self.customer_repo = customer_repo or CustomerRepository()
+        self.call_session_repo = call_session_repo or CallSessionRepository()
+        self.tenant_service = tenant_service or TenantService()
+        self.context_cache = context_cache
+        self.notifier = notifier
+        self.projection = projection
+        self.semantic_indexes = semantic_indexes
+        self._context_flight = SingleFlight("salon_context")
 
     async def process_customer_query(self,
                                    question: str,
                                    customer_phone: str,
                                    customer_name: Optional[str] = None,
                                    call_session_id: Optional[UUID] = None,
-                                   context: Optional[str] = None) -> AIQueryResponse:
+                                   context: Optional[str] = None,
+                                   tenant: Optional[str] = None) -> AIQueryResponse:
         """
         Main method to process customer queries
 
@@ -36,6 +81,7 @@ class AIService:
         3. Return appropriate response
         """
         logger.info(f"Processing query from {customer_phone}: {question}")
+        tenant_row = await self.tenant_service.resolve(tenant)
 
         # Ensure customer exists
         customer = await self.customer_repo.get_or_create_by_phone(customer_phone, customer_name)
@@ -53,11 +99,12 @@ class AIService:
             question=question,
             context=context,
             priority=priority,
-            call_session_id=call_session_id
+            call_session_id=call_session_id,
+            tenant_id=str(tenant_row["id"])
         )
 
-        # Simulate notifying supervisor (in real implementation, this would send SMS/email)
-        await self._notify_supervisor(help_request)
+        # The dashboard view names the customer of the request's call session, if it has one
+        self.help_request_created({**help_request, "customer_name": customer.get("name") if call_session_id else None})
 
         return AIQueryResponse(
             has_answer=False,
@@ -67,63 +114,93 @@ class AIService:
             escalated=True
         )
 
-    async def get_salon_context(self) -> str:
-        """Get salon business context for AI agent prompting - includes dynamic knowledge base"""
-
-        # Base context (could also be stored in DB later)
-        base_context = """
-        You are an AI receptionist for Bella's Hair & Beauty Salon, a premium salon in downtown.
-
-        BUSINESS INFORMATION:
-        - Hours: Monday-Friday 9 AM to 7 PM, Saturday 9 AM to 5 PM, Closed Sundays
-        - Services: Haircuts, Hair Coloring, Highlights, Blowouts, Hair Styling, Manicures, Pedicures, Facials, Eyebrow Services
-        - Pricing: Basic haircuts start at $45, Cut and style packages start at $65
-        - Location: 123 Main Street, Downtown
-        - Phone: (555) 123-4567
-        - Appointments: Preferred but walk-ins accepted when possible
-        - Cancellation: 24-hour notice required, same-day cancellations may incur fees
-        - Gift Certificates: Available for any amount or specific services
-        - Parking: Street parking and paid lot behind building
-
-        IMPORTANT INSTRUCTIONS:
-        - Always be friendly, professional, and helpful
-        - Answer questions about our basic services, hours, location, and general pricing confidently
-        - For specific availability, detailed pricing, or special requests, offer to check or schedule an appointment
-        - ONLY escalate to supervisor for: complex complaints, special accommodations, pricing disputes, or truly unknown questions
-        - Never make up specific information you don't have
-        - Always offer to schedule appointments when appropriate
-        """
+    async def get_salon_context(self, tenant: Optional[str] = None) -> str:
+        """Get a tenant's business context for AI agent prompting - includes its knowledge base partition"""
+        tenant_row = await self.tenant_service.resolve(tenant)
+        tenant_id = str(tenant_row["id"])
+
+        generation = 0
+        if self.context_cache is not None:
+            cached = self.context_cache.get(tenant_id)
+            if cached is not None:
+                return cached
+            generation = self.context_cache.generation(tenant_id)
+
+        # Sessions starting together share one knowledge base query and render per tenant. The
+        # flight is keyed by generation too, so callers after an invalidation start a fresh render
+        return await self._context_flight.do((tenant_id, generation),
+                                             lambda: self._render_context(tenant_row, generation))
 
-        # Fetch dynamic knowledge base from database
+    async def _render_context(self, tenant_row: Dict[str, Any], generation: int = 0) -> str:
+        tenant_id = str(tenant_row["id"])
+        base_context = render_business_context(tenant_row)
+
+        # Fetch the tenant's knowledge base from database
         try:
-            # Get all knowledge entries ordered by usage
-            knowledge_entries = await self.knowledge_repo.get_most_used(limit=50)
-
-            if knowledge_entries:
-                knowledge_section = "\n\nKNOWLEDGE BASE ANSWERS:\n"
-                knowledge_section += "Use these pre-approved answers when customers ask related questions:\n\n"
-
-                for entry in knowledge_entries:
-                    # Only include high-confidence entries
-                    # Include all active knowledge entries
-                    if entry.get("confidence_score", 1.0) >= 0.7:
-                        question = entry.get("question", "")
-                        answer = entry.get("answer", "")
-                        category = entry.get("category", "general")
-
-                        knowledge_section += f"Q: {question}\n"
-                        knowledge_section += f"A: {answer}\n"
-                        knowledge_section += f"Category: {category}\n\n"
-
-                return base_context + knowledge_section
-            else:
-                logger.info("No knowledge base entries found, using base context only")
-                return base_context
+            # Get the tenant's knowledge entries ordered by usage
+            knowledge_entries = await self.knowledge_repo.get_most_used(limit=CONTEXT_KNOWLEDGE_LIMIT, tenant_id=tenant_id)
+
+            if not knowledge_entries:
+                logger.info(f"No knowledge base entries found for tenant {tenant_row['slug']}, using base context only")
+            return self._cache_context(tenant_id, base_context + render_knowledge_section(knowledge_entries),
+                                       generation)
 
         except Exception as e:
             logger.error(f"Failed to fetch knowledge base: {e}")
             return base_context
 
+    def _cache_context(self, tenant_id: str, context: str, generation: int) -> str:
+        """Store a rendered context unless it was invalidated meanwhile; fallbacks after errors are not cached"""
+        if self.context_cache is not None:
+            self.context_cache.set(tenant_id, context, generation=generation)
+        return context
+
+    async def get_business_context(self, tenant: Optional[str] = None) -> str:
+        """A tenant's business context without the knowledge section, for agents keeping their own copy"""
+        return render_business_context(await self.tenant_service.resolve(tenant))
+
+    async def get_knowledge_snapshot(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """All of a tenant's entries and the change version they are current to"""
+        tenant_id = str((await self.tenant_service.resolve(tenant))["id"])
+
+        # Read the version first: entries read afterwards are at least that new, and
+        # replaying changes the entries already include is harmless
+        version = await self.knowledge_repo.get_latest_change_version()
+        entries = [entry async for entry in self.knowledge_repo.iter_all(columns=FEED_COLUMNS,
+                                                                         filters={"tenant_id": tenant_id})]
+        return {"version": version, "entries": entries}
+
+    async def search_knowledge(self, query: str, tenant: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
+        """A tenant's entries best matching ``query``, with their scores"""
+        tenant_id = str((await self.tenant_service.resolve(tenant))["id"])
+        results = await self.knowledge_repo.search(query, tenant_id=tenant_id, limit=limit)
+        for row in results:
+            row.pop("tenant_id", None)
+        return {"query": query, "results": results}
+
+    async def match_knowledge(self, question: str, tenant: Optional[str] = None, k: int = 5) -> Dict[str, Any]:
+        """A tenant's entries closest in meaning to ``question``, scored by cosine similarity"""
+        tenant_id = str((await self.tenant_service.resolve(tenant))["id"])
+        if self.semantic_indexes is None:
+            raise SemanticIndexNotReady("Semantic matching is not configured")
+        matches = self.semantic_indexes.query(tenant_id, question, k)
+
+        rows = {str(row["id"]): row
+                for row in await self.knowledge_repo.get_by_ids([knowledge_id for knowledge_id, _ in matches],
+                                                                columns=FEED_COLUMNS)}
+        # Entries deleted since the index last caught up are left out
+        results = [dict(rows[knowledge_id], score=score, match="semantic")
+                   for knowledge_id, score in matches if knowledge_id in rows]
+        return {"query": question, "results": results}
+
+    async def get_knowledge_changes(self,
+                                    since: int,
+                                    tenant: Optional[str] = None,
+                                    limit: int = 500) -> Dict[str, Any]:
+        """Entries of a tenant added, updated or deleted after version ``since``, as ``get_delta`` collapses them"""
+        tenant_id = str((await self.tenant_service.resolve(tenant))["id"])
+        return await self.knowledge_repo.get_delta(since, tenant_id, limit)
+
     def _determine_priority(self, question: str, context: Optional[str] = None) -> Priority:
         """Determine priority level for help requests"""
         urgent_keywords = ["emergency", "urgent", "complaint", "angry", "cancel all", "refund"]
@@ -141,35 +218,26 @@ class AIService:
         else:
             return Priority.NORMAL
 
-    async def _notify_supervisor(self, help_request: dict) -> None:
-        """Simulate notifying supervisor about new help request"""
-        # In a real implementation, this would:
-        # 1. Send SMS to supervisor
-        # 2. Send email notification
-        # 3. Push notification to supervisor app
-        # 4. Log to monitoring system
-
-        logger.info(f"""
-        🚨 NEW SUPERVISOR REQUEST 🚨
-        Request ID: {help_request['id']}
-        Customer: {help_request['customer_phone']}
-        Priority: {help_request['priority']}
-        Question: {help_request['question']}
-        Context: {help_request.get('context', 'None')}
-
-        Please respond via the supervisor dashboard.
-        """)
-
-        print(f"\n{'='*50}")
-        print("📱 SUPERVISOR NOTIFICATION")
-        print(f"{'='*50}")
-        print(f"Customer {help_request['customer_phone']} needs help!")
-        print(f"Priority: {help_request['priority'].upper()}")
-        print(f"Question: {help_request['question']}")
-        if help_request.get('context'):
-            print(f"Context: {help_request['context'][:100]}...")
-        print(f"Request ID: {help_request['id']}")
-        print(f"{'='*50}\n")
+    def help_request_created(self, help_request: dict) -> None:
+        """Show a newly written help request on the dashboard and notify its supervisor"""
+        if self.projection is not None:
+            self.projection.request_created(help_request)
+        # Delivery happens in the background; the ticket is already written
+        self.notify_supervisor(help_request)
+
+    def notify_supervisor(self, help_request: dict) -> None:
+        """Queue a notification about a new help request; never waits on delivery"""
+        if self.notifier is not None:
+            self.notifier.enqueue(help_request)
+            return
+
+        # No dispatcher (scripts and benchmarks): just log the request
+        logger.info(f"🚨 NEW SUPERVISOR REQUEST {help_request['id']} from {help_request['customer_phone']} "
+                    f"({help_request['priority']}): {help_request['question']}")
+
+    async def save_transcript(self, call_session_id: UUID, customer_phone: str, transcript: str) -> None:
+        """Store the running transcript of a call session"""
+        await self.call_session_repo.upsert_transcript(call_session_id, customer_phone, transcript)
 
     async def learn_from_resolution(self, help_request_id: UUID, supervisor_response: str) -> None:
         """Learn from supervisor resolution and add to knowledge base"""
@@ -179,14 +247,21 @@ class AIService:
             # Extract category from the question
             category = self._extract_category(help_request["question"])
 
-            # Add to knowledge base
+            # Add to the knowledge base partition of the ticket's tenant
+            tenant_id = await self.tenant_service.knowledge_partition(help_request.get("tenant_id"))
             await self.knowledge_repo.create_knowledge_entry(
                 question=help_request["question"],
                 answer=supervisor_response,
                 category=category,
-                source="supervisor"
+                source="supervisor",
+                tenant_id=tenant_id
             )
 
+            if self.context_cache is not None:
+                self.context_cache.invalidate(tenant_id)
+            if self.projection is not None:
+                self.projection.knowledge_changed()
+
             logger.info(f"Added new knowledge from resolved request {help_request_id}")
 
     def _extract_category(self, question: str) -> str:
@@ -2,33 +2,74 @@
 Supervisor Service - Business logic for supervisor operations
 """
 
+import asyncio
+import json
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Set
 from uuid import UUID
 
+from pydantic import ValidationError
+
 from ..repositories.help_request_repository import HelpRequestRepository
 from ..repositories.knowledge_base_repository import KnowledgeBaseRepository
+from ..repositories.followup_repository import FollowUpRepository
+from ..cache import TTLCache
+from ..followups import FollowUpWorkerPool
+from ..projections import HelpRequestProjection
+from .tenant_service import TenantService
 from ..models.schemas import (
     SupervisorDashboardResponse,
     HelpRequestResponse,
     KnowledgeBaseResponse,
-    AnalyticsResponse
+    KnowledgeBaseCreate,
+    AnalyticsResponse,
+    FollowUpResponse,
+    FollowUpType
 )
 
 logger = logging.getLogger(__name__)
 
+# Fields written per entry by the knowledge base NDJSON export
+EXPORT_FIELDS = "id, question, answer, category, source, confidence_score, usage_count, created_at, updated_at"
+
+# Cap on per-line import errors echoed back, so a bad file can't grow the response
+MAX_REPORTED_IMPORT_ERRORS = 50
+
+# Follow-up messages are capped like FollowUpCreate.message
+MAX_FOLLOWUP_CHARS = 1000
+
 
 class SupervisorService:
-    def __init__(self):
-        self.help_request_repo = HelpRequestRepository()
-        self.knowledge_repo = KnowledgeBaseRepository()
+    def __init__(self,
+                 help_request_repo: Optional[HelpRequestRepository] = None,
+                 knowledge_repo: Optional[KnowledgeBaseRepository] = None,
+                 tenant_service: Optional[TenantService] = None,
+                 context_cache: Optional[TTLCache] = None,
+                 followup_repo: Optional[FollowUpRepository] = None,
+                 followup_pool: Optional[FollowUpWorkerPool] = None,
+                 projection: Optional[HelpRequestProjection] = None):
+        self.help_request_repo = help_request_repo or HelpRequestRepository()
+        self.knowledge_repo = knowledge_repo or KnowledgeBaseRepository()
+        self.tenant_service = tenant_service or TenantService()
+        self.context_cache = context_cache
+        self.followup_repo = followup_repo or FollowUpRepository()
+        self.followup_pool = followup_pool
+        self.projection = projection
+        self._background: Set[asyncio.Task] = set()
 
     async def get_dashboard_data(self) -> List[SupervisorDashboardResponse]:
         """Get all pending help requests for supervisor dashboard"""
-        requests = await self.help_request_repo.get_pending_requests()
+        requests = await self.get_dashboard_rows()
         return [SupervisorDashboardResponse(**req) for req in requests]
 
+    async def get_dashboard_rows(self, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get pending help requests as raw rows, for the fast serialization path"""
+        tenant_id = await self._tenant_id(tenant) if tenant else None
+        if self._projection_ready():
+            return self.projection.dashboard(tenant_id)
+        return await self.help_request_repo.get_pending_requests(tenant_id)
+
     async def resolve_help_request(self,
                                  request_id: UUID,
                                  supervisor_response: str,
@@ -37,78 +78,191 @@ class SupervisorService:
         """
         Resolve a help request with supervisor response
 
-        1. Update the help request as resolved
-        2. Optionally add the Q&A to knowledge base
-        3. Trigger follow-up to customer
-        4. Return updated help request
+        1. Update the help request as resolved, returning the full row
+        2. In the background, optionally add the Q&A to knowledge base and
+           queue a follow-up to the customer, concurrently
+        3. Return updated help request
+
+        The supervisor only waits for the update's single round trip.
         """
         logger.info(f"Resolving help request {request_id} by supervisor {supervisor_id}")
 
-        # Resolve the request
-        updated_request = await self.help_request_repo.resolve_request(
+        # The update returns the updated row, so no second read is needed
+        resolved = await self.help_request_repo.resolve_request(
             request_id, supervisor_response, supervisor_id
         )
 
-        if not updated_request:
+        if not resolved:
             logger.error(f"Failed to resolve help request {request_id}")
             return None
 
-        # Get the full updated request record
-        full_request = await self.help_request_repo.get_by_id(request_id)
-        if not full_request:
-            logger.error(f"Could not fetch resolved request {request_id}")
-            return None
-
-        # Debug logging - log each field and its type
-        logger.info(f"Full request data retrieved: {full_request}")
-        logger.info(f"Full request keys: {list(full_request.keys())}")
-        for key, value in full_request.items():
-            logger.info(f"Field '{key}': {value} (type: {type(value)})")
+        if self.projection is not None:
+            self.projection.request_updated(resolved)
 
-        # Add to knowledge base if requested
+        side_effects = [self._queue_customer_followup(resolved)]
         if add_to_knowledge_base:
-            await self._add_to_knowledge_base(full_request)
+            side_effects.insert(0, self._add_to_knowledge_base(resolved))
+        self._run_in_background(self._after_resolution(resolved["id"], side_effects))
 
-        # Trigger follow-up to customer
-        await self._trigger_customer_followup(full_request)
-
-        # Try to create response with detailed error logging
         try:
-            response = HelpRequestResponse(**full_request)
-            logger.info(f"Successfully created HelpRequestResponse")
-            return response
+            return HelpRequestResponse(**resolved)
         except Exception as e:
-            logger.error(f"Failed to create HelpRequestResponse: {str(e)}")
-            logger.error(f"Error type: {type(e)}")
-            logger.error(f"Full request data causing error: {full_request}")
+            logger.error(f"Failed to create HelpRequestResponse for {request_id}: {e}; row: {resolved}")
             raise
 
+    async def _after_resolution(self, request_id: str, side_effects: List[Awaitable[None]]) -> None:
+        """Run a resolution's side effects concurrently; one failing does not stop the others"""
+        results = await asyncio.gather(*side_effects, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Post-resolution step for request {request_id} failed: {result!r}")
+
+    def _run_in_background(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def drain(self, timeout: float = 5.0) -> None:
+        """Wait for background resolution work, e.g. before shutdown"""
+        if self._background:
+            _, pending = await asyncio.wait(set(self._background), timeout=timeout)
+            if pending:
+                logger.warning(f"{len(pending)} post-resolution tasks still running at shutdown")
+
     async def get_knowledge_base(self, category: Optional[str] = None, limit: int = 100) -> List[KnowledgeBaseResponse]:
         """Get knowledge base entries, optionally filtered by category"""
-        if category:
-            entries = await self.knowledge_repo.get_by_category(category, limit)
-        else:
-            entries = await self.knowledge_repo.get_all(limit)
-
+        entries = await self.get_knowledge_base_rows(category, limit)
         return [KnowledgeBaseResponse(**entry) for entry in entries]
 
+    async def get_knowledge_base_rows(self,
+                                      category: Optional[str] = None,
+                                      limit: int = 100,
+                                      tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get knowledge base entries as raw rows, for the fast serialization path"""
+        if tenant:
+            return await self.knowledge_repo.get_for_tenant(await self._tenant_id(tenant), category, limit)
+        if category:
+            return await self.knowledge_repo.get_by_category(category, limit)
+        return await self.knowledge_repo.get_all(limit)
+
     async def add_knowledge_entry(self,
                                 question: str,
                                 answer: str,
-                                category: Optional[str] = None) -> KnowledgeBaseResponse:
-        """Manually add entry to knowledge base"""
+                                category: Optional[str] = None,
+                                tenant: Optional[str] = None) -> KnowledgeBaseResponse:
+        """Manually add entry to a tenant's knowledge base, the default tenant's if none is given"""
+        tenant_id = await self._tenant_id(tenant)
         entry = await self.knowledge_repo.create_knowledge_entry(
             question=question,
             answer=answer,
             category=category,
-            source="manual"
+            source="manual",
+            tenant_id=tenant_id
         )
 
+        self._knowledge_changed(tenant_id)
         logger.info(f"Manually added knowledge entry: {entry['id']}")
         return KnowledgeBaseResponse(**entry)
 
+    async def export_knowledge_base(self,
+                                    category: Optional[str] = None,
+                                    tenant: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Stream knowledge base entries as NDJSON, one page in memory at a time"""
+        filters = {}
+        if category:
+            filters["category"] = category
+        if tenant:
+            filters["tenant_id"] = await self._tenant_id(tenant)
+        async for entry in self.knowledge_repo.iter_all(columns=EXPORT_FIELDS, filters=filters or None):
+            yield (json.dumps(entry, default=str) + "\n").encode("utf-8")
+
+    async def import_knowledge_base(self,
+                                    lines: AsyncIterator[bytes],
+                                    dedupe: bool = True,
+                                    batch_size: int = 200,
+                                    tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Import NDJSON knowledge base entries in batches into one tenant's partition
+
+        1. Validate each line against KnowledgeBaseCreate
+        2. Optionally skip questions already in the tenant's knowledge base or earlier in the file
+        3. Insert valid entries in batches
+        4. Bump the knowledge base version once for the whole import
+
+        If a batch or the input stream fails, the batches already inserted
+        stay imported: the version is still bumped for them and the summary
+        reports the failure and the line it stopped at.
+        """
+        tenant_id = await self._tenant_id(tenant)
+        seen = await self.knowledge_repo.get_question_keys(tenant_id) if dedupe else set()
+        batch: List[Dict[str, Any]] = []
+        imported = 0
+        duplicates = 0
+        invalid = 0
+        errors: List[Dict[str, Any]] = []
+
+        line_number = 0
+        failure: Optional[str] = None
+        try:
+            async for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+
+                try:
+                    entry = KnowledgeBaseCreate.model_validate_json(line)
+                except ValidationError as e:
+                    invalid += 1
+                    if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                        errors.append({"line": line_number, "error": str(e.errors(include_url=False)[0]["msg"])})
+                    continue
+
+                if dedupe:
+                    key = self.knowledge_repo.normalize_question(entry.question)
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+
+                batch.append(entry.model_dump())
+                if len(batch) >= batch_size:
+                    imported += len(await self.knowledge_repo.create_knowledge_entries(batch, tenant_id=tenant_id))
+                    batch = []
+
+            if batch:
+                imported += len(await self.knowledge_repo.create_knowledge_entries(batch, tenant_id=tenant_id))
+        except Exception as e:
+            # Batches inserted before the failure stay committed; report how far the import got
+            failure = str(e)
+            logger.error(f"Knowledge base import stopped at line {line_number} after {imported} entries: {e}")
+        finally:
+            # Runs on cancellation too, so committed batches are never left behind stale caches
+            version = None
+            if imported:
+                version = await self.knowledge_repo.bump_version()
+                self._knowledge_changed(tenant_id)
+
+        if version is None:
+            version = await self.knowledge_repo.get_version()
+
+        logger.info(f"Imported {imported} knowledge entries ({duplicates} duplicates, {invalid} invalid), "
+                    f"knowledge base version {version}")
+
+        return {
+            "imported": imported,
+            "duplicates": duplicates,
+            "invalid": invalid,
+            "errors": errors,
+            "version": version,
+            "failed_at_line": line_number if failure is not None else None,
+            "failure": failure
+        }
+
     async def get_analytics(self) -> AnalyticsResponse:
         """Get analytics data for supervisor dashboard"""
+        if self._projection_ready():
+            return AnalyticsResponse(**await self.projection.analytics())
+
         # Help request analytics
         help_analytics = await self.help_request_repo.get_analytics()
 
@@ -130,7 +284,12 @@ class SupervisorService:
 
     async def cleanup_timeout_requests(self) -> int:
         """Clean up old pending requests by marking them as timeout"""
-        count = await self.help_request_repo.timeout_old_requests()
+        timed_out = await self.help_request_repo.timeout_old_requests()
+        if self.projection is not None:
+            for row in timed_out:
+                self.projection.request_updated(row)
+
+        count = len(timed_out)
         if count > 0:
             logger.info(f"Marked {count} old requests as timeout")
         return count
@@ -138,37 +297,56 @@ class SupervisorService:
     async def _add_to_knowledge_base(self, help_request: dict) -> None:
         """Add resolved help request to knowledge base"""
         category = self._extract_category(help_request["question"])
+        tenant_id = await self.tenant_service.knowledge_partition(help_request.get("tenant_id"))
 
         await self.knowledge_repo.create_knowledge_entry(
             question=help_request["question"],
             answer=help_request["supervisor_response"],
             category=category,
-            source="supervisor"
+            source="supervisor",
+            tenant_id=tenant_id
         )
 
+        self._knowledge_changed(tenant_id)
         logger.info(f"Added resolved request {help_request['id']} to knowledge base")
 
-    async def _trigger_customer_followup(self, help_request: dict) -> None:
-        """Trigger follow-up communication to customer"""
-        # In a real implementation, this would:
-        # 1. Send SMS to customer with the answer
-        # 2. Make automated call
-        # 3. Send email if available
-        # 4. Log the follow-up attempt
-
-        customer_phone = help_request["customer_phone"]
-        response = help_request["supervisor_response"]
-
-        logger.info(f"Following up with customer {customer_phone}")
-
-        # Simulate SMS follow-up
-        print(f"\n{'='*50}")
-        print("📱 CUSTOMER FOLLOW-UP")
-        print(f"{'='*50}")
-        print(f"To: {customer_phone}")
-        print(f"Message: Hi! I got your answer: {response[:100]}...")
-        print("This follow-up would be sent via SMS/call in production.")
-        print(f"{'='*50}\n")
+    async def _tenant_id(self, tenant: Optional[str]) -> str:
+        """ID of the tenant with this slug, or of the default tenant"""
+        return str((await self.tenant_service.resolve(tenant))["id"])
+
+    def _knowledge_changed(self, tenant_id: Optional[str] = None) -> None:
+        """Drop the cached rendering of a tenant's knowledge base, or of every tenant's, after it changed"""
+        if self.context_cache is not None:
+            self.context_cache.invalidate(tenant_id)
+        if self.projection is not None:
+            self.projection.knowledge_changed()
+
+    def _projection_ready(self) -> bool:
+        return self.projection is not None and self.projection.loaded
+
+    async def get_followups(self, request_id: UUID) -> List[FollowUpResponse]:
+        """Get the follow-ups queued for a help request and their delivery status"""
+        rows = await self.followup_repo.get_for_request(request_id)
+        return [FollowUpResponse(**row) for row in rows]
+
+    async def _queue_customer_followup(self, help_request: dict) -> None:
+        """Queue an SMS with the answer; the worker pool sends it outside the resolve request"""
+        message = f"Hi! I got your answer: {help_request['supervisor_response']}"
+        try:
+            await self.followup_repo.create_followup(
+                help_request_id=help_request["id"],
+                message=message[:MAX_FOLLOWUP_CHARS],
+                follow_up_type=FollowUpType.SMS,
+                recipient=help_request["customer_phone"]
+            )
+        except Exception as e:
+            # The resolution is already saved; a lost follow-up must not fail it
+            logger.error(f"Failed to queue follow-up for request {help_request['id']}: {e}")
+            return
+
+        logger.info(f"Queued follow-up to customer {help_request['customer_phone']}")
+        if self.followup_pool is not None:
+            self.followup_pool.wake()
 
     def _extract_category(self, question: str) -> str:
         """Extract category from question for knowledge base organization"""
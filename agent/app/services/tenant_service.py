@@ -0,0 +1,50 @@
+"""
+Tenant Service - Resolves business locations and their knowledge base partitions
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from ..repositories.tenant_repository import TenantRepository
+from ..cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TenantNotFoundError(LookupError):
+    """No active tenant has the requested slug"""
+
+
+class TenantService:
+    def __init__(self,
+                 tenant_repo: Optional[TenantRepository] = None,
+                 tenant_cache: Optional[TTLCache] = None):
+        self.tenant_repo = tenant_repo or TenantRepository()
+        self.tenant_cache = tenant_cache
+        self.default_slug = os.getenv("DEFAULT_TENANT", "default")
+
+    async def resolve(self, slug: Optional[str] = None) -> Dict[str, Any]:
+        """Get the tenant for ``slug``, or the default tenant when none is given"""
+        slug = slug or self.default_slug
+        generation = None
+        if self.tenant_cache is not None:
+            cached = self.tenant_cache.get(slug)
+            if cached is not None:
+                return cached
+            generation = self.tenant_cache.generation(slug)
+
+        tenant = await self.tenant_repo.get_by_slug(slug)
+        if tenant is None:
+            raise TenantNotFoundError(f"Unknown tenant: {slug}")
+
+        if self.tenant_cache is not None:
+            self.tenant_cache.set(slug, tenant, generation=generation)
+        return tenant
+
+    async def knowledge_partition(self, tenant_id: Optional[UUID]) -> str:
+        """Knowledge base partition for a record's tenant; records from before tenants belong to the default"""
+        if tenant_id:
+            return str(tenant_id)
+        return str((await self.resolve())["id"])
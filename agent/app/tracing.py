@@ -0,0 +1,261 @@
+"""
+Lightweight distributed tracing with W3C ``traceparent`` propagation
+
+Shared by the voice agent and the backend so one escalation can be followed
+from ``SessionManager`` through ``BackendClient`` and the HTTP middleware
+down to individual repository queries. Finished spans are appended to a
+per-process JSONL file.
+
+Sampling is decided once, at the root span, and inherited by every child,
+including children in the other process through the ``traceparent`` flags.
+Unsampled spans only carry IDs for propagation: they record no attributes
+and are never exported, so tracing costs next to nothing at full load.
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext:
+    """
+    Trace and span IDs plus the sampling decision
+
+    This is also what unsampled spans are, so recording calls on it do nothing.
+    """
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C ``traceparent`` header, ignoring malformed values"""
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+class Span(SpanContext):
+    """A sampled span that is timed and exported when it ends"""
+
+    __slots__ = ("name", "kind", "parent_id", "attributes", "status", "_start_ns", "_start")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str]):
+        super().__init__(trace_id, _new_span_id(), True)
+        self.name = name
+        self.kind = kind
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+        self._start_ns = time.time_ns()
+        self._start = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: Optional[BaseException] = None) -> None:
+        self.status = "error"
+        if error is not None:
+            self.attributes["error"] = repr(error)
+
+    def to_dict(self, service: str) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": service,
+            "start_time_unix_nano": self._start_ns,
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class JsonlSpanExporter:
+    """
+    Buffers finished spans and appends them to ``<directory>/<service>-<pid>.jsonl`` in batches
+
+    The file name is resolved at write time, so forked worker processes never
+    share a file.
+    """
+
+    def __init__(self, directory: str, service: str, batch_size: int = 256):
+        self.directory = directory
+        self.service = service
+        self.batch_size = batch_size
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{self.service}-{os.getpid()}.jsonl")
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) < self.batch_size:
+                return
+            lines, self._buffer = self._buffer, []
+        self._write(lines)
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if lines:
+            self._write(lines)
+
+    def _write(self, lines: List[str]) -> None:
+        path = self.path
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning(f"Dropped {len(lines)} spans, cannot write {path}: {e}")
+
+
+_current_span: ContextVar[Optional[SpanContext]] = ContextVar("current_span", default=None)
+
+
+class SpanScope:
+    """Context manager that makes a span current for the block and exports it afterwards"""
+
+    __slots__ = ("_tracer", "_span", "_token")
+
+    def __init__(self, tracer: "Tracer", span: SpanContext):
+        self._tracer = tracer
+        self._span = span
+
+    def __enter__(self) -> SpanContext:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.reset(self._token)
+        span = self._span
+        if span.sampled and isinstance(span, Span):
+            if exc is not None:
+                span.set_error(exc)
+            self._tracer._export(span)
+
+
+class Tracer:
+    """
+    Creates spans and tracks the active one per asyncio task
+
+    Until ``configure`` is called the sample rate is 0, so only spans whose
+    remote parent was sampled upstream are recorded.
+    """
+
+    def __init__(self):
+        self.service = "unknown"
+        self.sample_rate = 0.0
+        self.exporter: Optional[JsonlSpanExporter] = None
+
+    def configure(self,
+                  service: str,
+                  sample_rate: Optional[float] = None,
+                  export_dir: Optional[str] = None) -> None:
+        """Set the service name, root sample rate and export directory (env: TRACE_*)"""
+        self.service = service
+        if sample_rate is None:
+            sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+        export_dir = export_dir or os.getenv("TRACE_EXPORT_DIR", "traces")
+        if self.exporter is not None:
+            self.exporter.flush()
+        self.exporter = JsonlSpanExporter(export_dir, service)
+
+    def current_span(self) -> Optional[SpanContext]:
+        return _current_span.get()
+
+    def start_span(self,
+                   name: str,
+                   kind: str = "internal",
+                   parent: Optional[SpanContext] = None) -> SpanScope:
+        """
+        Scope a new span, a child of ``parent`` or of the active span
+
+        Use as ``with tracer.start_span(...) as span``. Within an unsampled
+        trace no span is created; the parent's context stays current.
+        """
+        if parent is None:
+            parent = _current_span.get()
+
+        if parent is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+            if self.sample_rate > 0 and random.random() < self.sample_rate:
+                return SpanScope(self, Span(name, kind, trace_id, None))
+            return SpanScope(self, SpanContext(trace_id, _new_span_id(), False))
+
+        if parent.sampled:
+            return SpanScope(self, Span(name, kind, parent.trace_id, parent.span_id))
+        return SpanScope(self, parent)
+
+    def _export(self, span: Span) -> None:
+        if self.exporter is None:
+            self.configure(self.service, self.sample_rate)
+        self.exporter.export(span.to_dict(self.service))
+
+    def flush(self) -> None:
+        if self.exporter is not None:
+            self.exporter.flush()
+
+
+# Process-wide tracer; each entrypoint calls ``tracer.configure`` at startup
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+
+def traced_db_call(method: str, func: Callable) -> Callable:
+    """Wrap a repository coroutine in a client span named after its table and method"""
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        with tracer.start_span(f"db {self.table_name}.{method}", kind="client") as span:
+            if span.sampled:
+                span.set_attribute("db.table", self.table_name)
+                span.set_attribute("db.operation", method)
+            return await func(self, *args, **kwargs)
+
+    return wrapper
@@ -2,27 +2,74 @@
 Backend client for AI agent to communicate with FastAPI backend
 """
 
+import json
 import os
 import httpx
 import logging
 import uuid
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Iterable, Optional, Dict, Any
 from uuid import UUID
 
+from app.cache import SingleFlight
+from app.tracing import TRACEPARENT_HEADER, tracer
+
 logger = logging.getLogger(__name__)
 
 
+class TracingTransport(httpx.AsyncBaseTransport):
+    """Wraps each backend call in a client span propagated via ``traceparent`` and ``X-Request-ID``"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with tracer.start_span(f"{request.method} {request.url.path}", kind="client") as span:
+            request.headers[TRACEPARENT_HEADER] = span.to_traceparent()
+            if "X-Request-ID" not in request.headers:
+                request.headers["X-Request-ID"] = str(uuid.uuid4())
+
+            response = await self.inner.handle_async_request(request)
+
+            span.set_attribute("http.status_code", response.status_code)
+            span.set_attribute("request_id", request.headers["X-Request-ID"])
+            if response.status_code >= 500:
+                span.set_error()
+            return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
 class BackendClient:
-    def __init__(self):
-        self.base_url = os.getenv("FASTAPI_BASE_URL", "http://localhost:8001")
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url or os.getenv("FASTAPI_BASE_URL", "http://localhost:8001")
         self.timeout = 30.0
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._context_flight = SingleFlight("agent_context_fetch")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, so calls reuse pooled keep-alive connections"""
+        if self._client is None or self._client.is_closed:
+            transport = TracingTransport(self._transport or httpx.AsyncHTTPTransport())
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=transport)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def process_query(self,
                           question: str,
                           customer_phone: str,
                           customer_name: Optional[str] = None,
                           call_session_id: Optional[UUID] = None,
-                          context: Optional[str] = None) -> Dict[str, Any]:
+                          context: Optional[str] = None,
+                          tenant: Optional[str] = None) -> Dict[str, Any]:
         """Create ticket directly when AI needs to escalate"""
 
         # Go directly to create-ticket endpoint
@@ -32,7 +79,9 @@ class BackendClient:
             return await self.create_ticket_via_api(
                 question=question,
                 customer_phone=customer_phone,
-                context=context
+                context=context,
+                tenant=tenant,
+                call_session_id=call_session_id
             )
         except Exception as e:
             logger.error(f"Ticket creation failed: {e}")
@@ -86,79 +135,150 @@ class BackendClient:
     async def create_ticket_via_api(self,
                                   question: str,
                                   customer_phone: str,
-                                  context: Optional[str] = None) -> Dict[str, Any]:
+                                  context: Optional[str] = None,
+                                  tenant: Optional[str] = None,
+                                  call_session_id: Optional[UUID] = None) -> Dict[str, Any]:
         """Create ticket via direct API endpoint"""
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/ai/create-ticket",
-                    params={
-                        "question": question,
-                        "customer_phone": customer_phone,
-                        "context": context or ""
-                    }
-                )
-                response.raise_for_status()
-
-                result = response.json()
-                help_request_id = result.get("help_request_id")
-
-                logger.info(f"✅ Ticket created via API: {help_request_id}")
-
-                return {
-                    "has_answer": False,
-                    "answer": "Let me check with my supervisor and get back to you shortly.",
-                    "confidence": 0.0,
-                    "escalated": True,
-                    "help_request_id": help_request_id
-                }
-
-            except Exception as e:
-                logger.error(f"❌ API ticket creation failed: {e}")
-                # Fall back to console logging
-                return await self.create_help_request_direct(question, customer_phone, context)
-
-    async def get_salon_context(self) -> str:
-        """Get salon business context for agent prompting"""
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(f"{self.base_url}/ai/context")
-                response.raise_for_status()
-
-                result = response.json()
-                return result.get("context", "")
-
-            except httpx.HTTPError as e:
-                logger.error(f"Failed to get salon context: {e}")
-                # Return fallback context
-                return """
-                You are an AI receptionist for Bella's Hair & Beauty Salon.
-
-                If you don't know the answer to a question, politely say:
-                "Let me check with my supervisor and get back to you shortly."
-
-                Always be helpful, professional, and friendly.
-                """
+        params = {
+            "question": question,
+            "customer_phone": customer_phone,
+            "context": context or ""
+        }
+        if tenant:
+            params["tenant"] = tenant
+        # Lets the backend rate limit per call as well as per caller
+        headers = {"X-Call-Session-ID": str(call_session_id)} if call_session_id else None
+
+        client = self._get_client()
+        try:
+            response = await client.post(f"{self.base_url}/ai/create-ticket", params=params, headers=headers)
+            response.raise_for_status()
+
+            result = response.json()
+            help_request_id = result.get("help_request_id")
+
+            logger.info(f"✅ Ticket created via API: {help_request_id}")
+
+            return {
+                "has_answer": False,
+                "answer": "Let me check with my supervisor and get back to you shortly.",
+                "confidence": 0.0,
+                "escalated": True,
+                "help_request_id": help_request_id
+            }
+
+        except Exception as e:
+            logger.error(f"❌ API ticket creation failed: {e}")
+            # Fall back to console logging
+            return await self.create_help_request_direct(question, customer_phone, context)
+
+    async def get_salon_context(self, tenant: Optional[str] = None, knowledge: bool = True) -> Optional[str]:
+        """
+        Get a tenant's business context for agent prompting, or None if the backend is unavailable
+
+        With ``knowledge=False`` the knowledge base section is left out, for agents
+        that keep their own copy of it.
+        """
+        # Sessions starting together in this process share one request per tenant
+        return await self._context_flight.do((tenant or "", knowledge),
+                                             lambda: self._fetch_salon_context(tenant, knowledge))
+
+    async def _fetch_salon_context(self, tenant: Optional[str], knowledge: bool) -> Optional[str]:
+        client = self._get_client()
+        params: Dict[str, Any] = {"tenant": tenant} if tenant else {}
+        if not knowledge:
+            params["knowledge"] = "false"
+        try:
+            response = await client.get(f"{self.base_url}/ai/context", params=params or None)
+            response.raise_for_status()
+
+            result = response.json()
+            return result.get("context", "")
+
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to get salon context for tenant {tenant or 'default'}: {e}")
+            # The agent falls back to its base instructions
+            return None
+
+    async def get_knowledge_snapshot(self, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get all of a tenant's knowledge base entries and their version, or None on failure"""
+        client = self._get_client()
+        try:
+            response = await client.get(
+                f"{self.base_url}/ai/knowledge/snapshot",
+                params={"tenant": tenant} if tenant else None
+            )
+            response.raise_for_status()
+            return response.json()
+
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to get knowledge snapshot for tenant {tenant or 'default'}: {e}")
+            return None
+
+    async def get_knowledge_changes(self, since: int, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get the knowledge base entries changed after version ``since``, or None on failure"""
+        client = self._get_client()
+        params: Dict[str, Any] = {"since": since}
+        if tenant:
+            params["tenant"] = tenant
+        try:
+            response = await client.get(f"{self.base_url}/ai/knowledge/changes", params=params)
+            response.raise_for_status()
+            return response.json()
+
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to get knowledge changes for tenant {tenant or 'default'}: {e}")
+            return None
+
+    async def save_transcript(self,
+                              call_session_id: UUID,
+                              customer_phone: str,
+                              transcript: str) -> bool:
+        """Store the running transcript of a call session"""
+
+        client = self._get_client()
+        try:
+            response = await client.put(
+                f"{self.base_url}/ai/sessions/{call_session_id}/transcript",
+                json={"customer_phone": customer_phone, "transcript": transcript}
+            )
+            response.raise_for_status()
+            return True
+
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to save transcript: {e}")
+            return False
 
     async def notify_resolution(self, help_request_id: UUID, supervisor_response: str) -> bool:
         """Notify backend when a help request is resolved (for learning)"""
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/ai/learn/{help_request_id}",
-                    params={"supervisor_response": supervisor_response}
-                )
-                response.raise_for_status()
+        client = self._get_client()
+        try:
+            response = await client.post(
+                f"{self.base_url}/ai/learn/{help_request_id}",
+                params={"supervisor_response": supervisor_response}
+            )
+            response.raise_for_status()
+
+            logger.info(f"Successfully notified backend of resolution: {help_request_id}")
+            return True
 
-                logger.info(f"Successfully notified backend of resolution: {help_request_id}")
-                return True
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to notify resolution: {e}")
+            return False
 
-            except httpx.HTTPError as e:
-                logger.error(f"Failed to notify resolution: {e}")
-                return False
+    async def stream_invalidations(self, tables: Iterable[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield cache invalidation events for ``tables`` until the stream ends or fails"""
+        client = self._get_client()
+        # The backend sends a keepalive every 15 s, so a read this slow means the stream is dead
+        timeout = httpx.Timeout(self.timeout, read=60.0)
+        async with client.stream("GET", f"{self.base_url}/events/invalidations",
+                                 params={"tables": ",".join(tables)}, timeout=timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[5:])
 
 
 # Global backend client instance
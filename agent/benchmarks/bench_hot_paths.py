@@ -0,0 +1,260 @@
+"""
+Microbenchmarks for the per-utterance and per-request hot functions
+
+Covers escalation detection, conversation context building and transcript
+log capture in the voice agent. On the backend side it covers priority and
+category classification, knowledge base confidence scoring and salon context
+prompt assembly. Corpora are generated deterministically: long call
+transcripts, a 10k-entry knowledge base and realistic agent log traffic.
+
+Timings are the best of several repeats, so scheduler noise only makes
+numbers slower, never faster. Results are compared against stored baselines
+in ``benchmarks/baselines/hot_paths.json``. The script exits non-zero when
+any benchmark is slower than its baseline by more than the tolerance, after
+re-measuring it once to rule out a noisy sample.
+Baselines are machine specific; refresh them with ``--save`` on the machine
+that runs the comparison.
+
+Usage (from the ``agent`` directory)::
+
+    python -m benchmarks.bench_hot_paths                  # compare, exit 1 on regression
+    python -m benchmarks.bench_hot_paths --save           # record new baselines
+    python -m benchmarks.bench_hot_paths --only priority  # substring filter
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import timeit
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from benchmarks import stub_db
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "hot_paths.json")
+
+SEED = 1234
+KB_ENTRIES = 10_000
+TRANSCRIPT_TURNS = 400
+UTTERANCES = 1_000
+LOG_RECORDS = 1_000
+
+WORDS = (
+    "hair color cut appointment price saturday balayage highlights manicure pedicure "
+    "facial stylist booking cancel refund parking open close weekend gift card student "
+    "discount bridal party wedding keratin treatment curly blowout eyebrow wax tint "
+    "morning evening tomorrow today next week available how much does it cost can i"
+).split()
+
+AGENT_LINES = [
+    "Sure, we're open Monday through Friday from 9 AM to 7 PM.",
+    "A basic haircut starts at $45 and a cut and style package at $65.",
+    "Let me check with my supervisor and get back to you shortly.",
+    "We have street parking and a paid lot behind the building.",
+    "I can book you in with one of our senior stylists on Saturday morning.",
+    "Gift certificates are available for any amount or specific services.",
+]
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + "?"
+
+
+def build_corpora() -> SimpleNamespace:
+    """Deterministic inputs shared by every benchmark"""
+    rng = random.Random(SEED)
+    categories = ["hours", "pricing", "services", "appointments", "policies", "location", "general"]
+
+    knowledge_base = [
+        {
+            "id": f"kb-{i}",
+            "question": _sentence(rng, 6, 18),
+            "answer": " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 60))),
+            "category": rng.choice(categories),
+            "confidence_score": rng.choice([1.0, 1.0, 0.9, 0.8, 0.6]),
+            "usage_count": rng.randint(0, 500),
+        }
+        for i in range(KB_ENTRIES)
+    ]
+
+    chat_history = []
+    for turn in range(TRANSCRIPT_TURNS):
+        chat_history.append(("user", _sentence(rng, 8, 30)))
+        chat_history.append(("assistant", rng.choice(AGENT_LINES) * rng.randint(1, 3)))
+
+    utterances = [rng.choice(AGENT_LINES) + " " + _sentence(rng, 0, 20) for _ in range(UTTERANCES)]
+
+    questions = [_sentence(rng, 6, 24) for _ in range(UTTERANCES)]
+    contexts = ["\n".join(f"Customer: {_sentence(rng, 8, 30)}\nAI: {rng.choice(AGENT_LINES)}"
+                          for _ in range(5)) for _ in range(UTTERANCES)]
+
+    # Most agent log traffic is unrelated; roughly one record in twenty is a speech commit
+    log_records = []
+    for i in range(LOG_RECORDS):
+        if i % 20 == 0:
+            payload = json.dumps({"user_transcript": _sentence(rng, 6, 24), "interrupted": False})
+            log_records.append(logging.LogRecord("livekit.agents", logging.DEBUG, __file__, 0,
+                                                 f"committed user speech {payload}", None, None))
+        else:
+            log_records.append(logging.LogRecord(rng.choice(["livekit.agents", "livekit", "httpx"]),
+                                                 logging.DEBUG, __file__, 0,
+                                                 f"audio frame stats {rng.randint(0, 10 ** 6)}", None, None))
+
+    top_entries = sorted(knowledge_base, key=lambda e: e["usage_count"], reverse=True)[:50]
+
+    return SimpleNamespace(knowledge_base=knowledge_base, chat_history=chat_history,
+                           utterances=utterances, questions=questions, contexts=contexts,
+                           log_records=log_records, top_entries=top_entries)
+
+
+def build_benchmarks(corpora: SimpleNamespace) -> Dict[str, Callable[[], object]]:
+    """Map benchmark name to a zero-argument callable exercising one hot function"""
+    import main as agent
+    from app.cache import TTLCache
+    from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+    from app.services.ai_service import AIService
+    from app.services.tenant_service import TenantService
+
+    db = stub_db.install()
+    db.tables["knowledge_base"] = [db.new_row("knowledge_base", dict(entry, tenant_id=stub_db.default_tenant_id(db)))
+                                   for entry in corpora.top_entries]
+    # Wired like the container: tenants are cached, rendered contexts are not, so every call renders
+    ai_service = AIService(tenant_service=TenantService(tenant_cache=TTLCache("tenants", ttl_seconds=3600)))
+    knowledge_repo = KnowledgeBaseRepository()
+
+    session = agent.SessionManager(agent.parse_session_config({}))
+    for role, text in corpora.chat_history:
+        session.memory.add(role, text)
+
+    handler_target = SimpleNamespace(recent_user_question=None, last_clear_question=None)
+    handler = agent.TranscriptCaptureHandler(handler_target)
+
+    kb_questions = [entry["question"] for entry in corpora.knowledge_base]
+    query = corpora.questions[0]
+    loop = asyncio.new_event_loop()
+
+    def escalation_detection():
+        for text in corpora.utterances:
+            session._is_escalation_response(text)
+
+    def conversation_context():
+        session._get_conversation_context()
+
+    def transcript_capture():
+        for record in corpora.log_records:
+            handler.emit(record)
+
+    def priority():
+        for question, context in zip(corpora.questions, corpora.contexts):
+            ai_service._determine_priority(question, context)
+
+    def category():
+        for question in kb_questions:
+            ai_service._extract_category(question)
+
+    def confidence_10k():
+        for candidate in kb_questions:
+            knowledge_repo._calculate_confidence(query, candidate)
+
+    def salon_context_render():
+        loop.run_until_complete(ai_service.get_salon_context())
+
+    return {
+        f"agent.is_escalation_response[{UTTERANCES} utterances]": escalation_detection,
+        f"agent.get_conversation_context[{TRANSCRIPT_TURNS * 2} messages]": conversation_context,
+        f"agent.transcript_capture_emit[{LOG_RECORDS} records]": transcript_capture,
+        f"ai_service.determine_priority[{UTTERANCES} questions]": priority,
+        f"ai_service.extract_category[{KB_ENTRIES} questions]": category,
+        f"knowledge_repo.calculate_confidence[{KB_ENTRIES} entries]": confidence_10k,
+        "ai_service.get_salon_context[render 50 of 10k]": salon_context_render,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Best-of-``repeat`` seconds per call"""
+    gc.collect()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--save", action="store_true", help="write results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown over baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--only", default=None, help="run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    # The agent logs every captured record; keep timings about the code, not the terminal
+    logging.disable(logging.CRITICAL)
+
+    benchmarks = build_benchmarks(build_corpora())
+    if args.only:
+        benchmarks = {name: func for name, func in benchmarks.items() if args.only in name}
+
+    results = {name: measure(func, args.repeat) for name, func in benchmarks.items()}
+
+    if args.save:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                stored = json.load(f).get("benchmarks", {})
+        stored.update({name: round(seconds * 1e6, 3) for name, seconds in results.items()})
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": _machine(), "unit": "us", "benchmarks": stored}, f, indent=2)
+            f.write("\n")
+        for name, seconds in results.items():
+            print(f"{name:<60} {seconds * 1e6:>12.1f} us  (saved)")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baselines at {args.baseline}; run with --save first", file=sys.stderr)
+        return 2
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != _machine():
+        print(f"warning: baselines were recorded on {baseline.get('machine')}, "
+              f"this is {_machine()}", file=sys.stderr)
+
+    regressions: List[str] = []
+    for name, seconds in results.items():
+        current = seconds * 1e6
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            print(f"{name:<60} {current:>12.1f} us  (no baseline)")
+            continue
+        if current / previous - 1 > args.tolerance:
+            # Confirm with a longer run before failing, so one noisy sample is not a regression
+            current = min(current, measure(benchmarks[name], args.repeat * 2) * 1e6)
+        change = current / previous - 1
+        status = "ok"
+        if change > args.tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        print(f"{name:<60} {current:>12.1f} us  baseline {previous:>12.1f} us  {change:+7.1%}  {status}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed more than {args.tolerance:.0%}:", file=sys.stderr)
+        for name in regressions:
+            print(f"  - {name}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _machine() -> str:
+    return f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
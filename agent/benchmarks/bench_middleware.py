@@ -0,0 +1,144 @@
+"""
+Requests-per-second benchmark for the HTTP middleware stack
+
+Compares the previous ``BaseHTTPMiddleware`` pair (logging + error handling)
+against the merged pure ASGI ``LoggingMiddleware`` on ``/health`` and
+``/ai/create-ticket``. The app is driven in-process through httpx's ASGI
+transport against the in-memory DB stand-in, so the numbers isolate framework
+and middleware overhead from network and database time.
+
+Usage (from the ``agent`` directory)::
+
+    python -m benchmarks.bench_middleware --requests 3000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from uuid import uuid4
+
+import httpx
+from fastapi import Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from benchmarks import stub_db
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """The logging middleware as it was before the pure ASGI rewrite"""
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid4())
+        request.state.request_id = request_id
+        start_time = time.time()
+        logging.getLogger("app.middleware.logging_middleware").info(
+            f"[{request_id}] {request.method} {request.url.path} - Request started")
+        try:
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            response.headers["X-Request-ID"] = request_id
+            response.headers["X-Process-Time"] = str(process_time)
+            return response
+        except Exception:
+            return JSONResponse(status_code=500, content={"success": False, "request_id": request_id})
+
+
+class LegacyErrorHandlingMiddleware(BaseHTTPMiddleware):
+    """The error handling middleware as it was before the pure ASGI rewrite"""
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            request_id = getattr(request.state, "request_id", "unknown")
+            return JSONResponse(status_code=500, content={"success": False, "request_id": request_id})
+
+
+def _cors() -> Middleware:
+    return Middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                      allow_methods=["*"], allow_headers=["*"])
+
+
+def build_app(variant: str):
+    """Return the app with either the legacy or the current middleware stack"""
+    from app.main import app
+
+    if variant == "legacy":
+        app.user_middleware = [
+            _cors(),
+            Middleware(LegacyLoggingMiddleware),
+            Middleware(LegacyErrorHandlingMiddleware),
+        ]
+    else:
+        from app.middleware.logging_middleware import LoggingMiddleware
+        app.user_middleware = [_cors(), Middleware(LoggingMiddleware)]
+
+    app.middleware_stack = app.build_middleware_stack()
+    return app
+
+
+async def run_endpoint(app, method: str, url: str, requests: int, concurrency: int) -> float:
+    """Fire ``requests`` calls with ``concurrency`` workers and return requests per second"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up routing, validation and lazily built objects
+        for _ in range(50):
+            await client.request(method, url)
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.request(method, url)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    # Request logging is identical in both stacks; keep it off the terminal
+    logging.disable(logging.INFO)
+    stub_db.install()
+
+    endpoints = {
+        "/health": ("GET", "/health"),
+        "/ai/create-ticket": (
+            "POST",
+            "/ai/create-ticket?question=Do%20you%20do%20balayage%3F&customer_phone=%2B15551234567",
+        ),
+    }
+
+    from app.main import app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        for variant in ("legacy", "asgi"):
+            build_app(variant)
+            results[variant] = {
+                name: round(await run_endpoint(app, method, url, args.requests, args.concurrency), 1)
+                for name, (method, url) in endpoints.items()
+            }
+
+    for name in endpoints:
+        before, after = results["legacy"][name], results["asgi"][name]
+        results.setdefault("speedup", {})[name] = round(after / before, 2)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
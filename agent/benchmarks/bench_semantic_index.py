@@ -0,0 +1,177 @@
+"""
+Build time, query latency, recall and memory sharing of the semantic index
+
+Generates ``--entries`` synthetic questions from a fixed seed, embeds them
+with ``HashingEmbedder`` and builds a ``SemanticIndex`` in a temporary
+directory. It then measures:
+
+- ``query`` latency for pre-embedded questions, and with the embedding;
+- an exact scan over every row, for comparison;
+- recall@k of the inverted lists against that exact scan, per nprobe;
+- appending and committing entries in batches, as the indexer does;
+- the private memory of reader processes that map the index, against the
+  size of the vectors file, to show the pages are shared.
+
+Usage (from the ``agent`` directory)::
+
+    python -m benchmarks.bench_semantic_index
+    python -m benchmarks.bench_semantic_index --entries 100000 --readers 4 --output semantic.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List
+
+import numpy as np
+import psutil
+
+from app.semantic import HashingEmbedder, SemanticIndex
+
+SUBJECTS = ["haircut", "hair coloring", "highlights", "balayage", "blowout", "manicure", "pedicure", "facial",
+            "eyebrow shaping", "keratin treatment", "perm", "extensions", "waxing", "updo", "beard trim", "toner"]
+TEMPLATES = ["How much is a {s}?", "Do you offer {s} on weekends?", "How long does a {s} take?",
+             "Can I book a {s} for tomorrow?", "What is the cancellation policy for a {s}?",
+             "Is there parking when I come for a {s}?", "Do I need a deposit for a {s}?",
+             "What products do you use for a {s}?", "Can children get a {s}?", "Do you take walk-ins for a {s}?",
+             "What are your hours for a {s} on Sunday?", "Where is the salon for a {s} appointment?"]
+PROBES = ["when do you close", "what does a trim cost", "where do I park", "can I get my nails done saturday",
+          "refund if I cancel", "how long is a keratin", "balyage price", "do you do beards"]
+
+
+def _question(rng: random.Random, i: int) -> str:
+    return rng.choice(TEMPLATES).format(s=rng.choice(SUBJECTS)) + f" (variant {i})"
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 4)
+
+
+def _timed(calls) -> Dict[str, float]:
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {"p50_ms": _percentile(latencies, 0.5), "p99_ms": _percentile(latencies, 0.99)}
+
+
+def _reader(path: str, queries: np.ndarray, results) -> None:
+    """Reader process: map the index, query it, report private and shared memory"""
+    before = psutil.Process().memory_full_info()
+    index = SemanticIndex(path)
+    index.refresh()
+    for vector in queries:
+        index.query(vector, 10)
+    after = psutil.Process().memory_full_info()
+    results.put({"uss_growth_mb": round((after.uss - before.uss) / 2 ** 20, 1),
+                 "rss_growth_mb": round((after.rss - before.rss) / 2 ** 20, 1)})
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(50)
+    embedder = HashingEmbedder(args.dim)
+    questions = [_question(rng, i) for i in range(args.entries)]
+    ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(args.entries)]
+    report: Dict[str, Any] = {"entries": args.entries, "dim": args.dim}
+
+    start = time.perf_counter()
+    vectors = embedder.embed(questions)
+    report["embed_seconds"] = round(time.perf_counter() - start, 2)
+
+    path = tempfile.mkdtemp(prefix="bench-semantic-")
+    try:
+        start = time.perf_counter()
+        writer = SemanticIndex.build(path, embedder.name, ids, vectors, version=0)
+        report["build_seconds"] = round(time.perf_counter() - start, 2)
+        report["lists"] = len(writer._arrays["centroids"])
+        report["vectors_file_mb"] = round(os.path.getsize(os.path.join(path, "1.vectors.npy")) / 2 ** 20, 1)
+
+        reader = SemanticIndex(path)
+        reader.refresh()
+        probe_vectors = embedder.embed(PROBES)
+        query_vectors = embedder.embed([_question(rng, i) for i in range(args.queries)])
+        mapped = reader._arrays["vectors"][:args.entries]
+
+        def exact(vector: np.ndarray, k: int) -> np.ndarray:
+            scores = mapped @ vector
+            return np.argpartition(-scores, k - 1)[:k]
+
+        report["query"] = _timed(lambda v=v: reader.query(v, args.k) for v in query_vectors)
+        report["embed_and_query"] = _timed(
+            lambda q=q: reader.query(embedder.embed([q])[0], args.k) for q in PROBES * (args.queries // len(PROBES)))
+        report["exact_scan"] = _timed(lambda v=v: exact(v, args.k) for v in query_vectors[:100])
+
+        ids_array = reader._arrays["ids"]
+        truth = [{ids_array[row] for row in exact(v, args.k)} for v in query_vectors[:200]]
+        recall = {}
+        for nprobe in (1, 2, 4, 8, 16):
+            found = [{knowledge_id.encode() for knowledge_id, _ in reader.query(v, args.k, nprobe)}
+                     for v in query_vectors[:200]]
+            recall[nprobe] = round(float(np.mean([len(f & t) / args.k for f, t in zip(found, truth)])), 3)
+        report["recall_at_k"] = recall
+
+        report["paraphrases"] = {probe: questions[ids.index(reader.query(vector, 1)[0][0])]
+                                 for probe, vector in zip(PROBES, probe_vectors)}
+
+        # The writer maps IDs to rows once, when it first replaces an entry
+        len(writer.rows)
+        batches = [[(str(uuid.uuid4()), _question(rng, i)) for i in range(args.batch)] for _ in range(10)]
+
+        def append(batch) -> None:
+            writer.upsert([knowledge_id for knowledge_id, _ in batch], embedder.embed([q for _, q in batch]))
+            writer.commit(writer.state["version"] + 1)
+
+        report["append_batch"] = dict(_timed(lambda b=b: append(b) for b in batches), size=args.batch)
+        reader.refresh()
+        report["count_after_appends"] = reader.state["count"]
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [context.Process(target=_reader, args=(path, query_vectors[:200], results))
+                     for _ in range(args.readers)]
+        for process in processes:
+            process.start()
+        report["readers"] = [results.get(timeout=120) for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=100000, help="indexed questions")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimensions")
+    parser.add_argument("--queries", type=int, default=1000, help="timed queries")
+    parser.add_argument("--k", type=int, default=10, help="results per query")
+    parser.add_argument("--batch", type=int, default=100, help="entries per appended batch")
+    parser.add_argument("--readers", type=int, default=2, help="reader processes mapping the index")
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{report['entries']} entries: embed {report['embed_seconds']}s, build {report['build_seconds']}s, "
+          f"query p50 {report['query']['p50_ms']} ms p99 {report['query']['p99_ms']} ms, "
+          f"exact p50 {report['exact_scan']['p50_ms']} ms, recall@{args.k} {report['recall_at_k']}",
+          file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
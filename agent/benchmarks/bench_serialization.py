@@ -0,0 +1,113 @@
+"""
+Serialization benchmark for the supervisor list endpoints at 500 rows
+
+Compares the previous path, where the service builds one Pydantic model per
+row and FastAPI re-validates and re-encodes them through ``response_model``,
+with the ``ListSerializer`` fast path. It reports both the serialization step
+alone and full in-process requests against the in-memory DB stand-in.
+
+Usage (from the ``agent`` directory)::
+
+    python -m benchmarks.bench_serialization --rows 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import timeit
+from typing import List
+
+import httpx
+from pydantic import TypeAdapter
+
+from benchmarks import stub_db
+
+
+def bench_call(func, number: int) -> float:
+    """Best-of-five mean time per call in milliseconds"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1000
+
+
+async def bench_requests(app, url: str, requests: int) -> float:
+    """Mean time per in-process request in milliseconds"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(10):
+            (await client.get(url)).raise_for_status()
+        start = time.perf_counter()
+        for _ in range(requests):
+            (await client.get(url)).raise_for_status()
+        return (time.perf_counter() - start) / requests * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    client = stub_db.install()
+    stub_db.seed_pending_requests(client, args.rows)
+    stub_db.seed_knowledge_base(client, args.rows)
+
+    from app.main import app
+    from app.models.schemas import KnowledgeBaseResponse, SupervisorDashboardResponse
+    from app.models.serialization import ListSerializer
+    from app.services.supervisor_service import SupervisorService
+
+    service = SupervisorService()
+
+    # Register the previous response_model endpoints next to the fast ones
+    @app.get("/bench/legacy/dashboard", response_model=List[SupervisorDashboardResponse])
+    async def legacy_dashboard():
+        return await service.get_dashboard_data()
+
+    @app.get("/bench/legacy/knowledge-base", response_model=List[KnowledgeBaseResponse])
+    async def legacy_knowledge_base(limit: int = 500):
+        return await service.get_knowledge_base(limit=limit)
+
+    results = {"rows": args.rows, "serialize_ms": {}, "request_ms": {}}
+
+    for name, model, rows in (
+        ("dashboard", SupervisorDashboardResponse, client.tables["supervisor_dashboard"]),
+        ("knowledge_base", KnowledgeBaseResponse, client.tables["knowledge_base"][:args.rows]),
+    ):
+        serializer = ListSerializer(model)
+
+        response_adapter = TypeAdapter(List[model])
+
+        def legacy():
+            # Service builds one model per row, then FastAPI validates the list
+            # against response_model and encodes it (fastapi.routing.serialize_response)
+            models = [model(**row) for row in rows]
+            return response_adapter.dump_json(response_adapter.validate_python(models))
+
+        def fast():
+            return serializer.dump_json(rows)
+
+        assert json.loads(legacy()) == json.loads(fast())
+        before, after = bench_call(legacy, 20), bench_call(fast, 20)
+        results["serialize_ms"][name] = {
+            "before": round(before, 3), "after": round(after, 3), "speedup": round(before / after, 2)
+        }
+
+    async with app.router.lifespan_context(app):
+        for name, legacy_url, fast_url in (
+            ("/supervisor/dashboard", "/bench/legacy/dashboard", "/supervisor/dashboard"),
+            ("/supervisor/knowledge-base", "/bench/legacy/knowledge-base?limit=500",
+             "/supervisor/knowledge-base?limit=500"),
+        ):
+            before = await bench_requests(app, legacy_url, args.requests)
+            after = await bench_requests(app, fast_url, args.requests)
+            results["request_ms"][name] = {
+                "before": round(before, 3), "after": round(after, 3), "speedup": round(before / after, 2)
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+"""
+Throughput of the multi-worker server as the worker count grows
+
+For each worker count the script starts ``app.serve``'s supervisor on a local
+port, with every worker on its own copy of the in-memory DB stand-in. It then
+drives a CPU-bound endpoint from several load processes over keep-alive
+connections. It reports requests per second, latency percentiles and the
+speedup over one worker. Load generation shares the machine's cores with the
+server, so the speedup flattens before the worker count reaches the core
+count.
+
+Usage (from the ``agent`` directory)::
+
+    python -m benchmarks.bench_worker_scaling
+    python -m benchmarks.bench_worker_scaling --workers 1,2,4,8 --seconds 10 --output scaling.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+import psutil
+
+from benchmarks import stub_db
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(port: int, workers: int, kb_entries: int) -> None:
+    """Server process: seed the stand-in, then fork the workers from it"""
+    logging.disable(logging.CRITICAL)
+    os.environ["LEADER_LOCK_FILE"] = os.path.join(tempfile.gettempdir(), f"bench-scaling-{port}.leader")
+    db = stub_db.install()
+    stub_db.seed_knowledge_base(db, kb_entries)
+
+    from app.serve import WorkerSupervisor, bind_socket
+
+    supervisor = WorkerSupervisor(bind_socket("127.0.0.1", port), workers=workers, grace_seconds=5,
+                                  log_level="critical")
+    sys.exit(supervisor.run())
+
+
+async def _load(url: str, connections: int, seconds: float) -> List[float]:
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        deadline = time.monotonic() + seconds
+
+        async def worker() -> None:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                response = await client.get(url)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(connections)))
+    return latencies
+
+
+def _load_process(url: str, connections: int, seconds: float) -> List[float]:
+    return asyncio.run(_load(url, connections, seconds))
+
+
+def _wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 3)
+
+
+def measure(workers: int, args: argparse.Namespace) -> Dict[str, float]:
+    port = _free_port()
+    context = multiprocessing.get_context("fork")
+    server = context.Process(target=_serve, args=(port, workers, args.kb_entries))
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        # Every worker reports ready on its own; give the rest time to finish startup
+        time.sleep(1.0 + 0.2 * workers)
+        url = base_url + args.path
+        with context.Pool(args.clients) as pool:
+            pool.starmap(_load_process, [(url, args.connections, args.warmup)] * args.clients)
+            results = pool.starmap(_load_process, [(url, args.connections, args.seconds)] * args.clients)
+    finally:
+        os.kill(server.pid, signal.SIGTERM)
+        server.join(30)
+
+    latencies = sorted(latency for result in results for latency in result)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / args.seconds, 1),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p99_ms": _percentile(latencies, 0.99),
+    }
+
+
+def main() -> int:
+    cores = psutil.cpu_count() or 1
+    default_levels = sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", default=",".join(map(str, default_levels)),
+                        help="comma-separated worker counts to measure")
+    parser.add_argument("--path", default="/supervisor/knowledge-base", help="endpoint to load")
+    parser.add_argument("--kb-entries", type=int, default=200, help="seeded knowledge base size")
+    parser.add_argument("--clients", type=int, default=max(2, cores // 2), help="load generator processes")
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive connections per client")
+    parser.add_argument("--seconds", type=float, default=5.0, help="measurement time per worker count")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured load before each level")
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    results = []
+    for workers in (int(level) for level in args.workers.split(",")):
+        result = measure(workers, args)
+        result["speedup"] = round(result["throughput_rps"] / results[0]["throughput_rps"], 2) if results else 1.0
+        results.append(result)
+        print(f"{workers:>3} workers  {result['throughput_rps']:>8.1f} req/s  "
+              f"p50 {result['p50_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms  "
+              f"speedup {result['speedup']:.2f}x", file=sys.stderr)
+
+    report = {"cores": cores, "path": args.path, "clients": args.clients,
+              "connections": args.connections, "levels": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
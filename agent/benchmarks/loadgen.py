@@ -0,0 +1,246 @@
+"""
+Concurrent voice-call load generator for the backend
+
+Simulates N concurrent agent sessions, each behaving like the voice agent's
+``BackendClient``. A call fetches ``/ai/context`` when it starts, escalates
+questions through ``process_query`` at a Poisson rate and periodically saves
+its transcript. When a call ends, the session starts a new one. Every HTTP
+exchange is timed at the transport layer, so fallbacks inside
+``BackendClient`` still count as errors.
+
+By default the app runs in-process against the in-memory DB stand-in, with
+optional simulated DB latency. Pass ``--base-url`` to load a running server
+instead. Results are printed, and optionally written, as JSON tagged with
+the git commit so runs can be compared.
+
+Usage (from the ``agent`` directory)::
+
+    python -m benchmarks.loadgen --sessions 50 --duration 30 --db-latency 0.005
+    python -m benchmarks.loadgen --base-url http://localhost:8001 --sessions 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+import httpx
+
+from backend_client import BackendClient
+from benchmarks import stub_db
+
+# Request paths are grouped by route template so per-session ids don't split stats
+ROUTE_PATTERNS = [
+    (re.compile(r"^/ai/sessions/[^/]+/transcript$"), "/ai/sessions/{call_session_id}/transcript"),
+]
+
+QUESTIONS = [
+    "Do you offer keratin treatments for curly hair?",
+    "Can I bring my own hair dye to the appointment?",
+    "Is there a discount for students on weekdays?",
+    "Do you have a stylist who speaks Spanish?",
+    "Can I book a bridal party of eight people this Saturday?",
+]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "error_rate": round(self.errors / len(ordered), 4) if ordered else 0.0,
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": _percentile(ordered, 0.50),
+            "p95_ms": _percentile(ordered, 0.95),
+            "p99_ms": _percentile(ordered, 0.99),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 3)
+
+
+class MeasuringTransport(httpx.AsyncBaseTransport):
+    """Times every request per route and counts transport errors and 5xx responses"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+        self.stats: Dict[str, EndpointStats] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        route = f"{request.method} {_route_of(request.url.path)}"
+        stats = self.stats.get(route)
+        if stats is None:
+            stats = self.stats[route] = EndpointStats()
+
+        start = time.perf_counter()
+        try:
+            response = await self.inner.handle_async_request(request)
+            await response.aread()
+        except Exception:
+            stats.latencies.append(time.perf_counter() - start)
+            stats.errors += 1
+            raise
+
+        stats.latencies.append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            stats.errors += 1
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _route_of(path: str) -> str:
+    for pattern, template in ROUTE_PATTERNS:
+        if pattern.match(path):
+            return template
+    return path
+
+
+async def run_session(client: BackendClient,
+                      args: argparse.Namespace,
+                      deadline: float,
+                      tenants: List[Optional[str]]) -> int:
+    """Run back-to-back simulated calls until the deadline, returning calls completed"""
+    calls = 0
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        call_session_id = uuid4()
+        customer_phone = f"+1555{rng.randrange(10 ** 7):07d}"
+        call_end = min(deadline, time.monotonic() + rng.expovariate(1 / args.call_seconds))
+        transcript: List[str] = []
+        tenant = rng.choice(tenants)
+
+        await client.get_salon_context(tenant)
+
+        next_escalation = time.monotonic() + rng.expovariate(args.escalations_per_minute / 60)
+        next_transcript = time.monotonic() + args.transcript_interval
+
+        while True:
+            now = time.monotonic()
+            wake = min(next_escalation, next_transcript, call_end)
+            if wake > now:
+                await asyncio.sleep(wake - now)
+            now = time.monotonic()
+            if now >= call_end:
+                break
+
+            if now >= next_escalation:
+                question = rng.choice(QUESTIONS)
+                transcript.append(f"Customer: {question}")
+                transcript.append("AI: Let me check with my supervisor and get back to you shortly.")
+                await client.process_query(
+                    question=question,
+                    customer_phone=customer_phone,
+                    call_session_id=call_session_id,
+                    context="\n".join(transcript[-6:]),
+                    tenant=tenant
+                )
+                next_escalation = now + rng.expovariate(args.escalations_per_minute / 60)
+
+            if now >= next_transcript:
+                transcript.append("Customer: ... AI: ...")
+                await client.save_transcript(call_session_id, customer_phone, "\n".join(transcript))
+                next_transcript = now + args.transcript_interval
+
+        calls += 1
+    return calls
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent agent sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="test length in seconds")
+    parser.add_argument("--call-seconds", type=float, default=20.0, help="mean simulated call length")
+    parser.add_argument("--escalations-per-minute", type=float, default=3.0, help="per session")
+    parser.add_argument("--transcript-interval", type=float, default=5.0, help="seconds between writes")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="simulated DB call latency (s)")
+    parser.add_argument("--kb-entries", type=int, default=200, help="seeded knowledge base size")
+    parser.add_argument("--tenants", type=int, default=0,
+                        help="extra tenants (tenant-0..N-1) calls are spread over, besides the default")
+    parser.add_argument("--base-url", default=None, help="load a running server instead")
+    parser.add_argument("--output", default=None, help="also write the JSON report here")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    async with AsyncExitStack() as stack:
+        tenants: List[Optional[str]] = [None] + [f"tenant-{i}" for i in range(args.tenants)]
+        if args.base_url:
+            base_url = args.base_url
+            transport = MeasuringTransport(httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=args.sessions)))
+        else:
+            db = stub_db.install(latency=args.db_latency)
+            stub_db.seed_tenants(db, args.tenants)
+            stub_db.seed_knowledge_base(db, args.kb_entries)
+            from app.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            base_url = "http://loadgen"
+            transport = MeasuringTransport(httpx.ASGITransport(app=app))
+
+        clients = [BackendClient(base_url=base_url, transport=transport) for _ in range(args.sessions)]
+
+        start = time.monotonic()
+        deadline = start + args.duration
+        completed = await asyncio.gather(*(run_session(c, args, deadline, tenants) for c in clients))
+        elapsed = time.monotonic() - start
+
+        for client in clients:
+            await client.aclose()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.base_url or "in-process",
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "elapsed_seconds": round(elapsed, 3),
+        "calls_completed": sum(completed),
+        "endpoints": {route: stats.summary(elapsed) for route, stats in sorted(transport.stats.items())},
+    }
+    total_requests = sum(e["requests"] for e in report["endpoints"].values())
+    total_errors = sum(e["errors"] for e in report["endpoints"].values())
+    report["total"] = {
+        "requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2),
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
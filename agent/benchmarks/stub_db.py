@@ -0,0 +1,443 @@
+"""
+In-memory stand-in for the Supabase client used by benchmarks
+
+Implements the subset of the postgrest query builder the repositories use, so
+the FastAPI app can be driven end to end without a database. An optional
+per-call latency simulates the network round trip to Supabase. Row triggers
+the app relies on are emulated in ``StubSupabaseClient.triggers``. Queries
+run on the repositories' executor threads, so each one applies under a lock
+after its simulated latency.
+"""
+
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from app.knowledge_feed import usage_rank
+
+# Column defaults applied on insert, mirroring migrations/001_initial_schema.sql, 004_tenants.sql and 005_request_followup_queue.sql
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "help_requests": {"status": "pending", "priority": "normal", "tenant_id": None, "call_session_id": None},
+    "knowledge_base": {"source": "supervisor", "confidence_score": 1.0, "usage_count": 0},
+    "call_sessions": {"status": "active"},
+    "request_followups": {"status": "pending", "attempts": 0, "locked_until": None, "last_error": None,
+                          "sent_at": None},
+    "tenants": {"description": None, "profile": [], "instructions": None, "active": True},
+}
+
+# Generated columns, recomputed on every write as Postgres does; mirrors migrations/010_knowledge_base_usage_rank.sql
+GENERATED_COLUMNS: Dict[str, Dict[str, Callable[[Dict[str, Any]], Any]]] = {
+    "knowledge_base": {"usage_rank": lambda row: usage_rank(row.get("usage_count"))},
+}
+
+# Mirrors the default tenant seeded by migrations/004_tenants.sql
+DEFAULT_TENANT_PROFILE = [
+    {"label": "Hours", "value": "Monday-Friday 9 AM to 7 PM, Saturday 9 AM to 5 PM, Closed Sundays"},
+    {"label": "Services", "value": "Haircuts, Hair Coloring, Highlights, Blowouts, Hair Styling, Manicures, "
+                                   "Pedicures, Facials, Eyebrow Services"},
+    {"label": "Pricing", "value": "Basic haircuts start at $45, Cut and style packages start at $65"},
+    {"label": "Location", "value": "123 Main Street, Downtown"},
+    {"label": "Phone", "value": "(555) 123-4567"},
+]
+
+
+class StubQuery:
+    def __init__(self, client: "StubSupabaseClient", table: str):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload: Any = None
+        self._filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self._order: List[tuple] = []
+        self._start = 0
+        self._stop: Optional[int] = None
+
+    # Operations
+    def select(self, *columns: str, count: Optional[str] = None, head: Optional[bool] = None):
+        self._op = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, data: Any, **kwargs):
+        self._op = "insert"
+        self._payload = data
+        return self
+
+    def upsert(self, data: Any, **kwargs):
+        self._op = "upsert"
+        self._payload = data
+        return self
+
+    def update(self, data: Dict[str, Any], **kwargs):
+        self._op = "update"
+        self._payload = data
+        return self
+
+    def delete(self, **kwargs):
+        self._op = "delete"
+        return self
+
+    # Filters
+    def eq(self, field: str, value: Any):
+        self._filters.append(lambda row: str(row.get(field)) == str(value))
+        return self
+
+    def neq(self, field: str, value: Any):
+        self._filters.append(lambda row: str(row.get(field)) != str(value))
+        return self
+
+    def gt(self, field: str, value: Any):
+        self._filters.append(lambda row: row.get(field) is not None and row[field] > value)
+        return self
+
+    def gte(self, field: str, value: Any):
+        self._filters.append(lambda row: row.get(field) is not None and row[field] >= value)
+        return self
+
+    def lt(self, field: str, value: Any):
+        self._filters.append(lambda row: row.get(field) is not None and row[field] < value)
+        return self
+
+    def lte(self, field: str, value: Any):
+        self._filters.append(lambda row: row.get(field) is not None and row[field] <= value)
+        return self
+
+    def in_(self, field: str, values: List[Any]):
+        allowed = {str(v) for v in values}
+        self._filters.append(lambda row: str(row.get(field)) in allowed)
+        return self
+
+    def is_(self, field: str, value: Any):
+        self._filters.append(lambda row: row.get(field) is None)
+        return self
+
+    def ilike(self, field: str, pattern: str):
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*") + "$", re.IGNORECASE | re.DOTALL)
+        self._filters.append(lambda row: bool(regex.match(row.get(field) or "")))
+        return self
+
+    # Shaping
+    def order(self, field: str, desc: bool = False, **kwargs):
+        self._order.append((field, desc))
+        return self
+
+    def range(self, start: int, end: int):
+        self._start, self._stop = start, end + 1
+        return self
+
+    def limit(self, size: int):
+        self._stop = self._start + size
+        return self
+
+    def execute(self):
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        with self._client.lock:
+            self._client.calls += 1
+            return self._apply()
+
+    def _apply(self):
+        rows = self._client.tables.setdefault(self._table, [])
+
+        if self._op == "insert":
+            items = self._payload if isinstance(self._payload, list) else [self._payload]
+            created = [self._client.new_row(self._table, item) for item in items]
+            rows.extend(created)
+            for row in created:
+                self._client.fire(self._table, "INSERT", None, row)
+            return SimpleNamespace(data=[dict(row) for row in created], count=None)
+
+        if self._op == "upsert":
+            items = self._payload if isinstance(self._payload, list) else [self._payload]
+            by_id = {row["id"]: row for row in rows}
+            stored = []
+            for item in items:
+                row = by_id.get(item.get("id"))
+                if row is None:
+                    row = self._client.new_row(self._table, item)
+                    rows.append(row)
+                    self._client.fire(self._table, "INSERT", None, row)
+                else:
+                    old = dict(row)
+                    row.update(item)
+                    self._client.generate(self._table, row)
+                    self._client.fire(self._table, "UPDATE", old, row)
+                stored.append(dict(row))
+            return SimpleNamespace(data=stored, count=None)
+
+        matched = [row for row in rows if all(f(row) for f in self._filters)]
+
+        if self._op == "update":
+            for row in matched:
+                old = dict(row)
+                row.update(self._payload)
+                row["updated_at"] = datetime.utcnow().isoformat()
+                self._client.generate(self._table, row)
+                self._client.fire(self._table, "UPDATE", old, row)
+            return SimpleNamespace(data=[dict(row) for row in matched], count=None)
+
+        if self._op == "delete":
+            for row in matched:
+                rows.remove(row)
+                self._client.fire(self._table, "DELETE", row, None)
+            return SimpleNamespace(data=matched, count=None)
+
+        for field, desc in reversed(self._order):
+            matched.sort(key=lambda row: (row.get(field) is None, row.get(field)), reverse=desc)
+
+        total = len(matched)
+        matched = matched[self._start:self._stop]
+        if self._columns.strip() != "*":
+            fields = [c.strip() for c in self._columns.split(",")]
+            matched = [{f: row.get(f) for f in fields} for row in matched]
+        else:
+            matched = [dict(row) for row in matched]
+
+        return SimpleNamespace(data=matched, count=total if self._count else None)
+
+
+class StubRpc:
+    def __init__(self, client: "StubSupabaseClient", name: str, params: Dict[str, Any]):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        with self._client.lock:
+            self._client.calls += 1
+            handler = self._client.functions.get(self._name)
+            data = handler(self._client, **self._params) if handler else None
+        return SimpleNamespace(data=data, count=None)
+
+
+def _bump_knowledge_base_version(client: "StubSupabaseClient") -> int:
+    row = client.tables["knowledge_base_version"][0]
+    row["version"] += 1
+    return row["version"]
+
+
+# Columns whose changes migrations/007_knowledge_base_changes.sql and 010_knowledge_base_usage_rank.sql record
+_KNOWLEDGE_CONTENT_COLUMNS = ("question", "answer", "category", "confidence_score", "tenant_id", "usage_rank")
+
+
+def _record_knowledge_base_change(client: "StubSupabaseClient", op: str,
+                                  old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    if op == "UPDATE" and all(old.get(c) == new.get(c) for c in _KNOWLEDGE_CONTENT_COLUMNS):
+        return
+    changes = client.tables.setdefault("knowledge_base_changes", [])
+    if op == "UPDATE" and old.get("tenant_id") != new.get("tenant_id"):
+        changes.append(_change_row(changes, old, "DELETE"))
+    changes.append(_change_row(changes, old if op == "DELETE" else new, op))
+
+
+def _change_row(changes: List[Dict[str, Any]], row: Dict[str, Any], op: str) -> Dict[str, Any]:
+    return {
+        "version": changes[-1]["version"] + 1 if changes else 1,
+        "knowledge_id": row["id"],
+        "tenant_id": row.get("tenant_id"),
+        "op": op,
+        "changed_at": datetime.utcnow().isoformat(),
+    }
+
+
+def _prune_knowledge_base_changes(client: "StubSupabaseClient", retain_seconds: int) -> int:
+    cutoff = (datetime.utcnow() - timedelta(seconds=retain_seconds)).isoformat()
+    changes = client.tables.setdefault("knowledge_base_changes", [])
+    pruned = [row["version"] for row in changes if row["changed_at"] < cutoff]
+    changes[:] = [row for row in changes if row["changed_at"] >= cutoff]
+    state = client.tables["knowledge_base_version"][0]
+    state["changes_pruned_through"] = max([state["changes_pruned_through"]] + pruned)
+    return state["changes_pruned_through"]
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are at be can do does for how i in is it my of on or the to what when where "
+                       "which who why with you your".split())
+
+
+def _terms(text: str) -> List[str]:
+    # Crude stand-in for the english text search configuration: stopwords out, plural s off
+    return [word.rstrip("s") or word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_similarity(query: str, text: str) -> float:
+    """Approximates pg_trgm's word_similarity: best trigram overlap of the query with a run of words"""
+    wanted = set().union(*(_trigrams(w) for w in _WORD.findall(query.lower()))) if query.strip() else set()
+    words = _WORD.findall(text.lower())
+    if not wanted or not words:
+        return 0.0
+    size = max(1, len(_WORD.findall(query.lower())))
+    best = 0.0
+    for start in range(max(1, len(words) - size + 1)):
+        window = set().union(*(_trigrams(w) for w in words[start:start + size]))
+        best = max(best, len(wanted & window) / len(wanted))
+    return best
+
+
+def _search_knowledge_base(client: "StubSupabaseClient", search_query: str, tenant: Optional[str] = None,
+                           match_limit: int = 10) -> List[Dict[str, Any]]:
+    """Mirrors search_knowledge_base from migration 008: every term must match, then trigram fallback"""
+    rows = [row for row in client.tables.setdefault("knowledge_base", [])
+            if tenant is None or str(row.get("tenant_id")) == str(tenant)]
+    terms = _terms(search_query)
+    scored = []
+    if terms:
+        for row in rows:
+            question, answer = _terms(row["question"]), _terms(row["answer"])
+            if all(term in question or term in answer for term in terms):
+                rank = sum(1.0 * question.count(term) + 0.4 * answer.count(term) for term in terms) / len(terms)
+                scored.append((rank / (rank + 1), row, "fulltext"))
+    if not scored:
+        for row in rows:
+            similarity = _word_similarity(search_query, row["question"])
+            if similarity >= 0.5:
+                scored.append((similarity, row, "trigram"))
+    scored.sort(key=lambda item: (-item[0], -(item[1].get("usage_count") or 0), item[1]["id"]))
+    columns = ("id", "question", "answer", "category", "confidence_score", "usage_count", "tenant_id")
+    return [dict({c: row.get(c) for c in columns}, score=round(score, 6), match=match)
+            for score, row, match in scored[:match_limit]]
+
+
+def _claim_request_followups(client: "StubSupabaseClient", batch_size: int, lease_seconds: int) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    due = sorted(
+        (row for row in client.tables.setdefault("request_followups", [])
+         if row["status"] == "pending" and row["next_attempt_at"] <= now.isoformat()
+         and (row["locked_until"] is None or row["locked_until"] < now.isoformat())),
+        key=lambda row: row["next_attempt_at"]
+    )[:batch_size]
+    for row in due:
+        row["locked_until"] = (now + timedelta(seconds=lease_seconds)).isoformat()
+        row["attempts"] += 1
+    return [dict(row) for row in due]
+
+
+class StubSupabaseClient:
+    """Minimal synchronous stand-in for ``supabase.Client``"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.RLock()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            "knowledge_base_version": [{"id": 1, "version": 0, "changes_pruned_through": 0}],
+        }
+        self.functions: Dict[str, Callable[..., Any]] = {
+            "bump_knowledge_base_version": _bump_knowledge_base_version,
+            "claim_request_followups": _claim_request_followups,
+            "prune_knowledge_base_changes": _prune_knowledge_base_changes,
+            "search_knowledge_base": _search_knowledge_base,
+        }
+        self.triggers: Dict[str, Callable[..., None]] = {
+            "knowledge_base": _record_knowledge_base_change,
+        }
+
+    def table(self, name: str) -> StubQuery:
+        return StubQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> StubRpc:
+        return StubRpc(self, name, params or {})
+
+    def fire(self, table: str, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Run the AFTER ROW trigger of ``table``, if any"""
+        trigger = self.triggers.get(table)
+        if trigger is not None:
+            trigger(self, op, old, new)
+
+    def new_row(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow().isoformat()
+        row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now}
+        row.update(TABLE_DEFAULTS.get(table, {}))
+        row.update(data)
+        self.generate(table, row)
+        return row
+
+    def generate(self, table: str, row: Dict[str, Any]) -> None:
+        """Fill in the generated columns of ``row``"""
+        for column, expression in GENERATED_COLUMNS.get(table, {}).items():
+            row[column] = expression(row)
+
+
+def install(latency: float = 0.0) -> StubSupabaseClient:
+    """Point every repository at a fresh in-memory client"""
+    from app.repositories.base_repository import BaseRepository
+
+    client = StubSupabaseClient(latency=latency)
+    client.tables["tenants"] = [client.new_row("tenants", {
+        "slug": "default",
+        "name": "Bella's Hair & Beauty Salon",
+        "description": "a premium salon in downtown",
+        "profile": DEFAULT_TENANT_PROFILE,
+    })]
+    BaseRepository._client = client
+    return client
+
+
+def default_tenant_id(client: StubSupabaseClient) -> str:
+    return client.tables["tenants"][0]["id"]
+
+
+def seed_tenants(client: StubSupabaseClient, count: int) -> List[str]:
+    """Add ``count`` synthetic tenants besides the default one and return their slugs"""
+    slugs = []
+    for i in range(count):
+        slug = f"tenant-{i}"
+        client.tables["tenants"].append(client.new_row("tenants", {
+            "slug": slug,
+            "name": f"Location {i}",
+            "profile": [dict(fact, value=f"{fact['value']} (location {i})") for fact in DEFAULT_TENANT_PROFILE],
+        }))
+        slugs.append(slug)
+    return slugs
+
+
+def seed_knowledge_base(client: StubSupabaseClient, entries: int) -> None:
+    """Fill the knowledge base with synthetic entries, spread over every tenant"""
+    categories = ["hours", "pricing", "services", "appointments", "policies", "location"]
+    tenant_ids = [tenant["id"] for tenant in client.tables["tenants"]]
+    for i in range(entries):
+        client.tables.setdefault("knowledge_base", []).append(client.new_row("knowledge_base", {
+            "tenant_id": tenant_ids[i % len(tenant_ids)],
+            "question": f"Question {i} about {categories[i % len(categories)]} at the salon?",
+            "answer": f"Answer {i}: please call the front desk for details about this topic.",
+            "category": categories[i % len(categories)],
+            "source": "manual",
+            "usage_count": i % 97,
+        }))
+
+
+def seed_pending_requests(client: StubSupabaseClient, requests: int) -> None:
+    """Fill the supervisor dashboard view with synthetic pending requests"""
+    rows = client.tables.setdefault("supervisor_dashboard", [])
+    priorities = ["urgent", "high", "normal", "low"]
+    for i in range(requests):
+        row = client.new_row("help_requests", {
+            "question": f"Customer question number {i} that the AI could not answer?",
+            "context": f"User: question {i}\nAI: Let me check with my supervisor.",
+            "status": "pending",
+            "priority": priorities[i % len(priorities)],
+            "customer_phone": f"+1555{i:07d}",
+            "customer_name": f"Customer {i}",
+            "timeout_at": now_iso(),
+            "hours_waiting": (i % 48) / 4,
+            "tenant_id": default_tenant_id(client),
+        })
+        rows.append(row)
+
+
+def now_iso() -> str:
+    return datetime.utcnow().isoformat()
@@ -0,0 +1,137 @@
+"""
+Bounded, token-budgeted conversation memory for voice agent sessions
+
+Committed user and agent speech is kept verbatim while it fits in a token
+budget. Older turns are folded into a rolling extractive summary with its
+own budget, so one call holds a fixed amount of text however long it runs.
+The compact form is used both as escalation ticket context and to seed a
+rebuilt realtime session.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Tuple
+
+# Rough token estimate for English text; budgets only need to be proportional
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGET = 800
+DEFAULT_SUMMARY_TOKENS = 250
+# Longest summary line kept per folded turn
+SUMMARY_LINE_TOKENS = 30
+# Ticket context is capped below the backend's 5000 character field limit
+MAX_CONTEXT_CHARS = 4800
+
+USER = "user"
+ASSISTANT = "assistant"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    """First sentence of ``text``, cut to ``max_tokens`` on a word boundary"""
+    text = _SENTENCE_END.split(text, maxsplit=1)[0]
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+class Turn(NamedTuple):
+    role: str
+    text: str
+    tokens: int
+
+
+class ConversationMemory:
+    """
+    Recent turns within ``token_budget`` plus a rolling summary of older ones
+
+    Adding a turn is O(1) amortised. When the recent turns go over budget the
+    oldest is folded into the summary as one clipped line. When the summary
+    goes over its own budget its oldest lines are dropped and counted.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, summary_tokens: Optional[int] = None):
+        self.token_budget = token_budget or int(os.getenv("CONVERSATION_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+        self.summary_tokens = summary_tokens or int(os.getenv("CONVERSATION_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS))
+        self.turns: Deque[Turn] = deque()
+        self.summary: Deque[Tuple[str, int]] = deque()
+        self.omitted = 0
+        self.total_turns = 0
+        self._tokens = 0
+        self._summary_tokens = 0
+
+    def add(self, role: str, text: str) -> None:
+        """Record a committed utterance; empty and unintelligible ("...") ones are skipped"""
+        text = " ".join(text.split())
+        if not text or text == "...":
+            return
+
+        # A single monologue may not take more than half the budget
+        max_chars = self.token_budget // 2 * CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+        turn = Turn(role, text, estimate_tokens(text))
+        self.turns.append(turn)
+        self._tokens += turn.tokens
+        self.total_turns += 1
+
+        while self._tokens > self.token_budget and len(self.turns) > 1:
+            self._fold(self.turns.popleft())
+
+    def _fold(self, turn: Turn) -> None:
+        self._tokens -= turn.tokens
+        speaker = "Customer" if turn.role == USER else "AI"
+        line = f"{speaker}: {_clip(turn.text, SUMMARY_LINE_TOKENS)}"
+        tokens = estimate_tokens(line)
+        self.summary.append((line, tokens))
+        self._summary_tokens += tokens
+
+        while self._summary_tokens > self.summary_tokens and len(self.summary) > 1:
+            _, dropped = self.summary.popleft()
+            self._summary_tokens -= dropped
+            self.omitted += 1
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens currently held, recent turns and summary together"""
+        return self._tokens + self._summary_tokens
+
+    def summary_text(self) -> str:
+        if not self.summary:
+            return ""
+        lines = [line for line, _ in self.summary]
+        if self.omitted:
+            lines.insert(0, f"({self.omitted} earlier turns omitted)")
+        return "\n".join(lines)
+
+    def last(self, role: str) -> Optional[str]:
+        """Most recent verbatim utterance by ``role``"""
+        for turn in reversed(self.turns):
+            if turn.role == role:
+                return turn.text
+        return None
+
+    def context_text(self, max_chars: int = MAX_CONTEXT_CHARS) -> str:
+        """Summary and recent turns as plain text, e.g. for escalation tickets"""
+        recent = "\n".join(f"{'Customer' if t.role == USER else 'AI'}: {t.text}" for t in self.turns)
+        summary = self.summary_text()
+        text = f"Earlier in the call:\n{summary}\n\nRecent conversation:\n{recent}" if summary else recent
+        # Keep the newest part when a caller asks for less than the budget allows
+        return text if len(text) <= max_chars else "..." + text[-(max_chars - 3):]
+
+    def messages(self) -> List[Tuple[str, str]]:
+        """(role, text) pairs to seed a rebuilt session: a summary note, then recent turns"""
+        messages: List[Tuple[str, str]] = []
+        summary = self.summary_text()
+        if summary:
+            messages.append((USER, f"[Call notes] Summary of our conversation so far:\n{summary}"))
+        messages.extend((turn.role, turn.text) for turn in self.turns)
+        return messages
@@ -0,0 +1,106 @@
+"""
+Local copies of tenants' knowledge bases, kept current from the backend's change feed
+
+An agent worker loads a tenant's entries once from ``/ai/knowledge/snapshot``
+and afterwards applies only what ``/ai/knowledge/changes`` reports since the
+version it holds. A full snapshot is fetched again only when the backend has
+pruned changes the worker has not seen. The knowledge section of the prompt
+is rendered locally with the same code the backend uses for ``/ai/context``,
+and matches it as of the version the view holds.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from app.cache import SingleFlight
+from app.knowledge_feed import most_used, render_knowledge_section
+
+logger = logging.getLogger(__name__)
+
+# Change pages applied in one sync before serving what is loaded so far
+MAX_CHANGE_PAGES = 20
+
+
+class KnowledgeView:
+    """One tenant's entries by ID and the change version they are current to"""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._rendered: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def apply_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        self.entries = {entry["id"]: entry for entry in snapshot["entries"]}
+        self.version = snapshot["version"]
+        self._rendered = None
+
+    def apply_changes(self, changes: Dict[str, Any]) -> None:
+        for entry in changes["added"] + changes["updated"]:
+            self.entries[entry["id"]] = entry
+        for knowledge_id in changes["deleted"]:
+            self.entries.pop(knowledge_id, None)
+        if changes["added"] or changes["updated"] or changes["deleted"]:
+            self._rendered = None
+        self.version = changes["version"]
+
+    def render(self) -> str:
+        """The knowledge section as ``/ai/context`` renders it at this view's version, re-rendered only after a change"""
+        if self._rendered is None:
+            self._rendered = render_knowledge_section(most_used(self.entries.values()))
+        return self._rendered
+
+
+class KnowledgeViews:
+    """
+    Knowledge views of every tenant a worker process serves
+
+    Sessions of one tenant starting together share a single sync.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._views: Dict[str, KnowledgeView] = {}
+        self._flight = SingleFlight("agent_knowledge_sync")
+
+    async def render(self, tenant: Optional[str] = None) -> Optional[str]:
+        """
+        The tenant's knowledge section after syncing with the backend
+
+        None if the tenant's entries were never loaded and the backend is
+        unavailable. If they were, a failed sync serves them as they are.
+        """
+        key = tenant or ""
+        view = self._views.setdefault(key, KnowledgeView())
+        if not await self._flight.do(key, lambda: self._sync(view, tenant)) and not view.loaded:
+            return None
+        return view.render()
+
+    async def _sync(self, view: KnowledgeView, tenant: Optional[str]) -> bool:
+        for _ in range(MAX_CHANGE_PAGES):
+            if not view.loaded:
+                snapshot = await self.client.get_knowledge_snapshot(tenant)
+                if snapshot is None:
+                    return False
+                view.apply_snapshot(snapshot)
+                logger.info(f"Loaded {len(view.entries)} knowledge base entries for tenant "
+                            f"{tenant or 'default'} at version {view.version}")
+
+            changes = await self.client.get_knowledge_changes(view.version, tenant)
+            if changes is None:
+                if view.loaded:
+                    logger.warning(f"Knowledge base of tenant {tenant or 'default'} may be stale "
+                                   f"at version {view.version}")
+                return False
+            if changes["reset"]:
+                # Changes after our version were pruned; start over from a snapshot
+                view.version = None
+                continue
+
+            view.apply_changes(changes)
+            if not changes["has_more"]:
+                return True
+        return True
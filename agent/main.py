@@ -15,8 +15,6 @@ from livekit import rtc
 from livekit.agents import (
     AutoSubscribe,
     JobContext,
-    WorkerOptions,
-    WorkerType,
     cli,
     llm,
     utils,
@@ -24,9 +22,16 @@ from livekit.agents import (
 from livekit.agents.multimodal import MultimodalAgent
 from livekit.plugins.google import beta as google
 
+import turn_timeline
+from conversation_memory import ASSISTANT, USER, ConversationMemory
+from app.cache import TTLCache
+from app.tracing import tracer
+from worker_load import worker_options
 from backend_client import backend_client
+from knowledge_view import KnowledgeViews
 
 load_dotenv(dotenv_path=".env.local")
+tracer.configure("agent")
 
 logger = logging.getLogger("gemini-playground")
 logger.setLevel(logging.INFO)
@@ -78,9 +83,9 @@ class TranscriptCaptureHandler(logging.Handler):
 # We'll set this up when we create the session manager
 transcript_handler = None
 
-# Base salon instructions - will be enhanced with dynamic knowledge base
-BASE_SALON_INSTRUCTIONS = """
-You are an AI receptionist for Bella's Hair & Beauty Salon, a premium salon in downtown.
+# Base instructions shared by every tenant - enhanced with the tenant's business context and knowledge base
+BASE_INSTRUCTIONS = """
+You are an AI receptionist for a local business.
 
 IMPORTANT: For any question you're not 100% sure about, respond with:
 "Let me check with my supervisor and get back to you shortly."
@@ -90,21 +95,95 @@ TONE: Always be friendly, professional, and helpful. Make customers feel welcome
 If you need to escalate to a supervisor, say exactly: "Let me check with my supervisor and get back to you shortly."
 """
 
-async def get_dynamic_instructions() -> str:
-    """Get dynamic instructions including knowledge base"""
+# Metadata key naming the tenant (business location) a call belongs to
+TENANT_METADATA_KEY = "tenant"
+
+# Rendered instructions per tenant, shared by the sessions a worker process runs
+instructions_cache = TTLCache(
+    "agent_instructions",
+    ttl_seconds=float(os.getenv("AGENT_INSTRUCTIONS_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("AGENT_INSTRUCTIONS_CACHE_ENTRIES", "256"))
+)
+
+# Knowledge base entries per tenant, patched from the backend's change feed
+knowledge_views = KnowledgeViews(backend_client)
+
+
+def resolve_tenant(room_metadata: Optional[str], participant_metadata: Dict[str, Any]) -> Optional[str]:
+    """Tenant slug of a call: room metadata set at dispatch wins over the participant's, then DEFAULT_TENANT"""
+    try:
+        room = json.loads(room_metadata) if room_metadata else {}
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring room metadata that is not JSON: {room_metadata!r}")
+        room = {}
+    if not isinstance(room, dict):
+        room = {}
+    return room.get(TENANT_METADATA_KEY) or participant_metadata.get(TENANT_METADATA_KEY) or os.getenv("DEFAULT_TENANT")
+
+
+# Backend tables whose changes make rendered instructions stale
+INSTRUCTION_SOURCE_TABLES = ("knowledge_base", "tenants")
+
+_invalidation_watcher: Optional[asyncio.Task] = None
+
+
+async def watch_invalidations() -> None:
+    """Drop cached instructions when the backend relays a knowledge base or tenant change"""
+    delay = 1.0
+    while True:
+        try:
+            async for event in backend_client.stream_invalidations(INSTRUCTION_SOURCE_TABLES):
+                # The cache is keyed by slug and events carry tenant IDs, so drop every tenant's
+                instructions_cache.invalidate()
+                delay = 1.0
+                logger.debug(f"Instructions invalidated by {event.get('table')} {event.get('op')}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Invalidation stream unavailable, instructions fall back to their TTL: {e}")
+
+        # Changes may have been missed while disconnected
+        instructions_cache.invalidate()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60.0)
+
+
+def ensure_invalidation_watcher() -> None:
+    """Start one invalidation watcher per worker process"""
+    global _invalidation_watcher
+    if _invalidation_watcher is None or _invalidation_watcher.done():
+        _invalidation_watcher = asyncio.create_task(watch_invalidations(), name="invalidation-watcher")
+
+
+async def get_dynamic_instructions(tenant: Optional[str] = None) -> str:
+    """Get dynamic instructions including the tenant's business context and knowledge base"""
+    cached = instructions_cache.get(tenant or "")
+    if cached is not None:
+        return cached
+
     try:
-        # Get salon context from backend
-        salon_context = await backend_client.get_salon_context()
+        # Business details come from the backend; the knowledge section from the local copy
+        salon_context = await backend_client.get_salon_context(tenant, knowledge=False)
+        if salon_context is not None:
+            knowledge = await knowledge_views.render(tenant)
+            if knowledge is not None:
+                salon_context += knowledge
+            else:
+                salon_context = await backend_client.get_salon_context(tenant)
+        if salon_context is None:
+            logger.warning(f"⚠️ No context for tenant {tenant or 'default'}, using base instructions")
+            return BASE_INSTRUCTIONS
 
         # Combine base instructions with dynamic context
-        dynamic_instructions = f"{BASE_SALON_INSTRUCTIONS}\n\n{salon_context}"
+        dynamic_instructions = f"{BASE_INSTRUCTIONS}\n\n{salon_context}"
+        instructions_cache.set(tenant or "", dynamic_instructions)
 
-        logger.info("✅ Loaded dynamic instructions from backend")
+        logger.info(f"✅ Loaded dynamic instructions for tenant {tenant or 'default'} from backend")
         return dynamic_instructions
 
     except Exception as e:
         logger.warning(f"⚠️ Failed to load dynamic instructions, using base: {e}")
-        return BASE_SALON_INSTRUCTIONS
+        return BASE_INSTRUCTIONS
 
 def get_initial_chat_ctx() -> llm.ChatContext:
     """Get initial chat context with base instructions"""
@@ -112,7 +191,7 @@ def get_initial_chat_ctx() -> llm.ChatContext:
         messages=[
             llm.ChatMessage(
                 role="system",
-                content=BASE_SALON_INSTRUCTIONS
+                content=BASE_INSTRUCTIONS
             ),
             llm.ChatMessage(
                 role="user",
@@ -176,39 +255,70 @@ def parse_session_config(data: Dict[str, Any]) -> SessionConfig:
     return config
 
 
+# Fields sent when the realtime connection is set up. Gemini Live has no message to change
+# them mid-session, so a change to any of them only takes effect on a new connection.
+CONNECTION_CONFIG_FIELDS = ("voice", "modalities", "temperature", "max_response_output_tokens",
+                            "presence_penalty", "frequency_penalty")
+
+
+def config_needs_reconnect(old: SessionConfig, new: SessionConfig) -> bool:
+    """Whether a config update changes anything the model connection was set up with"""
+    return any(getattr(old, field) != getattr(new, field) for field in CONNECTION_CONFIG_FIELDS)
+
+
+def max_output_tokens(config: SessionConfig) -> Optional[int]:
+    """Model output token limit; "inf" means no limit"""
+    value = config.max_response_output_tokens
+    return None if value == "inf" else int(value)
+
+
 async def entrypoint(ctx: JobContext):
+    ensure_invalidation_watcher()
     logger.info(f"connecting to room {ctx.room.name}")
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
 
     participant = await ctx.wait_for_participant()
     metadata = json.loads(participant.metadata)
     config = parse_session_config(metadata)
-    session_manager = await run_multimodal_agent(ctx, participant, config)  # Now async
+    tenant = resolve_tenant(ctx.room.metadata, metadata)
+    logger.info(f"room {ctx.room.name} belongs to tenant {tenant or 'default'}")
+    session_manager = await run_multimodal_agent(ctx, participant, config, tenant)  # Now async
 
     logger.info("agent started")
 
 
 class SessionManager:
-    def __init__(self, config: SessionConfig):
+    def __init__(self, config: SessionConfig, tenant: Optional[str] = None):
         self.instructions = config.instructions
-        self.chat_history: List[llm.ChatMessage] = []
+        self.tenant = tenant
+        self.memory = ConversationMemory()
         self.current_agent: MultimodalAgent | None = None
         self.current_model: google.realtime.RealtimeModel | None = None
         self.current_config: SessionConfig = config
         self.call_session_id: Optional[UUID] = None
         self.customer_phone: Optional[str] = None
         self.session_started = False
+        self.timeline = turn_timeline.TurnTimeline()
+        self._closed = False
+        self.dynamic_instructions: Optional[str] = None
 
     async def create_model(self, config: SessionConfig) -> google.realtime.RealtimeModel:
-        # Get dynamic instructions from backend
-        dynamic_instructions = await get_dynamic_instructions()
+        # Get dynamic instructions from backend once per call; reconnects reuse them
+        dynamic_instructions = self.dynamic_instructions
+        if dynamic_instructions is None:
+            with tracer.start_span("agent.load_instructions"):
+                dynamic_instructions = await get_dynamic_instructions(self.tenant)
+            if dynamic_instructions != BASE_INSTRUCTIONS:
+                self.dynamic_instructions = dynamic_instructions
 
         model = google.realtime.RealtimeModel(
             instructions=dynamic_instructions,  # Use dynamic instructions instead of config
             modalities=cast(list[Modality], config.modalities),
             voice=config.voice,
             temperature=config.temperature,
-            max_output_tokens=int(config.max_response_output_tokens),
+            max_output_tokens=max_output_tokens(config),
+            presence_penalty=config.presence_penalty,
+            frequency_penalty=config.frequency_penalty,
             api_key=config.gemini_api_key,
             enable_user_audio_transcription=True,  # Enable user transcription
             enable_agent_audio_transcription=True,  # Enable AI transcription
@@ -234,6 +344,7 @@ class SessionManager:
             self.call_session_id = uuid4()
             self.customer_phone = participant.identity
             self.session_started = True
+            ctx.add_shutdown_callback(self.close)
             logger.info(f"Created call session: {self.call_session_id} for customer: {self.customer_phone}")
 
         self.current_agent.start(room, participant)
@@ -248,20 +359,21 @@ class SessionManager:
                 return json.dumps({"changed": False})
 
             new_config = parse_session_config(json.loads(data.payload))
-            if self.current_config != new_config:
-                logger.info(
-                    f"config changed: {new_config.to_dict()}, participant: {participant.identity}"
-                )
+            needs_reconnect = config_needs_reconnect(self.current_config, new_config)
+            self.current_config = new_config
 
-                self.current_config = new_config
-                session = self.current_model.sessions[0]
-                model = await self.create_model(new_config)  # Now async
-                agent = self.create_agent(model, session.chat_ctx_copy())
-                await self.replace_session(ctx, participant, agent, model)
-                return json.dumps({"changed": True})
-            else:
+            if not needs_reconnect:
                 return json.dumps({"changed": False})
 
+            logger.info(f"config changed: {new_config.to_dict()}, participant: {participant.identity}")
+
+            # New connection with cached instructions and compact history
+            chat_ctx = self._reconnect_chat_ctx()
+            model = await self.create_model(new_config)
+            agent = self.create_agent(model, chat_ctx)
+            await self.replace_session(ctx, participant, agent, model)
+            return json.dumps({"changed": True, "reconnected": True})
+
 
     @utils.log_exceptions(logger=logger)
     async def end_session(self):
@@ -272,36 +384,49 @@ class SessionManager:
         self.current_agent = None
         self.current_model = None
 
+    async def close(self):
+        """Export this call's turn timeline and log worker-wide latency percentiles"""
+        if self._closed:
+            return
+        self._closed = True
+
+        session_id = str(self.call_session_id) if self.call_session_id else None
+        path = await asyncio.to_thread(self.timeline.export, session_id)
+        if path:
+            logger.info(f"Turn timeline for session {session_id} written to {path}")
+
+        turn_timeline.worker_stats.add(self.timeline)
+        turn_timeline.worker_stats.log_summary()
+
+    def _reconnect_chat_ctx(self) -> llm.ChatContext:
+        """
+        Conversation memory to seed a reconnected session, plus a reconnect note
+
+        The Gemini session does not record transcripts in its own chat context,
+        so the rebuild comes from the bounded memory: a summary of older turns
+        and the recent ones verbatim, whatever the length of the call.
+        """
+        chat_ctx = llm.ChatContext(messages=[
+            llm.ChatMessage(role=role, content=text) for role, text in self.memory.messages()
+        ])
+        chat_ctx.append(
+            text="We've just been reconnected, please continue the conversation.",
+            role="assistant",
+        )
+        return chat_ctx
+
     @utils.log_exceptions(logger=logger)
     async def replace_session(self, ctx: JobContext, participant: rtc.RemoteParticipant, agent: MultimodalAgent, model: google.realtime.RealtimeModel):
+        self.timeline.mark(turn_timeline.RECONNECT_STARTED)
         await self.end_session()
 
+        # Starting the agent opens the new session's connection, seeded with the agent's chat context
         self.current_agent = agent
         self.current_model = model
         agent.start(ctx.room, participant)
         agent.generate_reply("cancel_existing")
-
-        session = self.current_model.sessions[0]
-
-        chat_history = session.chat_ctx_copy()
-        # Patch: remove the empty conversation items
-        # https://github.com/livekit/agents/pull/1245
-        chat_history.messages = [
-            msg
-            for msg in chat_history.messages
-            if msg.tool_call_id or msg.content is not None
-        ]
-        # session._remote_conversation_items = _RemoteConversationItems()
-
-        # create a new connection
-        session._main_atask = asyncio.create_task(session._main_task())
-        # session.session_update()
-
-        chat_history.append(
-            text="We've just been reconnected, please continue the conversation.",
-            role="assistant",
-        )
-        await session.set_chat_ctx(chat_history)
+        self._setup_livekit_event_handlers(agent)
+        self.timeline.mark(turn_timeline.RECONNECT_COMPLETED)
 
     async def process_customer_query(self, question: str, participant: rtc.RemoteParticipant) -> Optional[str]:
         """
@@ -323,7 +448,8 @@ class SessionManager:
                 customer_phone=customer_phone,
                 customer_name=customer_name,
                 call_session_id=self.call_session_id,
-                context=self._get_conversation_context()
+                context=self._get_conversation_context(),
+                tenant=self.tenant
             )
 
             if result.get("has_answer"):
@@ -338,20 +464,8 @@ class SessionManager:
             return "I'm experiencing some technical difficulties. Let me get someone to help you right away."
 
     def _get_conversation_context(self) -> str:
-        """Get recent conversation context for backend processing"""
-        if not self.chat_history:
-            return ""
-
-        # Get last few messages for context
-        recent_messages = self.chat_history[-5:] if len(self.chat_history) > 5 else self.chat_history
-        context_parts = []
-
-        for msg in recent_messages:
-            role = "Customer" if msg.role == "user" else "AI"
-            content = msg.content if isinstance(msg.content, str) else str(msg.content)
-            context_parts.append(f"{role}: {content}")
-
-        return "\n".join(context_parts)
+        """Get the summarized conversation so far for backend processing"""
+        return self.memory.context_text()
 
     def set_customer_info(self, phone: str, call_session_id: UUID):
         """Set customer information for this session"""
@@ -361,10 +475,21 @@ class SessionManager:
     def _setup_livekit_event_handlers(self, agent: MultimodalAgent):
         """Set up LiveKit agent event handlers for escalation detection"""
         try:
+            # Timeline-only events; the transcript-bearing events are handled below
+            @agent.on("user_stopped_speaking")
+            def on_user_stopped_speaking():
+                self.timeline.mark(turn_timeline.USER_STOPPED_SPEAKING)
+
+            @agent.on("agent_started_speaking")
+            def on_agent_started_speaking():
+                self.timeline.mark(turn_timeline.AGENT_STARTED_SPEAKING)
+
             # Hook into agent speech events
             @agent.on("agent_speech_committed")
             def on_agent_speech(speech_event):
                 """Handle agent speech events to detect escalation"""
+                self.timeline.mark(turn_timeline.AGENT_SPEECH_COMMITTED)
+
                 async def process_agent_speech():
                     try:
                         # Handle different speech event formats
@@ -378,10 +503,12 @@ class SessionManager:
                             agent_text = str(speech_event)
 
                         logger.info(f"🤖 AI said: {agent_text}")
+                        self.memory.add(ASSISTANT, agent_text)
 
                         # Check if this is an escalation response
                         if self._is_escalation_response(agent_text):
                             logger.info(f"🚨 ESCALATION DETECTED: {agent_text}")
+                            self.timeline.mark(turn_timeline.ESCALATION_DETECTED)
 
                             # Only create ticket if we have a clear question that needs answering
                             question_for_ticket = None
@@ -416,10 +543,17 @@ class SessionManager:
                 import asyncio
                 asyncio.create_task(process_agent_speech())
 
+            @agent.on("agent_speech_interrupted")
+            def on_agent_speech_interrupted(msg):
+                # Only the part the caller heard, ending in "..."
+                if isinstance(msg, str):
+                    self.memory.add(ASSISTANT, msg)
+
             # Hook into user speech events
             @agent.on("user_speech_committed")
             def on_user_speech(speech_event):
                 """Handle user speech events to capture questions"""
+                self.timeline.mark(turn_timeline.USER_SPEECH_COMMITTED)
                 try:
                     logger.info(f"🔍 USER SPEECH EVENT TRIGGERED!")
                     logger.info(f"🔍 Raw user speech event: {speech_event}")
@@ -452,6 +586,7 @@ class SessionManager:
                         logger.info(f"🔍 Fallback to string: {user_text}")
 
                     if user_text and user_text != "...":
+                        self.memory.add(USER, user_text)
                         self.recent_user_question = user_text
                         self.last_clear_question = user_text  # Store as clearly understood
                         logger.info(f"✅ 👤 User asked: {user_text}")
@@ -496,55 +631,64 @@ class SessionManager:
 
     async def _create_help_request_for_escalation(self, user_question: str, ai_response: str):
         """Create help request when escalation is detected"""
-        try:
-            logger.info(f"🎫 Creating help request for escalation")
-
-            # Use backend client to create help request
-            result = await backend_client.process_query(
-                question=user_question or "Customer question (audio)",
-                customer_phone=self.customer_phone or "unknown",
-                customer_name=None,
-                call_session_id=self.call_session_id,
-                context=f"User: {user_question}\nAI: {ai_response}"
-            )
-
-            if result.get("help_request_id"):
-                logger.info(f"✅ Help request created: {result['help_request_id']}")
-                print(f"\n🎫 TICKET CREATED: {result['help_request_id']}")
-                print(f"Question: {user_question}")
-                print(f"AI Response: {ai_response}\n")
-            else:
-                logger.warning(f"⚠️  Help request creation failed: {result}")
-
-        except Exception as e:
-            logger.error(f"❌ Error creating help request: {e}")
-            # Fallback - direct HTTP call
+        # Root span of the ticket round trip; BackendClient propagates it to the backend
+        with tracer.start_span("agent.escalation") as span:
+            span.set_attribute("call_session_id", str(self.call_session_id))
             try:
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        "http://localhost:8001/ai/query",
-                        json={
-                            "question": user_question or "Customer needs assistance",
-                            "customer_phone": "+15551234567",  # Fallback phone
-                            "context": f"Escalation detected. User: {user_question}, AI: {ai_response}"
-                        },
-                        timeout=5.0
-                    )
-                    if response.status_code == 200:
-                        result = response.json()
-                        logger.info(f"✅ Fallback help request created: {result.get('help_request_id')}")
-            except Exception as fallback_error:
-                logger.error(f"❌ Fallback help request failed: {fallback_error}")
+                logger.info(f"🎫 Creating help request for escalation")
+                self.timeline.mark(turn_timeline.TICKET_SENT, trace_id=span.trace_id)
+
+                # Use backend client to create help request
+                result = await backend_client.process_query(
+                    question=user_question or "Customer question (audio)",
+                    customer_phone=self.customer_phone or "unknown",
+                    customer_name=None,
+                    call_session_id=self.call_session_id,
+                    context=self._get_conversation_context(),
+                    tenant=self.tenant
+                )
+
+                if result.get("help_request_id"):
+                    self.timeline.mark(turn_timeline.TICKET_ACKED, help_request_id=str(result["help_request_id"]))
+                    logger.info(f"✅ Help request created: {result['help_request_id']}")
+                    print(f"\n🎫 TICKET CREATED: {result['help_request_id']}")
+                    print(f"Question: {user_question}")
+                    print(f"AI Response: {ai_response}\n")
+                else:
+                    self.timeline.mark(turn_timeline.TICKET_FAILED)
+                    logger.warning(f"⚠️  Help request creation failed: {result}")
+
+            except Exception as e:
+                self.timeline.mark(turn_timeline.TICKET_FAILED, error=repr(e))
+                logger.error(f"❌ Error creating help request: {e}")
+                # Fallback - direct HTTP call
+                try:
+                    import httpx
+                    async with httpx.AsyncClient() as client:
+                        response = await client.post(
+                            "http://localhost:8001/ai/query",
+                            json={
+                                "question": user_question or "Customer needs assistance",
+                                "customer_phone": "+15551234567",  # Fallback phone
+                                "context": self._get_conversation_context(),
+                                "tenant": self.tenant
+                            },
+                            timeout=5.0
+                        )
+                        if response.status_code == 200:
+                            result = response.json()
+                            logger.info(f"✅ Fallback help request created: {result.get('help_request_id')}")
+                except Exception as fallback_error:
+                    logger.error(f"❌ Fallback help request failed: {fallback_error}")
 
 
 
 async def run_multimodal_agent(
-    ctx: JobContext, participant: rtc.RemoteParticipant, config: SessionConfig
+    ctx: JobContext, participant: rtc.RemoteParticipant, config: SessionConfig, tenant: Optional[str] = None
 ) -> SessionManager:
     logger.info("starting multimodal agent")
 
-    session_manager = SessionManager(config)
+    session_manager = SessionManager(config, tenant)
 
     # Set up transcript capture handler
     global transcript_handler
@@ -577,4 +721,4 @@ async def run_multimodal_agent(
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, worker_type=WorkerType.ROOM))
+    cli.run_app(worker_options(entrypoint))
@@ -0,0 +1,22 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 003: Knowledge base version counter
+
+-- Single-row counter bumped whenever the knowledge base content changes.
+-- Bulk imports bump it once per import, when it ends or stops with rows inserted,
+-- rather than once per inserted row or batch.
+CREATE TABLE knowledge_base_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO knowledge_base_version (id, version) VALUES (1, 0);
+
+-- Function to atomically bump and return the knowledge base version
+CREATE OR REPLACE FUNCTION bump_knowledge_base_version()
+RETURNS BIGINT AS $$
+    UPDATE knowledge_base_version
+    SET version = version + 1, updated_at = NOW()
+    WHERE id = 1
+    RETURNING version;
+$$ LANGUAGE sql;
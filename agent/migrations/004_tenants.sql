@@ -0,0 +1,75 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 004: Tenants (business locations) and per-tenant knowledge base partitions
+
+-- One row per business location. The agent resolves a tenant by slug from room
+-- or participant metadata; the backend renders its context from the profile.
+CREATE TABLE tenants (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    slug VARCHAR(64) UNIQUE NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    description TEXT, -- e.g. "a premium salon in downtown"
+    profile JSONB NOT NULL DEFAULT '[]'::jsonb, -- ordered [{"label": ..., "value": ...}] business facts
+    instructions TEXT, -- tenant-specific prompt instructions, appended to the shared ones
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TRIGGER update_tenants_updated_at BEFORE UPDATE ON tenants FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- The original single location becomes the default tenant
+INSERT INTO tenants (slug, name, description, profile) VALUES (
+    'default',
+    'Bella''s Hair & Beauty Salon',
+    'a premium salon in downtown',
+    '[
+        {"label": "Hours", "value": "Monday-Friday 9 AM to 7 PM, Saturday 9 AM to 5 PM, Closed Sundays"},
+        {"label": "Services", "value": "Haircuts, Hair Coloring, Highlights, Blowouts, Hair Styling, Manicures, Pedicures, Facials, Eyebrow Services"},
+        {"label": "Pricing", "value": "Basic haircuts start at $45, Cut and style packages start at $65"},
+        {"label": "Location", "value": "123 Main Street, Downtown"},
+        {"label": "Phone", "value": "(555) 123-4567"},
+        {"label": "Appointments", "value": "Preferred but walk-ins accepted when possible"},
+        {"label": "Cancellation", "value": "24-hour notice required, same-day cancellations may incur fees"},
+        {"label": "Gift Certificates", "value": "Available for any amount or specific services"},
+        {"label": "Parking", "value": "Street parking and paid lot behind building"}
+    ]'::jsonb
+);
+
+-- Partition the knowledge base by tenant; existing entries belong to the default tenant
+ALTER TABLE knowledge_base ADD COLUMN tenant_id UUID REFERENCES tenants(id);
+UPDATE knowledge_base SET tenant_id = (SELECT id FROM tenants WHERE slug = 'default');
+ALTER TABLE knowledge_base ALTER COLUMN tenant_id SET NOT NULL;
+
+-- Tickets remember their tenant, so resolutions are learned into the right partition
+ALTER TABLE help_requests ADD COLUMN tenant_id UUID REFERENCES tenants(id);
+UPDATE help_requests SET tenant_id = (SELECT id FROM tenants WHERE slug = 'default');
+
+CREATE INDEX idx_knowledge_base_tenant_usage ON knowledge_base(tenant_id, usage_count DESC);
+CREATE INDEX idx_help_requests_tenant_status ON help_requests(tenant_id, status);
+
+-- Expose the tenant on the supervisor dashboard
+CREATE OR REPLACE VIEW supervisor_dashboard AS
+SELECT
+    hr.id,
+    hr.question,
+    hr.context,
+    hr.status,
+    hr.priority,
+    hr.customer_phone,
+    hr.created_at,
+    hr.timeout_at,
+    c.name as customer_name,
+    EXTRACT(EPOCH FROM (NOW() - hr.created_at))/3600 as hours_waiting,
+    hr.tenant_id
+FROM help_requests hr
+LEFT JOIN call_sessions cs ON hr.call_session_id = cs.id
+LEFT JOIN customers c ON cs.customer_id = c.id
+WHERE hr.status IN ('pending', 'resolved')
+ORDER BY
+    CASE hr.priority
+        WHEN 'urgent' THEN 1
+        WHEN 'high' THEN 2
+        WHEN 'normal' THEN 3
+        WHEN 'low' THEN 4
+    END,
+    hr.created_at ASC;
@@ -0,0 +1,32 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 005: request_followups as a work queue for the follow-up worker pool
+
+-- Workers claim pending rows under a lease; a worker that dies mid-batch loses
+-- its lease and the rows become claimable again.
+ALTER TABLE request_followups ADD COLUMN recipient VARCHAR(255);
+ALTER TABLE request_followups ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE request_followups ADD COLUMN next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+ALTER TABLE request_followups ADD COLUMN locked_until TIMESTAMP WITH TIME ZONE;
+ALTER TABLE request_followups ADD COLUMN last_error TEXT;
+
+CREATE INDEX idx_request_followups_due ON request_followups(next_attempt_at) WHERE status = 'pending';
+CREATE INDEX idx_request_followups_help_request ON request_followups(help_request_id);
+
+-- Claim up to batch_size due follow-ups in one round trip. SKIP LOCKED lets
+-- several backend processes claim concurrently without handing out a row twice.
+CREATE OR REPLACE FUNCTION claim_request_followups(batch_size INTEGER, lease_seconds INTEGER)
+RETURNS SETOF request_followups AS $$
+    UPDATE request_followups f
+    SET locked_until = NOW() + make_interval(secs => lease_seconds),
+        attempts = f.attempts + 1
+    WHERE f.id IN (
+        SELECT id FROM request_followups
+        WHERE status = 'pending'
+          AND next_attempt_at <= NOW()
+          AND (locked_until IS NULL OR locked_until < NOW())
+        ORDER BY next_attempt_at
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING f.*;
+$$ LANGUAGE sql;
@@ -0,0 +1,33 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 006: Change notifications for cross-process cache invalidation
+
+-- Every committed write to a cached table sends a NOTIFY on 'frontdesk_changes'.
+-- Backend processes LISTEN and evict exactly the affected cache entries, then
+-- relay the events to agents over /events/invalidations.
+CREATE SEQUENCE change_event_version_seq;
+
+CREATE OR REPLACE FUNCTION notify_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed JSONB := to_jsonb(COALESCE(NEW, OLD));
+BEGIN
+    -- Payload stays far below NOTIFY's 8000 byte limit: no row contents, only keys
+    PERFORM pg_notify('frontdesk_changes', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', changed->>'id',
+        'tenant_id', changed->>'tenant_id',
+        'version', nextval('change_event_version_seq')
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER knowledge_base_notify_change AFTER INSERT OR UPDATE OR DELETE ON knowledge_base
+    FOR EACH ROW EXECUTE FUNCTION notify_change();
+CREATE TRIGGER help_requests_notify_change AFTER INSERT OR UPDATE OR DELETE ON help_requests
+    FOR EACH ROW EXECUTE FUNCTION notify_change();
+CREATE TRIGGER customers_notify_change AFTER INSERT OR UPDATE OR DELETE ON customers
+    FOR EACH ROW EXECUTE FUNCTION notify_change();
+CREATE TRIGGER tenants_notify_change AFTER INSERT OR UPDATE OR DELETE ON tenants
+    FOR EACH ROW EXECUTE FUNCTION notify_change();
@@ -0,0 +1,63 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 007: Knowledge base change feed
+
+-- One row per committed content change to a knowledge base entry, served to
+-- agents by GET /ai/knowledge/changes?since=<version>. Usage count bumps are
+-- not content changes and are not recorded.
+CREATE TABLE knowledge_base_changes (
+    version BIGSERIAL PRIMARY KEY,
+    knowledge_id UUID NOT NULL,
+    tenant_id UUID,
+    op VARCHAR(6) NOT NULL, -- INSERT, UPDATE, DELETE
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX idx_knowledge_base_changes_tenant ON knowledge_base_changes(tenant_id, version);
+CREATE INDEX idx_knowledge_base_changes_changed_at ON knowledge_base_changes(changed_at);
+
+-- Highest version removed by pruning; readers behind it need a snapshot
+ALTER TABLE knowledge_base_version ADD COLUMN changes_pruned_through BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION record_knowledge_base_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Knowledge base writers take versions one transaction at a time, so versions
+    -- become visible in increasing order and a reader never skips a late commit
+    PERFORM pg_advisory_xact_lock(hashtext('knowledge_base_changes'));
+    -- An entry moved to another tenant disappears from the old tenant's feed
+    IF TG_OP = 'UPDATE' AND OLD.tenant_id IS DISTINCT FROM NEW.tenant_id THEN
+        INSERT INTO knowledge_base_changes (knowledge_id, tenant_id, op) VALUES (OLD.id, OLD.tenant_id, 'DELETE');
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO knowledge_base_changes (knowledge_id, tenant_id, op) VALUES (OLD.id, OLD.tenant_id, TG_OP);
+    ELSE
+        INSERT INTO knowledge_base_changes (knowledge_id, tenant_id, op) VALUES (NEW.id, NEW.tenant_id, TG_OP);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER knowledge_base_record_insert_delete AFTER INSERT OR DELETE ON knowledge_base
+    FOR EACH ROW EXECUTE FUNCTION record_knowledge_base_change();
+CREATE TRIGGER knowledge_base_record_update AFTER UPDATE ON knowledge_base
+    FOR EACH ROW
+    WHEN (OLD.question IS DISTINCT FROM NEW.question
+          OR OLD.answer IS DISTINCT FROM NEW.answer
+          OR OLD.category IS DISTINCT FROM NEW.category
+          OR OLD.confidence_score IS DISTINCT FROM NEW.confidence_score
+          OR OLD.tenant_id IS DISTINCT FROM NEW.tenant_id)
+    EXECUTE FUNCTION record_knowledge_base_change();
+
+-- Drop changes older than the retention window and advance the watermark
+CREATE OR REPLACE FUNCTION prune_knowledge_base_changes(retain_seconds INTEGER)
+RETURNS BIGINT AS $$
+    WITH pruned AS (
+        DELETE FROM knowledge_base_changes
+        WHERE changed_at < NOW() - make_interval(secs => retain_seconds)
+        RETURNING version
+    )
+    UPDATE knowledge_base_version
+    SET changes_pruned_through = GREATEST(changes_pruned_through, (SELECT COALESCE(MAX(version), 0) FROM pruned))
+    WHERE id = 1
+    RETURNING changes_pruned_through;
+$$ LANGUAGE sql;
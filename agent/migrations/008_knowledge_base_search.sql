@@ -0,0 +1,59 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 008: Ranked knowledge base search
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Weighted question and answer vectors, stored so that matching and ranking read them instead
+-- of parsing both texts of every matching row
+ALTER TABLE knowledge_base ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', question), 'A') || setweight(to_tsvector('english', answer), 'B')
+) STORED;
+CREATE INDEX idx_knowledge_base_search_vector ON knowledge_base USING gin(search_vector);
+-- Trigram index for the typo fallback, which compares the query with questions only
+CREATE INDEX idx_knowledge_base_question_trgm ON knowledge_base USING gin(question gin_trgm_ops);
+
+-- Top match_limit entries for a web-search style query, best first. Full-text matches are
+-- ranked by cover density with question terms weighted above answer terms. When nothing
+-- matches, questions within trigram word similarity of the query are returned instead.
+-- Scores are in [0, 1); match says which of the two produced them.
+CREATE OR REPLACE FUNCTION search_knowledge_base(search_query TEXT, tenant UUID DEFAULT NULL, match_limit INTEGER DEFAULT 10)
+RETURNS TABLE (
+    id UUID,
+    question TEXT,
+    answer TEXT,
+    category VARCHAR,
+    confidence_score DECIMAL,
+    usage_count INTEGER,
+    tenant_id UUID,
+    score REAL,
+    match TEXT
+) AS $$
+#variable_conflict use_column
+DECLARE
+    query tsquery := websearch_to_tsquery('english', search_query);
+BEGIN
+    RETURN QUERY
+    SELECT kb.id, kb.question, kb.answer, kb.category, kb.confidence_score, kb.usage_count, kb.tenant_id,
+           ts_rank_cd(kb.search_vector, query, 32) AS score,
+           'fulltext'::TEXT
+    FROM knowledge_base kb
+    WHERE kb.search_vector @@ query
+      AND (tenant IS NULL OR kb.tenant_id = tenant)
+    ORDER BY score DESC, kb.usage_count DESC, kb.id
+    LIMIT match_limit;
+
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT kb.id, kb.question, kb.answer, kb.category, kb.confidence_score, kb.usage_count, kb.tenant_id,
+               word_similarity(search_query, kb.question) AS score,
+               'trigram'::TEXT
+        FROM knowledge_base kb
+        WHERE search_query <% kb.question
+          AND (tenant IS NULL OR kb.tenant_id = tenant)
+        ORDER BY score DESC, kb.usage_count DESC, kb.id
+        LIMIT match_limit;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE
+-- Below the 0.6 default, so one or two typos in a short query still match
+SET pg_trgm.word_similarity_threshold = 0.5;
@@ -0,0 +1,8 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 009: Wake the follow-up worker pool when a follow-up is queued
+
+-- The pool runs in the leader process only, while follow-ups are queued by whichever
+-- worker served the resolution. Inserts send the same NOTIFY as cached tables, and the
+-- leader claims on it instead of at its next poll. Claims and outcomes do not notify.
+CREATE TRIGGER request_followups_notify_change AFTER INSERT ON request_followups
+    FOR EACH ROW EXECUTE FUNCTION notify_change();
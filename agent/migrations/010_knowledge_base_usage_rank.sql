@@ -0,0 +1,30 @@
+-- Voice Receptionist AI System Database Schema
+-- Migration 010: Usage rank carried by the knowledge base change feed
+
+-- The prompt lists a tenant's most used entries. Agents render it from their own copy,
+-- which only learns of recorded changes, so ordering by the live usage_count would drift
+-- from the backend between content changes. Both sides order by this coarse rank instead:
+-- the number of binary digits of usage_count, which changes on the 1st, 2nd, 4th, 8th, ...
+-- use of an entry. Each change of rank is recorded, so usage reaches the feed coalesced
+-- into a handful of rows per entry rather than one per match.
+ALTER TABLE knowledge_base ADD COLUMN usage_rank SMALLINT GENERATED ALWAYS AS (
+    CASE WHEN usage_count > 0 THEN floor(log(2, usage_count::numeric))::smallint + 1 ELSE 0 END
+) STORED;
+
+DROP INDEX idx_knowledge_base_tenant_usage;
+CREATE INDEX idx_knowledge_base_tenant_usage_rank ON knowledge_base(tenant_id, usage_rank DESC, id);
+
+DROP TRIGGER knowledge_base_record_update ON knowledge_base;
+CREATE TRIGGER knowledge_base_record_update AFTER UPDATE ON knowledge_base
+    FOR EACH ROW
+    WHEN (OLD.question IS DISTINCT FROM NEW.question
+          OR OLD.answer IS DISTINCT FROM NEW.answer
+          OR OLD.category IS DISTINCT FROM NEW.category
+          OR OLD.confidence_score IS DISTINCT FROM NEW.confidence_score
+          OR OLD.tenant_id IS DISTINCT FROM NEW.tenant_id
+          OR OLD.usage_rank IS DISTINCT FROM NEW.usage_rank)
+    EXECUTE FUNCTION record_knowledge_base_change();
+
+-- Agents' copies predate the column; entries already used reach them as updates
+INSERT INTO knowledge_base_changes (knowledge_id, tenant_id, op)
+SELECT id, tenant_id, 'UPDATE' FROM knowledge_base WHERE usage_rank > 0 ORDER BY tenant_id, id;
@@ -0,0 +1,97 @@
+"""
+Salon context caching when an invalidation lands while a render is in flight
+"""
+
+import asyncio
+
+from app.cache import TTLCache
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from app.services.ai_service import AIService
+from app.services.tenant_service import TenantService
+from benchmarks import stub_db
+
+
+class GatedKnowledgeBaseRepository(KnowledgeBaseRepository):
+    """Holds ``get_most_used`` open after its read until ``release`` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.read_done = asyncio.Event()
+        self.release = asyncio.Event()
+        self.reads = 0
+
+    async def get_most_used(self, limit=10, tenant_id=None):
+        rows = await super().get_most_used(limit=limit, tenant_id=tenant_id)
+        self.reads += 1
+        self.read_done.set()
+        await self.release.wait()
+        return rows
+
+
+def build():
+    db = stub_db.install()
+    knowledge_repo = GatedKnowledgeBaseRepository()
+    context_cache = TTLCache("context", ttl_seconds=60)
+    ai_service = AIService(knowledge_repo=knowledge_repo,
+                           tenant_service=TenantService(tenant_cache=TTLCache("tenants", ttl_seconds=60)),
+                           context_cache=context_cache)
+    return db, knowledge_repo, context_cache, ai_service
+
+
+def test_render_finishing_after_an_invalidation_is_not_cached():
+    async def scenario():
+        db, knowledge_repo, context_cache, ai_service = build()
+        tenant_id = stub_db.default_tenant_id(db)
+
+        stale = asyncio.create_task(ai_service.get_salon_context())
+        await knowledge_repo.read_done.wait()
+
+        # A new entry and its invalidation, as CacheInvalidator applies it, while the render is held
+        await knowledge_repo.create_knowledge_entry("Do you do balayage on weekends?", "Yes, on Saturdays.",
+                                                    tenant_id=tenant_id)
+        context_cache.invalidate(tenant_id)
+
+        # A caller after the invalidation starts its own render instead of joining the stale one
+        fresh = asyncio.create_task(ai_service.get_salon_context())
+        await asyncio.sleep(0)
+        knowledge_repo.release.set()
+        stale_context, fresh_context = await asyncio.gather(stale, fresh)
+
+        assert knowledge_repo.reads == 2
+        assert "balayage on weekends" not in stale_context
+        assert "balayage on weekends" in fresh_context
+        assert context_cache.get(tenant_id) == fresh_context
+        assert "balayage on weekends" in await ai_service.get_salon_context()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_callers_share_one_render_and_cache_it():
+    async def scenario():
+        db, knowledge_repo, context_cache, ai_service = build()
+        knowledge_repo.release.set()
+
+        contexts = await asyncio.gather(*(ai_service.get_salon_context() for _ in range(5)))
+
+        assert knowledge_repo.reads == 1
+        assert len(set(contexts)) == 1
+        assert context_cache.get(stub_db.default_tenant_id(db)) == contexts[0]
+
+    asyncio.run(scenario())
+
+
+def test_set_skips_values_loaded_before_an_invalidation():
+    cache = TTLCache("test", ttl_seconds=60)
+    before = cache.generation("a")
+    cache.invalidate("a")
+    assert cache.set("a", "stale", generation=before) is False
+    assert cache.get("a") is None
+
+    current = cache.generation("a")
+    cache.invalidate("b")
+    assert cache.set("a", "fresh", generation=current) is True
+
+    cache.invalidate()
+    assert cache.generation("a") != current
+    assert cache.set("a", "stale", generation=current) is False
+    assert cache.get("a") is None
@@ -0,0 +1,184 @@
+"""
+FollowUpWorkerPool and RateLimiter over the in-memory DB stand-in's claim_request_followups
+"""
+
+import asyncio
+import time
+from uuid import uuid4
+
+from app.followups import FollowUpChannel, FollowUpWorkerPool, RateLimiter
+from app.invalidation import ChangeEvent
+from app.metrics import FollowUpStats
+from app.models.schemas import FollowUpType
+from app.repositories.followup_repository import FollowUpRepository
+from benchmarks import stub_db
+
+
+class RecordingChannel(FollowUpChannel):
+    """Records when each message was sent; fails the first ``failures`` sends"""
+
+    def __init__(self, follow_up_type, rate=1000.0, failures=0):
+        super().__init__(follow_up_type, rate)
+        self.failures = failures
+        self.attempts = 0
+        self.sent = []
+
+    async def send(self, recipient, message):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError("provider unavailable")
+        self.sent.append((message, time.monotonic()))
+
+
+def build(channels, **pool_options):
+    db = stub_db.install()
+    repo = FollowUpRepository()
+    pool = FollowUpWorkerPool(repo, channels, **{"poll_interval": 0.01, "retry_delay": 0, **pool_options})
+    # The shared metrics object outlives a test; each pool here counts on its own
+    pool.stats = FollowUpStats()
+    return db, repo, pool
+
+
+async def queue_followups(repo, count, follow_up_type=FollowUpType.SMS):
+    return [await repo.create_followup(uuid4(), f"Message {i}", follow_up_type, "+15550000000")
+            for i in range(count)]
+
+
+async def run_until(pool, done, timeout=5.0):
+    runner = asyncio.create_task(pool.run())
+    try:
+        deadline = time.monotonic() + timeout
+        while not done():
+            assert time.monotonic() < deadline, "pool did not finish in time"
+            await asyncio.sleep(0.01)
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+
+def statuses(db):
+    return [row["status"] for row in db.tables["request_followups"]]
+
+
+def test_due_follow_up_is_sent_and_marked_sent():
+    async def scenario():
+        sms = RecordingChannel("sms")
+        db, repo, pool = build([sms])
+        await queue_followups(repo, 3)
+
+        await run_until(pool, lambda: statuses(db) == ["sent"] * 3)
+
+        assert sorted(message for message, _ in sms.sent) == ["Message 0", "Message 1", "Message 2"]
+        assert all(row["locked_until"] is None and row["attempts"] == 1 for row in db.tables["request_followups"])
+        assert pool.stats.sent_by_channel == {"sms": 3}
+        assert pool.stats.claimed == 3
+
+    asyncio.run(scenario())
+
+
+def test_failed_send_is_retried_then_sent():
+    async def scenario():
+        sms = RecordingChannel("sms", failures=1)
+        db, repo, pool = build([sms], max_attempts=3)
+        await queue_followups(repo, 1)
+
+        await run_until(pool, lambda: statuses(db) == ["sent"])
+
+        row = db.tables["request_followups"][0]
+        assert sms.attempts == 2
+        assert row["attempts"] == 2
+        assert row["last_error"] is None
+        assert pool.stats.retries == 1
+        assert pool.stats.failed_by_channel == {}
+
+    asyncio.run(scenario())
+
+
+def test_follow_up_is_marked_failed_after_max_attempts():
+    async def scenario():
+        sms = RecordingChannel("sms", failures=100)
+        db, repo, pool = build([sms], max_attempts=3)
+        await queue_followups(repo, 1)
+
+        await run_until(pool, lambda: statuses(db) == ["failed"])
+
+        row = db.tables["request_followups"][0]
+        assert sms.attempts == 3
+        assert row["attempts"] == 3
+        assert "provider unavailable" in row["last_error"]
+        assert pool.stats.retries == 2
+        assert pool.stats.failed_by_channel == {"sms": 1}
+
+    asyncio.run(scenario())
+
+
+def test_row_whose_lease_was_lost_is_not_sent():
+    async def scenario():
+        sms = RecordingChannel("sms")
+        db, repo, pool = build([sms])
+        await queue_followups(repo, 1)
+
+        # Our lease runs out at once and another worker's claim takes the row over
+        ours = (await repo.claim_due(1, lease_seconds=0))[0]
+        await asyncio.sleep(0.001)
+        theirs = (await FollowUpRepository().claim_due(1, lease_seconds=60))[0]
+        await pool._deliver(ours)
+
+        assert theirs["attempts"] == ours["attempts"] + 1
+        assert sms.sent == []
+        assert statuses(db) == ["pending"]
+        assert pool.stats.lost_leases == 1
+        assert pool.stats.sent_by_channel == {}
+
+    asyncio.run(scenario())
+
+
+def test_each_channel_is_held_to_its_own_rate():
+    async def scenario():
+        sms, email = RecordingChannel("sms"), RecordingChannel("email")
+        sms.limiter = RateLimiter(20, burst=1)
+        db, repo, pool = build([sms, email], workers=4)
+        await queue_followups(repo, 5, FollowUpType.SMS)
+        await queue_followups(repo, 5, FollowUpType.EMAIL)
+
+        started = time.monotonic()
+        await run_until(pool, lambda: statuses(db) == ["sent"] * 10)
+
+        # Four gaps of 1/20 s between five SMS sends; email is not slowed down by them
+        sms_times = sorted(sent_at for _, sent_at in sms.sent)
+        assert sms_times[-1] - sms_times[0] >= 4 / 20 * 0.9
+        assert all(later - earlier >= 1 / 20 * 0.9 for earlier, later in zip(sms_times, sms_times[1:]))
+        assert max(sent_at for _, sent_at in email.sent) - started < 4 / 20
+
+    asyncio.run(scenario())
+
+
+def test_follow_up_queued_elsewhere_wakes_the_pool_before_the_next_poll():
+    async def scenario():
+        sms = RecordingChannel("sms")
+        db, repo, pool = build([sms], poll_interval=60)
+        runner = asyncio.create_task(pool.run())
+        await asyncio.sleep(0.01)
+
+        row = (await queue_followups(repo, 1))[0]
+        await pool.on_change(ChangeEvent("request_followups", "UPDATE", str(row["id"]), None, 0))
+        await asyncio.sleep(0.05)
+        assert sms.sent == []
+
+        await pool.on_change(ChangeEvent("request_followups", "INSERT", str(row["id"]), None, 0))
+        await asyncio.sleep(0.05)
+        assert statuses(db) == ["sent"]
+
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_claims_are_capped_to_what_the_slowest_channel_sends_within_the_lease():
+    sms, call = RecordingChannel("sms", rate=1.0), RecordingChannel("call", rate=0.2)
+    pool = FollowUpWorkerPool(FollowUpRepository(), [sms, call], batch_size=20, lease_seconds=60)
+    # 0.2/s for half of a 60 s lease
+    assert pool.max_held == 6
+    pool.lease_seconds = 1
+    assert pool.max_held == 1
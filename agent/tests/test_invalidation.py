@@ -0,0 +1,184 @@
+"""
+CacheInvalidator and EventRelay driven through InMemoryBus, over the in-memory DB stand-in
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from app.cache import TTLCache
+from app.invalidation import RESYNC, CacheInvalidator, ChangeEvent, EventRelay, InMemoryBus
+from app.projections import HelpRequestProjection
+from app.repositories.help_request_repository import HelpRequestRepository
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from benchmarks import stub_db
+
+
+class CountingHelpRequestRepository(HelpRequestRepository):
+    """Counts the reads the invalidator makes"""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def get_by_id(self, record_id):
+        self.reads += 1
+        return await super().get_by_id(record_id)
+
+    async def get_by_ids(self, ids):
+        self.reads += 1
+        return await super().get_by_ids(ids)
+
+
+def build(**invalidator_options):
+    db = stub_db.install()
+    repo = CountingHelpRequestRepository()
+    projection = HelpRequestProjection(repo, KnowledgeBaseRepository())
+    invalidator = CacheInvalidator(
+        context_cache=TTLCache("context", ttl_seconds=60),
+        tenant_cache=TTLCache("tenants", ttl_seconds=60),
+        projection=projection,
+        help_request_repo=repo,
+        **invalidator_options
+    )
+    relay = EventRelay(queue_size=8)
+    bus = InMemoryBus()
+    bus.subscribe(invalidator)
+    bus.subscribe(relay)
+    return db, repo, projection, invalidator, relay, bus
+
+
+async def create_requests(db, repo, count, timeout_at):
+    rows = [await repo.create({"customer_phone": f"+1555000{i:04d}", "question": f"Question number {i}?",
+                               "created_at": datetime.utcnow().isoformat(), "timeout_at": timeout_at.isoformat()})
+            for i in range(count)]
+    # The stand-in keeps the supervisor_dashboard view as a plain table
+    db.tables.setdefault("supervisor_dashboard", []).extend({**row, "customer_name": None} for row in rows)
+    return rows
+
+
+def test_timeout_sweep_is_refreshed_in_one_query():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build()
+        rows = await create_requests(db, repo, 50, datetime.utcnow() - timedelta(minutes=1))
+        await projection.reconcile()
+        assert len(projection.dashboard()) == 50
+
+        # Another worker's sweep: the trigger sends one event per row
+        swept = await HelpRequestRepository().timeout_old_requests()
+        repo.reads = 0
+        for row in swept:
+            await bus.publish(ChangeEvent("help_requests", "UPDATE", str(row["id"]), None, 0))
+        await asyncio.sleep(invalidator.batch_window * 2)
+
+        assert len(swept) == len(rows)
+        assert repo.reads == 1
+        assert projection.dashboard() == []
+        assert (await projection.analytics())["timeout_requests"] == 50
+
+    asyncio.run(scenario())
+
+
+def test_large_burst_is_flushed_in_batches_of_max_batch():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build(max_batch=20)
+        rows = await create_requests(db, repo, 50, datetime.utcnow() + timedelta(hours=1))
+        await projection.reconcile()
+
+        repo.reads = 0
+        for row in rows:
+            await bus.publish(ChangeEvent("help_requests", "UPDATE", str(row["id"]), None, 0))
+        # Two full batches went out inline; the rest waits for the window
+        assert repo.reads == 2
+        await asyncio.sleep(invalidator.batch_window * 2)
+        assert repo.reads == 3
+
+    asyncio.run(scenario())
+
+
+def test_insert_then_update_is_applied_as_a_new_request_with_its_customer_name():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build()
+        await projection.reconcile()
+
+        # Written by another worker, so only the events reach this one
+        row = (await create_requests(db, HelpRequestRepository(), 1, datetime.utcnow() + timedelta(hours=1)))[0]
+        db.tables["supervisor_dashboard"][0]["customer_name"] = "Ada"
+        await bus.publish(ChangeEvent("help_requests", "INSERT", str(row["id"]), None, 0))
+        await bus.publish(ChangeEvent("help_requests", "UPDATE", str(row["id"]), None, 0))
+        await asyncio.sleep(invalidator.batch_window * 2)
+
+        dashboard = projection.dashboard()
+        assert [r["id"] for r in dashboard] == [str(row["id"])]
+        assert dashboard[0]["customer_name"] == "Ada"
+
+    asyncio.run(scenario())
+
+
+def test_knowledge_and_tenant_events_evict_only_what_they_affect():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build()
+        invalidator.context_cache.set("tenant-a", "context a")
+        invalidator.context_cache.set("tenant-b", "context b")
+        invalidator.tenant_cache.set("default", {"id": "tenant-a"})
+
+        await bus.publish(ChangeEvent("knowledge_base", "INSERT", "k1", "tenant-a", 2))
+        assert invalidator.context_cache.get("tenant-a") is None
+        assert invalidator.context_cache.get("tenant-b") == "context b"
+        assert invalidator.tenant_cache.get("default") is not None
+
+        await bus.publish(ChangeEvent("tenants", "UPDATE", "tenant-b", None, 0))
+        assert invalidator.context_cache.get("tenant-b") is None
+        assert invalidator.tenant_cache.get("default") is None
+
+    asyncio.run(scenario())
+
+
+def test_resync_evicts_everything_and_reloads_the_projection():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build()
+        await projection.reconcile()
+        await create_requests(db, HelpRequestRepository(), 3, datetime.utcnow() + timedelta(hours=1))
+        invalidator.context_cache.set("tenant-a", "context a")
+
+        await bus.publish(RESYNC)
+
+        assert len(invalidator.context_cache) == 0
+        assert len(projection.dashboard()) == 3
+
+    asyncio.run(scenario())
+
+
+def test_relay_delivers_events_in_order_and_resyncs_a_slow_subscriber():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build()
+        fast, slow = relay.open(), relay.open()
+        events = [ChangeEvent("customers", "UPDATE", str(i), None, 0) for i in range(5)]
+
+        for event in events:
+            await bus.publish(event)
+        assert [fast.get_nowait() for _ in events] == events
+
+        # The slow subscriber still holds the first five: the fourth new event overflows it into one resync
+        later = [ChangeEvent("customers", "UPDATE", str(i), None, 0) for i in range(relay.queue_size)]
+        for event in later:
+            await bus.publish(event)
+        assert [slow.get_nowait() for _ in range(slow.qsize())] == [RESYNC] + later[4:]
+        assert [fast.get_nowait() for _ in later] == later
+
+        relay.close(slow)
+        await bus.publish(events[0])
+        relay.close_all()
+        assert relay.subscribers == 1
+        assert fast.qsize() == 1 and fast.get_nowait() is None
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_a_scheduled_refresh():
+    async def scenario():
+        db, repo, projection, invalidator, relay, bus = build(batch_window=60)
+        await bus.publish(ChangeEvent("help_requests", "UPDATE", "missing", None, 0))
+        await invalidator.close()
+        assert invalidator._flush_task is None
+
+    asyncio.run(scenario())
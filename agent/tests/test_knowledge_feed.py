@@ -0,0 +1,79 @@
+"""
+An agent's knowledge view rendering the same knowledge section as /ai/context, over the in-memory DB stand-in
+"""
+
+import asyncio
+
+from app.cache import TTLCache
+from app.models.schemas import KnowledgeChangesResponse, KnowledgeSnapshotResponse
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from app.services.ai_service import AIService
+from app.services.tenant_service import TenantService
+from benchmarks import stub_db
+from knowledge_view import KnowledgeViews
+
+
+class FeedClient:
+    """The backend client's feed calls, answered by the service and serialized like the endpoints"""
+
+    def __init__(self, ai_service):
+        self.ai_service = ai_service
+
+    async def get_knowledge_snapshot(self, tenant=None):
+        snapshot = await self.ai_service.get_knowledge_snapshot(tenant)
+        return KnowledgeSnapshotResponse(**snapshot).model_dump(mode="json")
+
+    async def get_knowledge_changes(self, since, tenant=None):
+        changes = await self.ai_service.get_knowledge_changes(since, tenant)
+        return KnowledgeChangesResponse(**changes).model_dump(mode="json")
+
+
+def build():
+    db = stub_db.install()
+    knowledge_repo = KnowledgeBaseRepository()
+    ai_service = AIService(knowledge_repo=knowledge_repo,
+                           tenant_service=TenantService(tenant_cache=TTLCache("tenants", ttl_seconds=60)))
+    return db, knowledge_repo, ai_service, KnowledgeViews(FeedClient(ai_service))
+
+
+def test_agent_renders_the_context_knowledge_section_as_entries_are_used():
+    async def scenario():
+        db, knowledge_repo, ai_service, views = build()
+        tenant_id = stub_db.default_tenant_id(db)
+        entries = [await knowledge_repo.create_knowledge_entry(f"Question number {i}?", f"Answer number {i}.",
+                                                               tenant_id=tenant_id)
+                   for i in range(8)]
+        business_context = await ai_service.get_business_context()
+        assert business_context + await views.render() == await ai_service.get_salon_context()
+
+        # Usage reorders the backend's most used entries; the agent's copy follows through the feed
+        for uses, entry in zip((1, 3, 9, 2), entries[4:]):
+            for _ in range(uses):
+                await knowledge_repo.increment_usage(entry["id"])
+            assert business_context + await views.render() == await ai_service.get_salon_context()
+
+        section = await views.render()
+        assert section.index("Question number 6?") < section.index("Question number 5?") < section.index(
+            "Question number 4?") < section.index("Question number 0?")
+
+    asyncio.run(scenario())
+
+
+def test_usage_reaches_the_feed_only_when_the_rank_changes():
+    async def scenario():
+        db, knowledge_repo, ai_service, views = build()
+        tenant_id = stub_db.default_tenant_id(db)
+        entry = await knowledge_repo.create_knowledge_entry("Do you do balayage?", "Yes, we do.",
+                                                            tenant_id=tenant_id)
+        version = await knowledge_repo.get_latest_change_version()
+
+        for _ in range(9):
+            await knowledge_repo.increment_usage(entry["id"])
+
+        # Ranks 1, 2, 3 and 4 are reached on the 1st, 2nd, 4th and 8th use
+        changes = await knowledge_repo.get_changes(version, tenant_id)
+        assert [change["op"] for change in changes] == ["UPDATE"] * 4
+        delta = await knowledge_repo.get_delta(version, tenant_id)
+        assert [(row["usage_count"], row["usage_rank"]) for row in delta["updated"]] == [(9, 4)]
+
+    asyncio.run(scenario())
@@ -0,0 +1,168 @@
+"""
+NotificationDispatcher coalescing, dropping, retrying and shutdown flushing, against recording sinks
+"""
+
+import asyncio
+
+from app.metrics import NotificationStats
+from app.notifications import NotificationDispatcher, NotificationSink
+
+
+class RecordingSink(NotificationSink):
+    """Records each delivered batch; fails the first ``failures`` attempts"""
+
+    name = "recording"
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.attempts = 0
+        self.batches = []
+        self.closed = False
+
+    async def send(self, supervisor, notifications):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError("sink unavailable")
+        self.batches.append((supervisor, [n["id"] for n in notifications]))
+
+    async def close(self):
+        self.closed = True
+
+
+def build(sink=None, **dispatcher_options):
+    sink = sink or RecordingSink()
+    dispatcher = NotificationDispatcher([sink], **dispatcher_options)
+    # The shared metrics object outlives a test; each dispatcher here counts on its own
+    dispatcher.stats = NotificationStats()
+    return sink, dispatcher
+
+
+def ticket(request_id, tenant_id="tenant-a", priority="normal"):
+    return {"id": request_id, "tenant_id": tenant_id, "customer_phone": "+15550000000",
+            "priority": priority, "question": f"Question {request_id}?", "context": ""}
+
+
+def test_burst_for_one_tenant_goes_out_as_one_digest():
+    async def scenario():
+        sink, dispatcher = build(coalesce_seconds=0.05)
+        runner = asyncio.create_task(dispatcher.run())
+
+        for i in range(5):
+            dispatcher.enqueue(ticket(f"a{i}"))
+        dispatcher.enqueue(ticket("b0", tenant_id="tenant-b"))
+        await asyncio.sleep(0.01)
+        assert sink.batches == []
+
+        await asyncio.sleep(0.1)
+        assert sorted(sink.batches) == [("tenant-a", [f"a{i}" for i in range(5)]), ("tenant-b", ["b0"])]
+        assert dispatcher.stats.digests == 1
+        assert dispatcher.stats.sent == {"recording": 6}
+
+        runner.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_urgent_ticket_flushes_its_tenant_batch_immediately():
+    async def scenario():
+        sink, dispatcher = build(coalesce_seconds=60)
+        runner = asyncio.create_task(dispatcher.run())
+
+        dispatcher.enqueue(ticket("a0"))
+        dispatcher.enqueue(ticket("a1", priority="urgent"))
+        dispatcher.enqueue(ticket("b0", tenant_id="tenant-b"))
+        await asyncio.sleep(0.01)
+
+        # The urgent ticket takes the waiting one with it; the other tenant keeps waiting
+        assert sink.batches == [("tenant-a", ["a0", "a1"])]
+        assert "tenant-a" not in dispatcher._timers
+        assert "tenant-b" in dispatcher._timers
+
+        runner.cancel()
+        await dispatcher.close()
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    async def scenario():
+        sink, dispatcher = build(coalesce_seconds=60, max_batch=3)
+        runner = asyncio.create_task(dispatcher.run())
+
+        for i in range(4):
+            dispatcher.enqueue(ticket(f"a{i}"))
+        await asyncio.sleep(0.01)
+
+        assert sink.batches == [("tenant-a", ["a0", "a1", "a2"])]
+        assert dispatcher._pending["tenant-a"][0]["id"] == "a3"
+
+        runner.cancel()
+        await dispatcher.close()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_drops_and_counts_instead_of_waiting():
+    async def scenario():
+        sink, dispatcher = build(max_queue=3)
+
+        accepted = [dispatcher.enqueue(ticket(f"a{i}")) for i in range(5)]
+
+        assert accepted == [True, True, True, False, False]
+        assert dispatcher.stats.enqueued == 3
+        assert dispatcher.stats.dropped == 2
+        assert dispatcher.stats.queue_depth == 3
+        await dispatcher.close()
+
+    asyncio.run(scenario())
+
+
+def test_failing_sink_is_retried_with_backoff_then_recorded_as_failed():
+    async def scenario():
+        recovering, dispatcher = build(RecordingSink(failures=2), max_attempts=5, retry_delay=0.01)
+        dispatcher.enqueue(ticket("a0", priority="urgent"))
+        await dispatcher.close()
+
+        assert recovering.attempts == 3
+        assert recovering.batches == [("tenant-a", ["a0"])]
+        assert dispatcher.stats.retries == 2
+        assert dispatcher.stats.failures == {}
+
+        failing, dispatcher = build(RecordingSink(failures=10), max_attempts=3, retry_delay=0.01)
+        dispatcher.enqueue(ticket("a0", priority="urgent"))
+        dispatcher.enqueue(ticket("a1", priority="urgent"))
+        started = asyncio.get_running_loop().time()
+        await dispatcher.close()
+        elapsed = asyncio.get_running_loop().time() - started
+
+        # Two backoffs of at least half of 0.01 and 0.02 seconds before giving up
+        assert elapsed >= 0.015
+        assert failing.attempts == 6
+        assert failing.batches == []
+        assert dispatcher.stats.retries == 4
+        assert dispatcher.stats.failures == {"recording": 2}
+
+    asyncio.run(scenario())
+
+
+def test_close_delivers_what_is_queued_or_batched_and_closes_sinks():
+    async def scenario():
+        sink, dispatcher = build(coalesce_seconds=60)
+        runner = asyncio.create_task(dispatcher.run())
+
+        dispatcher.enqueue(ticket("a0"))
+        dispatcher.enqueue(ticket("b0", tenant_id="tenant-b"))
+        await asyncio.sleep(0.01)
+        runner.cancel()
+        # Still in the queue when the runner stops
+        dispatcher.enqueue(ticket("a1"))
+
+        await dispatcher.close()
+
+        assert sorted(sink.batches) == [("tenant-a", ["a0", "a1"]), ("tenant-b", ["b0"])]
+        assert dispatcher._timers == {}
+        assert dispatcher.stats.queue_depth == 0
+        assert dispatcher.stats.in_flight == 0
+        assert sink.closed
+
+    asyncio.run(scenario())
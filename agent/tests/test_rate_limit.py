@@ -0,0 +1,149 @@
+"""
+TokenBuckets eviction and RateLimitMiddleware admission, driven over ASGI in front of an echo app
+"""
+
+import asyncio
+
+import httpx
+import orjson
+from starlette.responses import Response
+
+from app.middleware.rate_limit_middleware import RateLimitMiddleware, TokenBuckets
+
+
+async def echo(scope, receive, send):
+    """Answers with the request body exactly as the app received it"""
+    chunks, more = [], True
+    while more:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more = message.get("more_body", False)
+    await Response(b"".join(chunks), media_type="application/json")(scope, receive, send)
+
+
+def build(phone_burst=5, session_burst=10):
+    middleware = RateLimitMiddleware(echo, limits={
+        "customer_phone": TokenBuckets(rate=1 / 60, burst=phone_burst),
+        "call_session_id": TokenBuckets(rate=1 / 60, burst=session_burst),
+    })
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test")
+    return middleware, client
+
+
+def test_idle_buckets_are_evicted_once_they_would_have_refilled():
+    buckets = TokenBuckets(rate=1.0, burst=5, idle_seconds=1.0)
+    assert buckets.idle_seconds == 5.0
+
+    for _ in range(5):
+        assert buckets.take("a", now=0.0) == 0.0
+    assert buckets.take("a", now=0.0) == 1.0
+    buckets.take("b", now=3.0)
+
+    buckets.take("c", now=5.5)
+    assert len(buckets) == 2
+    assert buckets.take("b", now=8.5) == 0.0
+    assert len(buckets) == 2
+
+
+def test_least_recently_used_bucket_is_evicted_beyond_max_keys():
+    buckets = TokenBuckets(rate=1.0, burst=1, max_keys=2)
+    buckets.take("a", now=0.0)
+    buckets.take("b", now=0.0)
+    # Using "a" again makes "b" the least recently used
+    buckets.take("a", now=0.1)
+
+    buckets.take("c", now=0.2)
+
+    assert list(buckets._buckets) == ["a", "c"]
+    # Evicted early, so "b" starts again from a full bucket
+    assert buckets.take("b", now=0.3) == 0.0
+
+
+def test_rejection_by_the_session_limit_refunds_the_phone_token():
+    async def scenario():
+        middleware, client = build(phone_burst=2, session_burst=1)
+        params = {"customer_phone": "+15551230000", "call_session_id": "call-1"}
+
+        assert (await client.post("/ai/create-ticket", params=params)).status_code == 200
+        for _ in range(3):
+            assert (await client.post("/ai/create-ticket", params=params)).status_code == 429
+
+        # The rejected requests took nothing from the phone, so a new call from it still gets in
+        params["call_session_id"] = "call-2"
+        assert (await client.post("/ai/create-ticket", params=params)).status_code == 200
+        assert (await client.post("/ai/create-ticket", params=params)).status_code == 429
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_rejection_is_a_structured_429_with_retry_after():
+    async def scenario():
+        middleware, client = build(phone_burst=1)
+        params = {"customer_phone": "+15551230000"}
+
+        await client.post("/ai/create-ticket", params=params)
+        response = await client.post("/ai/create-ticket", params=params)
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "60"
+        body = response.json()
+        assert body["success"] is False
+        assert body["error_code"] == "rate_limited"
+        assert body["limit"] == "customer_phone"
+        assert body["retry_after"] == 60
+        assert body["message"] == "Too many requests for this customer phone; retry in 60s"
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_buffered_json_body_is_keyed_and_replayed_intact():
+    async def scenario():
+        middleware, client = build(session_burst=1)
+        payload = orjson.dumps({"question": "Do you open on Sundays? " * 200, "call_session_id": "call-1",
+                                "customer_phone": "+15551230000"})
+
+        async def chunked():
+            for start in range(0, len(payload), 1000):
+                yield payload[start:start + 1000]
+
+        response = await client.post("/ai/query", content=chunked(), headers={"content-type": "application/json"})
+        assert response.status_code == 200
+        assert response.content == payload
+
+        # The session key came from the body
+        response = await client.post("/ai/query", content=payload, headers={"content-type": "application/json"})
+        assert response.status_code == 429
+        assert response.json()["limit"] == "call_session_id"
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_placeholder_phones_are_not_keyed():
+    async def scenario():
+        middleware, client = build(phone_burst=1)
+
+        for phone in ("unknown", "unknown", "", "+0000", "anonymous"):
+            response = await client.post("/ai/create-ticket", params={"customer_phone": phone})
+            assert response.status_code == 200
+        response = await client.post("/ai/query", json={"customer_phone": "unknown"})
+        assert response.status_code == 200
+
+        assert len(middleware.limits["customer_phone"]) == 0
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_other_routes_are_not_limited():
+    async def scenario():
+        middleware, client = build(phone_burst=1)
+        for _ in range(3):
+            response = await client.post("/ai/resolve", params={"customer_phone": "+15551230000"})
+            assert response.status_code == 200
+        assert len(middleware.limits["customer_phone"]) == 0
+        await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,132 @@
+"""
+SemanticIndex writes seen through a separate reader, and SemanticIndexer over the in-memory DB stand-in
+"""
+
+import asyncio
+
+from app import semantic
+from app.repositories.knowledge_base_repository import KnowledgeBaseRepository
+from app.repositories.tenant_repository import TenantRepository
+from app.semantic import HashingEmbedder, SemanticIndex, SemanticIndexer, SemanticIndexes
+from benchmarks import stub_db
+
+QUESTIONS = {
+    "hours": "What time do you close on Saturday?",
+    "price": "How much does a haircut cost?",
+    "parking": "Where can I park near the salon?",
+}
+
+
+def build_index(path, embedder, questions=QUESTIONS):
+    return SemanticIndex.build(str(path), embedder.name, list(questions),
+                               embedder.embed(list(questions.values())), version=1)
+
+
+def reader_for(path):
+    reader = SemanticIndex(str(path))
+    assert reader.refresh()
+    return reader
+
+
+def ids(matches):
+    return [knowledge_id for knowledge_id, _ in matches]
+
+
+def test_reader_sees_an_upsert_once_it_is_committed(tmp_path):
+    embedder = HashingEmbedder(64)
+    writer = build_index(tmp_path, embedder)
+    reader = reader_for(tmp_path)
+    vector = embedder.embed(["Do you take walk-in appointments?"])
+
+    writer.upsert(["walkins"], vector)
+    reader.refresh()
+    assert "walkins" not in ids(reader.query(vector[0], k=10))
+
+    writer.commit(version=2)
+    assert reader.refresh()
+    assert ids(reader.query(vector[0], k=1)) == ["walkins"]
+    assert reader.state["version"] == 2
+
+
+def test_removed_entry_is_no_longer_matched(tmp_path):
+    embedder = HashingEmbedder(64)
+    writer = build_index(tmp_path, embedder)
+    reader = reader_for(tmp_path)
+    vector = embedder.embed([QUESTIONS["price"]])[0]
+    assert ids(reader.query(vector, k=1)) == ["price"]
+
+    writer.remove(["price"])
+    writer.commit(version=2)
+    reader.refresh()
+
+    assert "price" not in ids(reader.query(vector, k=10))
+    assert sorted(ids(reader.query(vector, k=10))) == ["hours", "parking"]
+
+
+def test_reupserted_entry_matches_only_its_new_vector(tmp_path):
+    embedder = HashingEmbedder(64)
+    writer = build_index(tmp_path, embedder)
+    reader = reader_for(tmp_path)
+    old, new = embedder.embed([QUESTIONS["hours"], "Are you open on public holidays?"])
+
+    writer.upsert(["hours"], new[None, :])
+    writer.commit(version=2)
+    reader.refresh()
+
+    matches = reader.query(old, k=10)
+    assert ids(matches).count("hours") == 1
+    assert abs(dict(matches)["hours"] - float(old @ new)) < 1e-5
+    [(best, score)] = reader.query(new, k=1)
+    assert best == "hours" and abs(score - 1.0) < 1e-5
+
+
+def test_reader_keeps_its_mapping_until_it_picks_up_a_new_generation(tmp_path):
+    embedder = HashingEmbedder(64)
+    build_index(tmp_path, embedder)
+    reader = reader_for(tmp_path)
+    vector = embedder.embed([QUESTIONS["parking"]])[0]
+
+    # A rebuild writes generation 2 and deletes generation 1's files under the reader
+    build_index(tmp_path, embedder, {"parking-v2": QUESTIONS["parking"]})
+    assert not list(tmp_path.glob("1.*.npy"))
+    assert reader.state["generation"] == 1
+    assert ids(reader.query(vector, k=1)) == ["parking"]
+
+    assert reader.refresh()
+    assert reader.state["generation"] == 2
+    assert ids(reader.query(vector, k=3)) == ["parking-v2"]
+
+
+def test_indexer_applies_the_change_feed_and_rebuilds_when_the_tail_fills(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic, "TAIL_ROWS", 2)
+
+    async def scenario():
+        db = stub_db.install()
+        tenant_id = stub_db.default_tenant_id(db)
+        knowledge_repo = KnowledgeBaseRepository()
+        indexes = SemanticIndexes(str(tmp_path), HashingEmbedder(64))
+        indexer = SemanticIndexer(knowledge_repo, TenantRepository(), indexes)
+        for question in QUESTIONS.values():
+            await knowledge_repo.create_knowledge_entry(question, "See the front desk.", tenant_id=tenant_id)
+
+        await indexer.sync(tenant_id)
+        writer = indexer._writers[tenant_id]
+        assert writer.state["generation"] == 1 and writer.state["count"] == 3
+
+        # One new entry fits the tail and is appended in place
+        walkins = await knowledge_repo.create_knowledge_entry("Do you take walk-ins?", "Yes.", tenant_id=tenant_id)
+        await indexer.sync(tenant_id)
+        assert indexer._writers[tenant_id] is writer and writer.state["count"] == 4
+        assert ids(indexes.query(tenant_id, "walk-ins welcome?", k=1)) == [str(walkins["id"])]
+
+        # Two more overflow the tail: the lists are rebuilt from the live rows and the new ones
+        for question in ("Do you sell gift cards?", "Can I bring my dog?"):
+            await knowledge_repo.create_knowledge_entry(question, "Yes.", tenant_id=tenant_id)
+        await indexer.sync(tenant_id)
+        rebuilt = indexer._writers[tenant_id]
+        assert rebuilt.state["generation"] == 2
+        assert rebuilt.state["count"] == rebuilt.state["base_count"] == 6
+        assert rebuilt.state["version"] == await knowledge_repo.get_latest_change_version()
+        assert len(indexes.query(tenant_id, "gift cards", k=10)) == 6
+
+    asyncio.run(scenario())
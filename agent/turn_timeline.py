@@ -0,0 +1,152 @@
+"""
+Per-turn latency timeline for voice agent sessions
+
+Each session records conversation events with monotonic timestamps in a
+bounded ring buffer. When the session ends the timeline is written out as
+JSON lines, and its per-turn latencies are folded into worker-wide stats
+that are logged as percentiles.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Event names recorded by SessionManager
+USER_STOPPED_SPEAKING = "user_stopped_speaking"
+USER_SPEECH_COMMITTED = "user_speech_committed"
+AGENT_STARTED_SPEAKING = "agent_started_speaking"
+AGENT_SPEECH_COMMITTED = "agent_speech_committed"
+ESCALATION_DETECTED = "escalation_detected"
+TICKET_SENT = "ticket_sent"
+TICKET_ACKED = "ticket_acked"
+TICKET_FAILED = "ticket_failed"
+RECONNECT_STARTED = "reconnect_started"
+RECONNECT_COMPLETED = "reconnect_completed"
+
+# Latency metrics derived per turn: name -> (start event, end event)
+TURN_METRICS = {
+    "response_ms": (USER_STOPPED_SPEAKING, AGENT_STARTED_SPEAKING),
+    "transcript_ms": (USER_STOPPED_SPEAKING, USER_SPEECH_COMMITTED),
+    "ticket_ms": (TICKET_SENT, TICKET_ACKED),
+    "reconnect_ms": (RECONNECT_STARTED, RECONNECT_COMPLETED),
+}
+
+DEFAULT_MAX_EVENTS = 1024
+WORKER_SAMPLES = 4096
+
+
+class TurnTimeline:
+    """
+    Bounded, per-session record of conversation events
+
+    A new turn starts whenever the caller stops speaking. Every other event
+    is attributed to the current turn. Once ``max_events`` is reached the
+    oldest events are dropped, so a long call cannot grow memory without bound.
+    """
+
+    def __init__(self, max_events: Optional[int] = None):
+        self.max_events = max_events or int(os.getenv("TURN_TIMELINE_MAX_EVENTS", DEFAULT_MAX_EVENTS))
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=self.max_events)
+        self.turn = 0
+        self.dropped = 0
+        self.started_at = datetime.now(timezone.utc)
+        self._origin = time.monotonic()
+
+    def mark(self, event: str, **attrs: Any) -> None:
+        """Record ``event`` now, with optional JSON-serializable attributes"""
+        if event == USER_STOPPED_SPEAKING:
+            self.turn += 1
+        if len(self.events) == self.max_events:
+            self.dropped += 1
+
+        entry = {"turn": self.turn, "event": event, "t_ms": round((time.monotonic() - self._origin) * 1000, 3)}
+        if attrs:
+            entry.update(attrs)
+        self.events.append(entry)
+
+    def turn_latencies(self) -> Dict[str, List[float]]:
+        """Latency samples per metric, one per turn where both ends were seen"""
+        firsts: Dict[int, Dict[str, float]] = {}
+        for entry in self.events:
+            firsts.setdefault(entry["turn"], {}).setdefault(entry["event"], entry["t_ms"])
+
+        samples: Dict[str, List[float]] = {name: [] for name in TURN_METRICS}
+        for events in firsts.values():
+            for name, (start, end) in TURN_METRICS.items():
+                if start in events and end in events and events[end] >= events[start]:
+                    samples[name].append(round(events[end] - events[start], 3))
+        return samples
+
+    def to_json_lines(self, session_id: Optional[str]) -> str:
+        """Header line with session metadata followed by one line per event"""
+        header = {
+            "session_id": session_id,
+            "event": "session",
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((time.monotonic() - self._origin) * 1000, 3),
+            "turns": self.turn,
+            "dropped_events": self.dropped,
+        }
+        lines = [json.dumps(header)]
+        lines.extend(json.dumps(dict(entry, session_id=session_id)) for entry in self.events)
+        return "\n".join(lines) + "\n"
+
+    def export(self, session_id: Optional[str], directory: Optional[str] = None) -> Optional[str]:
+        """Write the timeline to ``<directory>/<session_id>.jsonl`` and return the path"""
+        directory = directory or os.getenv("TURN_TIMELINE_DIR", "timelines")
+        path = os.path.join(directory, f"{session_id or 'unknown'}.jsonl")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(self.to_json_lines(session_id))
+            return path
+        except OSError as e:
+            logger.warning(f"Failed to export turn timeline to {path}: {e}")
+            return None
+
+
+class WorkerTimelineStats:
+    """Recent per-turn latency samples across every session in this worker process"""
+
+    def __init__(self, max_samples: int = WORKER_SAMPLES):
+        self.sessions = 0
+        self.samples: Dict[str, Deque[float]] = {
+            name: deque(maxlen=max_samples) for name in TURN_METRICS
+        }
+
+    def add(self, timeline: TurnTimeline) -> None:
+        self.sessions += 1
+        for name, values in timeline.turn_latencies().items():
+            self.samples[name].extend(values)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, values in self.samples.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            result[name] = {
+                "count": len(ordered),
+                "p50": _percentile(ordered, 0.50),
+                "p95": _percentile(ordered, 0.95),
+                "p99": _percentile(ordered, 0.99),
+                "max": ordered[-1],
+            }
+        return result
+
+    def log_summary(self) -> None:
+        logger.info(f"Turn latency summary after {self.sessions} session(s): {json.dumps(self.summary())}")
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# Worker-wide aggregate; each agent worker process runs many sessions
+worker_stats = WorkerTimelineStats()
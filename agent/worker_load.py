@@ -0,0 +1,169 @@
+"""
+Load reporting and job admission for the agent worker
+
+LiveKit dispatch sends new rooms to workers whose reported load is under
+their threshold. The default load is CPU only. This module reports the
+highest of four ratios: live sessions against capacity, event loop lag,
+memory and CPU. So a worker is marked busy by whichever resource runs out
+first, and ``request_fnc`` turns down jobs that arrive while it is busy.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import psutil
+from livekit.agents import JobExecutorType, JobRequest, WorkerOptions, WorkerType
+
+logger = logging.getLogger(__name__)
+
+# Conservative starting point, not a measured capacity: with the process executor every call is
+# its own process with native media work that benchmarks/bench_session_density.py leaves out,
+# so its ~200 per core is only an upper bound. Set AGENT_SESSIONS_PER_CORE from a real load test.
+DEFAULT_SESSIONS_PER_CORE = 10
+
+
+class LoopLagProbe:
+    """
+    Measures how late the worker's event loop runs a callback, from a side thread
+
+    A sampling thread schedules a no-op on the loop every ``interval`` seconds
+    and times how long the loop takes to run it. When job threads compete
+    with the worker for the GIL, this lag grows with them.
+    """
+
+    def __init__(self, loop, interval: float = 0.25, window: int = 20):
+        self._loop = loop
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="worker_loop_lag_probe")
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            done = threading.Event()
+            start = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(done.set)
+            except RuntimeError:
+                return  # loop closed
+            if not done.wait(timeout=5.0):
+                lag = 5.0
+            else:
+                lag = time.perf_counter() - start
+            with self._lock:
+                self._samples.append(lag)
+            time.sleep(self.interval)
+
+    def lag_ms(self) -> float:
+        """Worst lag over the recent window, in milliseconds"""
+        with self._lock:
+            return max(self._samples, default=0.0) * 1000
+
+
+class WorkerLoad:
+    """Computes the worker's load from sessions, loop lag, memory and CPU"""
+
+    def __init__(self,
+                 max_sessions: Optional[int] = None,
+                 max_loop_lag_ms: Optional[float] = None,
+                 max_memory_percent: Optional[float] = None,
+                 threshold: Optional[float] = None,
+                 admission_window: float = 10.0):
+        cores = psutil.cpu_count() or 1
+        sessions_per_core = float(os.getenv("AGENT_SESSIONS_PER_CORE", DEFAULT_SESSIONS_PER_CORE))
+        self.max_sessions = max_sessions or int(os.getenv("AGENT_MAX_SESSIONS") or 0) or max(1, int(cores * sessions_per_core))
+        self.max_loop_lag_ms = max_loop_lag_ms or float(os.getenv("AGENT_MAX_LOOP_LAG_MS", "100"))
+        self.max_memory_percent = max_memory_percent or float(os.getenv("AGENT_MAX_MEMORY_PERCENT", "90"))
+        self.threshold = threshold or float(os.getenv("AGENT_LOAD_THRESHOLD", "0.75"))
+
+        # Jobs accepted but not yet running still count against capacity
+        self.admission_window = admission_window
+        self._admitted: Deque[float] = deque()
+        self._last_active = 0
+
+        self._probe: Optional[LoopLagProbe] = None
+        self.last_components: Dict[str, float] = {}
+        self.last_load = 0.0
+        psutil.cpu_percent(interval=None)  # prime the CPU counter
+
+    def _pending_admissions(self, active: int) -> int:
+        """Accepted jobs not yet running; forgotten once they start or the window passes"""
+        for _ in range(max(0, active - self._last_active)):
+            if self._admitted:
+                self._admitted.popleft()
+        self._last_active = active
+
+        cutoff = time.monotonic() - self.admission_window
+        while self._admitted and self._admitted[0] < cutoff:
+            self._admitted.popleft()
+        return len(self._admitted)
+
+    def compute(self, worker: Any) -> float:
+        """
+        ``WorkerOptions.load_fnc``: the most saturated resource, between 0 and 1
+
+        The worker calls this from an executor thread. Loop lag counts from
+        the first job request, which is when the probe learns the loop.
+        """
+        active = len(worker.active_jobs)
+        sessions = active + self._pending_admissions(active)
+        components = {
+            "sessions": sessions / self.max_sessions,
+            "loop_lag": (self._probe.lag_ms() if self._probe is not None else 0.0) / self.max_loop_lag_ms,
+            "memory": psutil.virtual_memory().percent / self.max_memory_percent,
+            "cpu": psutil.cpu_percent(interval=None) / 100,
+        }
+        load = min(1.0, max(components.values()))
+
+        if load >= self.threshold and self.last_load < self.threshold:
+            logger.warning(f"Worker at capacity (load {load:.2f}): {components}")
+        self.last_components = components
+        self.last_load = load
+        return load
+
+    async def request(self, req: JobRequest) -> None:
+        """``WorkerOptions.request_fnc``: accept a room only while under the load threshold"""
+        if self._probe is None:
+            # Job requests are handled on the worker's event loop
+            self._probe = LoopLagProbe(asyncio.get_running_loop())
+
+        if self.last_load >= self.threshold:
+            logger.info(f"Rejecting job {req.id}: load {self.last_load:.2f} >= {self.threshold}")
+            await req.reject()
+            return
+
+        # Count this job now rather than at the next load update, so a burst cannot overshoot
+        self._admitted.append(time.monotonic())
+        sessions = self.last_components.get("sessions", 0.0) + 1 / self.max_sessions
+        self.last_components["sessions"] = sessions
+        self.last_load = max(self.last_load, sessions)
+        await req.accept()
+
+
+def worker_options(entrypoint_fnc) -> WorkerOptions:
+    """Worker options with load-aware dispatch and admission, tunable from the environment"""
+    load = WorkerLoad()
+    executor = os.getenv("AGENT_JOB_EXECUTOR", "process").lower()
+
+    options = dict(
+        entrypoint_fnc=entrypoint_fnc,
+        request_fnc=load.request,
+        load_fnc=load.compute,
+        load_threshold=load.threshold,
+        worker_type=WorkerType.ROOM,
+        job_executor_type=JobExecutorType.THREAD if executor == "thread" else JobExecutorType.PROCESS,
+        job_memory_warn_mb=float(os.getenv("AGENT_JOB_MEMORY_WARN_MB", "300")),
+        job_memory_limit_mb=float(os.getenv("AGENT_JOB_MEMORY_LIMIT_MB", "0")),
+    )
+    if os.getenv("AGENT_NUM_IDLE_PROCESSES"):
+        options["num_idle_processes"] = int(os.environ["AGENT_NUM_IDLE_PROCESSES"])
+
+    logger.info(f"Worker capacity: {load.max_sessions} sessions, load threshold {load.threshold}, "
+                f"{executor} job executor")
+    return WorkerOptions(**options)